@@ -6,3 +6,6 @@ class ApiConfig(AppConfig):
 
     def ready(self):
         import api.signals
+        from api.cache import check_shared_cache
+
+        check_shared_cache()
@@ -0,0 +1,183 @@
+"""
+Bulk URL shortening.
+
+shorten_urls() handles a whole batch in a fixed number of queries: one for
+the owner's existing links, one for the requested custom slugs, a slug block
+lease when the allocator runs dry, and one multi-row INSERT. Rows created
+with bulk_create send no post_save signal, so the slug filter, the shared
+slug cache and the owner's dashboard summary are updated here instead.
+"""
+
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .cache import ResolvedURL, prime_slugs
+from .models.url_shortening import URL
+from .serializers import BulkShortenItemSerializer
+from .slug_filter import remember_slugs, slug_might_exist
+from .slugs import SLUG_CREATE_ATTEMPTS, allocate_slug, allocate_slugs
+from .summaries import mark_owners_changed
+from .utils import url_hash
+from curl_project.constants import USER_TYPE_GUEST
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "MAX_URLS": 1000,
+}
+
+CREATED = "created"
+EXISTING = "existing"
+FAILED = "error"
+
+SLUG_IN_USE = "This slug is already in use"
+
+
+def get_bulk_settings():
+    options = dict(DEFAULT_SETTINGS)
+    options.update(getattr(settings, "BULK_SHORTEN", {}))
+    return options
+
+
+class BulkResult(NamedTuple):
+    status: str
+    url: Optional[URL] = None
+    error: Optional[str] = None
+
+
+def _first_error(errors):
+    field, messages = next(iter(errors.items()))
+    message = messages[0] if isinstance(messages, list) else messages
+    return message if field == "non_field_errors" else f"{field}: {message}"
+
+
+def shorten_urls(owner, items):
+    """
+    Shortens a batch of {"original_url", "shortened_slug", "expiration_date"}
+    items for owner. Returns one BulkResult per item, in input order. A URL
+    the owner has already shortened, or that appears earlier in the batch
+    (compared in canonical form, see api.utils.canonicalize_url), comes back
+    as EXISTING, as with the single create endpoint; so does an item whose
+    custom slug already points at that same link, so batches can be re-run.
+    """
+    results = [None] * len(items)
+    # Item index -> (URL hash, slug or None, validated item).
+    pending = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = BulkResult(FAILED, error="Each item must be an object")
+            continue
+        item = BulkShortenItemSerializer(data=item)
+        if not item.is_valid():
+            results[index] = BulkResult(FAILED, error=_first_error(item.errors))
+            continue
+        slug = item.validated_data["shortened_slug"] or None
+        if slug and owner.user_type == USER_TYPE_GUEST:
+            results[index] = BulkResult(FAILED, error="Guests cannot create custom URLs")
+            continue
+        digest = url_hash(item.validated_data["original_url"])
+        pending[index] = (digest, slug, item.validated_data)
+    if not pending:
+        return results
+
+    # Slugs that a definite miss in the slug filter rules out need no lookup.
+    requested = {slug for _, slug, _ in pending.values() if slug and slug_might_exist(slug)}
+    # Links pending deletion still hold their slugs.
+    taken = {}
+    if requested:
+        taken = {
+            url.shortened_slug: url
+            for url in URL.all_objects.filter(shortened_slug__in=requested)
+        }
+    existing = {}
+    for url in URL.objects.filter(
+        owner=owner, original_url_hash__in={digest for digest, _, _ in pending.values()}
+    ).order_by("creation_date"):
+        existing.setdefault(url.original_url_hash, url)
+
+    # URL hash -> (index, slug, item) of the item that creates it.
+    creating = {}
+    for index, (digest, slug, item) in pending.items():
+        if slug and slug in taken:
+            url = taken[slug]
+            if (
+                url is not None
+                and url.owner_id == owner.pk
+                and url.original_url_hash == digest
+                and not url.pending_deletion
+            ):
+                results[index] = BulkResult(EXISTING, url)
+            else:
+                results[index] = BulkResult(FAILED, error=SLUG_IN_USE)
+        elif digest in existing:
+            results[index] = BulkResult(EXISTING, existing[digest])
+        elif digest not in creating:
+            creating[digest] = (index, slug, item)
+            # Later items asking for the same slug find it taken.
+            taken[slug] = None
+
+    generated = iter(allocate_slugs(sum(1 for _, slug, _ in creating.values() if not slug)))
+    rows = [
+        URL(
+            original_url=item["original_url"],
+            original_url_hash=digest,
+            shortened_slug=slug or next(generated),
+            owner=owner,
+            customized=bool(slug),
+            expiration_date=item["expiration_date"],
+        )
+        for digest, (_, slug, item) in creating.items()
+    ]
+    created = _insert(rows)
+
+    remember_slugs(url.shortened_slug for url in created)
+    prime_slugs({url.shortened_slug: ResolvedURL.from_instance(url) for url in created})
+    if created:
+        mark_owners_changed([owner.pk])
+
+    created = {url.original_url_hash: url for url in created}
+    for index, (digest, slug, _) in pending.items():
+        if results[index] is not None:
+            continue
+        url = created.get(digest)
+        if url is None:
+            error = SLUG_IN_USE if slug else "Could not allocate a slug, please try again"
+            results[index] = BulkResult(FAILED, error=error)
+        elif creating[digest][0] == index:
+            results[index] = BulkResult(CREATED, url)
+        else:
+            results[index] = BulkResult(EXISTING, url)
+    return results
+
+
+def _insert(rows):
+    """
+    Inserts rows in one statement. If a slug was taken in the meantime, falls
+    back to inserting them one by one, retrying generated slugs, and leaves
+    out the rows that could not be inserted.
+    """
+    if not rows:
+        return []
+    try:
+        with transaction.atomic():
+            return URL.objects.bulk_create(rows)
+    except IntegrityError:
+        logger.warning("Bulk insert hit a slug conflict, inserting one by one")
+
+    created = []
+    for row in rows:
+        for _ in range(SLUG_CREATE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    row.save(force_insert=True)
+                created.append(row)
+                break
+            except IntegrityError:
+                if row.customized:
+                    break
+                row.shortened_slug = allocate_slug()
+    return created
@@ -0,0 +1,328 @@
+"""
+Caching helpers for the API.
+
+Slug resolution uses two tiers: a small in-process LRU that absorbs the hot
+links without any I/O, in front of the Django cache framework which is shared
+between workers. Only the fields needed to serve a redirect are cached.
+
+The shared tier is only used when the default cache really is shared (e.g.
+Redis or Memcached). A process-local backend such as LocMemCache would keep
+other workers' edits and deletions out of sight for the whole TIMEOUT, so
+with one the shared tier is skipped and only the short-lived local tier is
+used, and startup fails if several workers are configured (see
+check_shared_cache).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import NamedTuple, Optional
+from uuid import UUID
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from .slug_filter import slug_might_exist
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+_MISSING = object()
+
+# Backends whose entries live in (or never leave) the current process.
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def cache_is_shared(alias="default"):
+    """
+    Whether the cache under alias is visible to every worker process.
+    """
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+def check_shared_cache():
+    """
+    Refuses to start several workers on a process-local default cache: slug
+    invalidations, dimension versions and summary markers would never reach
+    the other workers.
+    """
+    workers = getattr(settings, "WEB_CONCURRENCY", 1)
+    if workers > 1 and not cache_is_shared():
+        raise ImproperlyConfigured(
+            f"{workers} workers are configured but the default cache "
+            f"({settings.CACHES['default']['BACKEND']}) is local to each process. "
+            "Set REDIS_URL (or configure CACHES with another shared backend)."
+        )
+
+
+class LRUCache:
+    """
+    A small thread-safe LRU mapping with an optional per-entry TTL.
+
+    Hit and miss counters are kept so the cache can be sized from real traffic.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ResolvedURL(NamedTuple):
+    """
+    The subset of a URL row needed to serve a redirect.
+    """
+
+    uuid: UUID
+    original_url: str
+    is_active: bool
+    expiration_date: Optional[datetime]
+    owner_id: Optional[UUID]
+
+    @classmethod
+    def from_instance(cls, url):
+        return cls(*(getattr(url, field) for field in cls._fields))
+
+    @property
+    def expired(self):
+        if self.expiration_date:
+            return timezone.now() > self.expiration_date
+        return False
+
+    @property
+    def is_accessible(self):
+        return self.is_active and not self.expired
+
+
+SLUG_CACHE_SETTINGS = {
+    "LOCAL_SIZE": 2048,
+    "LOCAL_TTL": 5,
+    "TIMEOUT": 300,
+    "KEY_PREFIX": "slug:",
+    # None uses the shared tier only when the default cache is shared.
+    "SHARED": None,
+}
+SLUG_CACHE_SETTINGS.update(getattr(settings, "SLUG_CACHE", {}))
+if SLUG_CACHE_SETTINGS["SHARED"] is None:
+    SLUG_CACHE_SETTINGS["SHARED"] = cache_is_shared()
+
+# Entries in the local tier are only invalidated in the worker that saved the
+# URL, so they expire after LOCAL_TTL seconds to bound cross-worker staleness.
+_local_slugs = LRUCache(
+    maxsize=SLUG_CACHE_SETTINGS["LOCAL_SIZE"], ttl=SLUG_CACHE_SETTINGS["LOCAL_TTL"]
+)
+_shared_stats = {"hits": 0, "misses": 0}
+_REDIRECT_FIELDS = ResolvedURL._fields
+_shared_stats_lock = threading.Lock()
+
+
+def _shared_key(slug):
+    return f"{SLUG_CACHE_SETTINGS['KEY_PREFIX']}{slug}"
+
+
+def _count_shared(outcome):
+    with _shared_stats_lock:
+        _shared_stats[outcome] += 1
+
+
+def resolve_slug(slug):
+    """
+    Returns the ResolvedURL for a slug, or None if no such URL exists.
+    """
+    resolved = _local_slugs.get(slug)
+    if resolved is not None:
+        return resolved
+
+    if SLUG_CACHE_SETTINGS["SHARED"]:
+        resolved = cache.get(_shared_key(slug))
+        if resolved is not None:
+            _count_shared("hits")
+            _local_slugs.set(slug, resolved)
+            return resolved
+        _count_shared("misses")
+
+    if not slug_might_exist(slug):
+        return None
+
+    from .models.url_shortening import URL
+
+    row = (
+        URL.objects.filter(shortened_slug=slug)
+        .values_list(*_REDIRECT_FIELDS)
+        .first()
+    )
+    if row is None:
+        return None
+    resolved = ResolvedURL(*row)
+    if SLUG_CACHE_SETTINGS["SHARED"]:
+        cache.set(_shared_key(slug), resolved, SLUG_CACHE_SETTINGS["TIMEOUT"])
+    _local_slugs.set(slug, resolved)
+    return resolved
+
+
+async def aresolve_slug(slug):
+    """
+    Async counterpart of resolve_slug for the ASGI redirect view.
+    """
+    resolved = _local_slugs.get(slug)
+    if resolved is not None:
+        return resolved
+
+    if SLUG_CACHE_SETTINGS["SHARED"]:
+        resolved = await cache.aget(_shared_key(slug))
+        if resolved is not None:
+            _count_shared("hits")
+            _local_slugs.set(slug, resolved)
+            return resolved
+        _count_shared("misses")
+
+    # The filter may need to (re)load from the database, so run it in a thread.
+    if not await sync_to_async(slug_might_exist)(slug):
+        return None
+
+    from .models.url_shortening import URL
+
+    row = await (
+        URL.objects.filter(shortened_slug=slug)
+        .values_list(*_REDIRECT_FIELDS)
+        .afirst()
+    )
+    if row is None:
+        return None
+    resolved = ResolvedURL(*row)
+    if SLUG_CACHE_SETTINGS["SHARED"]:
+        await cache.aset(_shared_key(slug), resolved, SLUG_CACHE_SETTINGS["TIMEOUT"])
+    _local_slugs.set(slug, resolved)
+    return resolved
+
+
+def invalidate_slug(slug):
+    """
+    Drops a slug from both cache tiers, now and again once the current
+    transaction commits so a concurrent reader cannot re-cache stale data.
+    """
+    if not slug:
+        return
+    _drop_slug(slug)
+    transaction.on_commit(partial(_drop_slug, slug))
+
+
+def invalidate_slugs(slugs):
+    """
+    Batch counterpart of invalidate_slug, for URLs changed with update().
+    """
+    slugs = [slug for slug in slugs if slug]
+    if not slugs:
+        return
+    _drop_slugs(slugs)
+    transaction.on_commit(partial(_drop_slugs, slugs))
+
+
+def prime_slug(slug, resolved):
+    """
+    Publishes a newly created URL to the shared tier once it is committed, so
+    workers whose slug filter has not seen it yet can still resolve it.
+    """
+    if not SLUG_CACHE_SETTINGS["SHARED"]:
+        return
+    transaction.on_commit(
+        partial(cache.set, _shared_key(slug), resolved, SLUG_CACHE_SETTINGS["TIMEOUT"])
+    )
+
+
+def prime_slugs(resolved_by_slug):
+    """
+    Batch counterpart of prime_slug, for URLs created with bulk_create.
+    """
+    if not resolved_by_slug or not SLUG_CACHE_SETTINGS["SHARED"]:
+        return
+    entries = {_shared_key(slug): resolved for slug, resolved in resolved_by_slug.items()}
+    transaction.on_commit(
+        partial(cache.set_many, entries, SLUG_CACHE_SETTINGS["TIMEOUT"])
+    )
+
+
+def _drop_slug(slug):
+    _local_slugs.delete(slug)
+    if SLUG_CACHE_SETTINGS["SHARED"]:
+        cache.delete(_shared_key(slug))
+
+
+def _drop_slugs(slugs):
+    for slug in slugs:
+        _local_slugs.delete(slug)
+    if SLUG_CACHE_SETTINGS["SHARED"]:
+        cache.delete_many([_shared_key(slug) for slug in slugs])
+
+
+def clear_slug_cache():
+    """
+    Empties the local tier and resets the counters. Used by tests.
+    """
+    _local_slugs.clear()
+    with _shared_stats_lock:
+        _shared_stats.update(hits=0, misses=0)
+
+
+def slug_cache_stats():
+    """
+    Returns hit/miss counters for both tiers of this worker's slug cache.
+    """
+    with _shared_stats_lock:
+        shared = dict(_shared_stats, enabled=SLUG_CACHE_SETTINGS["SHARED"])
+    return {"local": _local_slugs.stats(), "shared": shared}
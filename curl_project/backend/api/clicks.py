@@ -0,0 +1,326 @@
+"""
+Click recording pipeline.
+
+Redirects push a ClickEvent onto a bounded in-process queue and return
+immediately. A background flusher drains the queue, enriches the events
+(geolocation, user agent, dimensions) and writes them with bulk_create in
+batches, either when a batch is full or when the flush interval elapses.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+from .models.analytics import Click
+from .dimensions import get_registry
+from .counters import get_counter
+from .rollups import record_rollups
+from .visitors import record_visitors
+from .summaries import record_summary_clicks
+from .utils import get_geolocation, classify_user_agent
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_INLINE = "inline"
+
+OVERFLOW_POLICIES = [OVERFLOW_DROP, OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK, OVERFLOW_INLINE]
+
+DEFAULT_SETTINGS = {
+    "ASYNC": True,
+    "QUEUE_SIZE": 10000,
+    "BATCH_SIZE": 500,
+    "FLUSH_INTERVAL": 1.0,
+    "OVERFLOW": OVERFLOW_DROP_OLDEST,
+    "BLOCK_TIMEOUT": 0.05,
+}
+
+
+def get_recorder_settings():
+    options = dict(DEFAULT_SETTINGS)
+    options.update(getattr(settings, "CLICK_RECORDER", {}))
+    if options["OVERFLOW"] not in OVERFLOW_POLICIES:
+        raise ValueError(
+            f"Invalid CLICK_RECORDER OVERFLOW: {options['OVERFLOW']}. "
+            f"Must be one of: {OVERFLOW_POLICIES}"
+        )
+    return options
+
+
+class ClickEvent(NamedTuple):
+    """
+    The raw facts about a redirect, captured on the request path.
+    """
+
+    url_id: UUID
+    owner_id: Optional[UUID]
+    ip_address: str
+    user_agent: str
+    redirected: bool
+    timestamp: datetime
+
+
+def build_click(event, dimensions):
+    """
+    Turns a ClickEvent into an unsaved Click with its dimensions resolved.
+    """
+    try:
+        country_name = get_geolocation(event.ip_address) or "Unknown"
+    except Exception as e:
+        logger.error(
+            f"Error getting geolocation data for IP: {event.ip_address}, error: {e}"
+        )
+        country_name = "Unknown"
+
+    agent = classify_user_agent(event.user_agent)
+
+    return Click(
+        url_id=event.url_id,
+        owner_id=event.owner_id,
+        timestamp=event.timestamp,
+        ip_address=event.ip_address,
+        country_id=dimensions.country.resolve(country_name),
+        browser_id=dimensions.browser.resolve(agent.browser),
+        device_id=dimensions.device.resolve(agent.device),
+        platform_id=dimensions.platform.resolve(agent.platform),
+        redirected=event.redirected,
+    )
+
+
+def _live_clicks(clicks):
+    """
+    Drops clicks on URLs deleted since they were queued and points the rest
+    at their URL's current owner, who may have changed (e.g. a merged guest).
+    """
+    from .models.url_shortening import URL
+
+    owners = dict(
+        URL.all_objects.filter(uuid__in={click.url_id for click in clicks}).values_list(
+            "uuid", "owner_id"
+        )
+    )
+    live = []
+    for click in clicks:
+        if click.url_id in owners:
+            click.owner_id = owners[click.url_id]
+            live.append(click)
+    return live
+
+
+def _save_clicks(clicks):
+    # Clicks and their aggregates commit together so they never disagree.
+    with transaction.atomic():
+        clicks = Click.objects.bulk_create(clicks)
+        record_rollups(clicks)
+        record_visitors(clicks)
+        record_summary_clicks(clicks)
+    return clicks
+
+
+def ingest_clicks(events):
+    """
+    Enriches and writes a batch of click events. Returns the created clicks,
+    which leave out events on URLs deleted since they were queued.
+    """
+    dimensions = get_registry()
+    dimensions.refresh_if_stale()
+    clicks = [build_click(event, dimensions) for event in events]
+    try:
+        clicks = _save_clicks(clicks)
+    except IntegrityError:
+        # A URL or owner went away between the redirect and the flush; keep
+        # the rest of the batch rather than failing every click in it.
+        live = _live_clicks(clicks)
+        logger.warning(
+            f"Dropping {len(clicks) - len(live)} click events on deleted URLs"
+        )
+        clicks = _save_clicks(live)
+    counter = get_counter()
+    counter.add(clicks)
+    counter.flush_if_due()
+    return clicks
+
+
+class ClickRecorder:
+    """
+    Bounded queue plus a background thread that flushes clicks in batches.
+    """
+
+    def __init__(self, queue_size, batch_size, flush_interval, overflow, block_timeout):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def record(self, event):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+            self.stats["enqueued"] += 1
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            try:
+                self._queue.get_nowait()
+                self.stats["dropped"] += 1
+            except queue.Empty:
+                pass
+            self._put_or_drop(event, block=False)
+        elif self.overflow == OVERFLOW_BLOCK:
+            self._put_or_drop(event, block=True)
+        elif self.overflow == OVERFLOW_INLINE:
+            self._write([event])
+        else:
+            self.stats["dropped"] += 1
+
+    def _put_or_drop(self, event, block):
+        try:
+            self._queue.put(event, block=block, timeout=self.block_timeout if block else None)
+            self.stats["enqueued"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+            logger.warning("Click queue is full, dropping click event")
+
+    def _ensure_started(self):
+        # A thread started before a fork (e.g. gunicorn --preload) does not
+        # exist in the child, so each process starts its own flusher.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="click-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def _drain(self, limit, wait):
+        batch = []
+        deadline = time.monotonic() + wait
+        while len(batch) < limit:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._drain(self.batch_size, self.flush_interval)
+            if batch:
+                self._write(batch)
+            else:
+                self._flush_counters(force=False)
+        self.flush()
+
+    def _write(self, events):
+        with self._flush_lock:
+            close_old_connections()
+            try:
+                written = len(ingest_clicks(events))
+                self.stats["written"] += written
+                self.stats["failed"] += len(events) - written
+            except Exception:
+                self.stats["failed"] += len(events)
+                logger.exception(f"Failed to write {len(events)} click events")
+
+    def _flush_counters(self, force):
+        with self._flush_lock:
+            close_old_connections()
+            try:
+                if force:
+                    get_counter().flush()
+                else:
+                    get_counter().flush_if_due()
+            except Exception:
+                logger.exception("Failed to flush click counters")
+
+    def flush(self):
+        """
+        Writes everything currently queued, in batches, on the calling thread.
+        """
+        while True:
+            batch = self._drain(self.batch_size, 0)
+            if not batch:
+                break
+            self._write(batch)
+        self._flush_counters(force=True)
+
+    def stop(self, timeout=10):
+        """
+        Stops the flusher and writes any remaining events.
+        """
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                options = get_recorder_settings()
+                _recorder = ClickRecorder(
+                    queue_size=options["QUEUE_SIZE"],
+                    batch_size=options["BATCH_SIZE"],
+                    flush_interval=options["FLUSH_INTERVAL"],
+                    overflow=options["OVERFLOW"],
+                    block_timeout=options["BLOCK_TIMEOUT"],
+                )
+                # Graceful worker shutdown (gunicorn SIGTERM, runserver reload)
+                # exits the interpreter normally, which runs atexit handlers.
+                atexit.register(_recorder.stop)
+    return _recorder
+
+
+def record_click(event):
+    """
+    Records a click without waiting for the database, unless CLICK_RECORDER
+    has ASYNC disabled, in which case it is written immediately.
+    """
+    if not get_recorder_settings()["ASYNC"]:
+        ingest_clicks([event])
+        return
+    get_recorder().record(event)
+
+
+async def arecord_click(event):
+    """
+    Async counterpart of record_click. Enqueuing never touches the database;
+    policies that may block or write inline are run in a worker thread.
+    """
+    options = get_recorder_settings()
+    if options["ASYNC"] and options["OVERFLOW"] in (OVERFLOW_DROP, OVERFLOW_DROP_OLDEST):
+        get_recorder().record(event)
+    else:
+        await sync_to_async(record_click)(event)
@@ -0,0 +1,127 @@
+"""
+click_count maintenance for the dimension tables.
+
+click_count is the number of a row's clicks in the Click table. The click
+writer adds each batch to an in-memory tally, which is applied periodically
+as set-based F() updates: one UPDATE per table and distinct delta, rather
+than one per click. Archiving (see api/retention.py) subtracts the clicks it
+moves out of the table.
+
+Pending deltas only live in the writing process. A normal shutdown flushes
+them (the click recorder's atexit hook), but a crash or SIGKILL loses up to
+FLUSH_INTERVAL seconds of them, and rebuild_click_counts, which counts the
+Click rows those deltas stand for, is then the repair. Conversely, deltas
+still pending in other processes while a rebuild runs are added on top of
+it once flushed, so rebuild with the click writers stopped for exact counts.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import F
+
+from .models.analytics import Country, Browser, Device, Platform
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "FLUSH_INTERVAL": 10,
+}
+
+# (model, Click foreign key attribute) pairs whose click_count is maintained.
+COUNTED_DIMENSIONS = [
+    (Country, "country_id"),
+    (Browser, "browser_id"),
+    (Device, "device_id"),
+    (Platform, "platform_id"),
+]
+
+
+def _by_delta(deltas):
+    """
+    Groups a Counter of pk -> delta into delta -> [pk, ...].
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        by_delta[delta].append(pk)
+    return by_delta
+
+
+def subtract_click_counts(rows):
+    """
+    Subtracts clicks from click_count. rows are tuples of the Click
+    attributes of COUNTED_DIMENSIONS, in order. Call it in the transaction
+    that deletes the clicks.
+    """
+    for index, (model, _) in enumerate(COUNTED_DIMENSIONS):
+        deltas = Counter(row[index] for row in rows if row[index] is not None)
+        for delta, pks in _by_delta(deltas).items():
+            model.objects.filter(pk__in=pks).update(click_count=F("click_count") - delta)
+
+
+class ClickCounter:
+    """
+    Accumulates click_count deltas and applies them in bulk.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._deltas = {model: Counter() for model, _ in COUNTED_DIMENSIONS}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def add(self, clicks):
+        with self._lock:
+            for click in clicks:
+                for model, attribute in COUNTED_DIMENSIONS:
+                    pk = getattr(click, attribute)
+                    if pk is not None:
+                        self._deltas[model][pk] += 1
+
+    def flush_if_due(self):
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Applies and clears the pending deltas. Returns the number of updates.
+        """
+        with self._lock:
+            pending, self._deltas = self._deltas, {
+                model: Counter() for model, _ in COUNTED_DIMENSIONS
+            }
+            self._flushed_at = time.monotonic()
+
+        updates = 0
+        for model, deltas in pending.items():
+            for delta, pks in _by_delta(deltas).items():
+                try:
+                    model.objects.filter(pk__in=pks).update(
+                        click_count=F("click_count") + delta
+                    )
+                    updates += 1
+                except Exception:
+                    logger.exception(f"Failed to update {model.__name__} click counts")
+                    with self._lock:
+                        for pk in pks:
+                            self._deltas[model][pk] += delta
+        return updates
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_counter():
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                options = dict(DEFAULT_SETTINGS)
+                options.update(getattr(settings, "CLICK_COUNTERS", {}))
+                _counter = ClickCounter(options["FLUSH_INTERVAL"])
+    return _counter
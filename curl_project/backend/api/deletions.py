@@ -0,0 +1,248 @@
+"""
+Deleting accounts and links in the background.
+
+Deleting a heavy account or a popular link with instance.delete() makes
+Django's cascade collector load every dependent click and remove it all in
+one long transaction. Instead, a deletion request only marks the target,
+in a few statements: a link gets pending_deletion, which hides it from the
+API and from redirects, and an account is deactivated, which stops it
+authenticating, together with all of its links. A DeletionJob records the
+request.
+
+process_deletions() claims outstanding jobs one at a time, so several
+workers can run side by side, and purges each job's rows leaf tables
+first, including its clicks in the archive files (see api/retention.py), at
+most DELETION_WORKER["BATCH_SIZE"] rows per DELETE, each batch in
+its own short transaction that also records the job's progress, and
+deletes the target itself last. Run it with `manage.py purge_deletions`.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidate_slug, invalidate_slugs
+from .models.accounts import User
+from .models.analytics import Click, ClickRollup, DailyVisitorSketch, VisitorSketch
+from .models.url_shortening import URL, DeletionJob, URLImport
+from .retention import purge_archived_clicks
+from .summaries import mark_owners_changed
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "BATCH_SIZE": 5000,
+    "INTERVAL": 10,
+    # Seconds without a heartbeat after which a running job is taken to be
+    # abandoned by its worker and may be claimed again.
+    "STALE_AFTER": 600,
+}
+
+
+def get_deletion_settings():
+    options = dict(DEFAULT_SETTINGS)
+    options.update(getattr(settings, "DELETION_WORKER", {}))
+    return options
+
+
+class Throttle:
+    """
+    Spaces calls to wait() at least 1 / rate seconds apart; rate 0 is unlimited.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.last = None
+
+    def wait(self):
+        if self.interval and self.last is not None:
+            remaining = self.last + self.interval - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+        self.last = time.monotonic()
+
+
+def delete_in_batches(queryset, batch_size, throttle, on_batch=None):
+    """
+    Deletes the rows of queryset batch_size at a time, each batch in its own
+    transaction, calling on_batch(count) inside it. Returns the number of
+    rows deleted.
+    """
+    # The base manager, so rows a default manager hides are deleted too.
+    rows = queryset.model._base_manager
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        throttle.wait()
+        with transaction.atomic():
+            count, _ = rows.filter(pk__in=ids).delete()
+            if on_batch is not None:
+                on_batch(count)
+        deleted += count
+
+
+def owned_tables(owner_ids):
+    """
+    Querysets of everything owned by the users, leaves first.
+    """
+    urls = URL.all_objects.filter(owner_id__in=owner_ids)
+    return [
+        ("clicks", Click.objects.filter(Q(url__in=urls) | Q(owner_id__in=owner_ids))),
+        ("rollups", ClickRollup.objects.filter(url__in=urls)),
+        ("daily_sketches", DailyVisitorSketch.objects.filter(url__in=urls)),
+        ("sketches", VisitorSketch.objects.filter(url__in=urls)),
+        ("imports", URLImport.objects.filter(owner_id__in=owner_ids)),
+        ("urls", urls),
+    ]
+
+
+def link_tables(url_id):
+    """
+    Querysets of everything belonging to one link, leaves first.
+    """
+    return [
+        ("clicks", Click.objects.filter(url_id=url_id)),
+        ("rollups", ClickRollup.objects.filter(url_id=url_id)),
+        ("daily_sketches", DailyVisitorSketch.objects.filter(url_id=url_id)),
+        ("sketches", VisitorSketch.objects.filter(url_id=url_id)),
+        ("urls", URL.all_objects.filter(pk=url_id)),
+    ]
+
+
+def purge_tables(tables, batch_size, throttle, owner_ids=(), on_batch=None):
+    """
+    Deletes the rows of tables, from owned_tables() or link_tables(), in
+    batches, and the archived clicks of owner_ids and of the links. Calls
+    on_batch(name, count) for every batch, inside its transaction.
+    """
+    for name, queryset in tables:
+        if name == "urls":
+            # Their live clicks are gone, so no more can be archived, and the
+            # links are still there to find the archived ones by.
+            count = purge_archived_clicks(owner_ids, queryset.values_list("pk", flat=True))
+            if on_batch is not None:
+                on_batch("archived_clicks", count)
+
+        def record(count, name=name):
+            if on_batch is not None:
+                on_batch(name, count)
+
+        delete_in_batches(queryset, batch_size, throttle, on_batch=record)
+
+
+def request_link_deletion(url):
+    """
+    Hides url from the API and redirects and queues it for purging.
+    Returns the DeletionJob.
+    """
+    with transaction.atomic():
+        URL.all_objects.filter(pk=url.pk).update(pending_deletion=True)
+        job = DeletionJob.objects.create(kind=DeletionJob.LINK, target_id=url.pk)
+        invalidate_slug(url.shortened_slug)
+        mark_owners_changed([url.owner_id])
+    logger.info(f"Link {url.pk} scheduled for deletion by job {job.pk}")
+    return job
+
+
+def request_account_deletion(user):
+    """
+    Deactivates user, hides all of their links and queues the account for
+    purging. Returns the DeletionJob.
+    """
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        urls = URL.objects.filter(owner=user)
+        slugs = list(urls.values_list("shortened_slug", flat=True))
+        urls.update(pending_deletion=True)
+        job = DeletionJob.objects.create(kind=DeletionJob.ACCOUNT, target_id=user.pk)
+        invalidate_slugs(slugs)
+    logger.info(f"Account {user.pk} scheduled for deletion by job {job.pk}")
+    return job
+
+
+def claim_job(now=None):
+    """
+    Marks the oldest outstanding job running and returns it, or None if
+    there is none. Jobs another worker is running are skipped unless their
+    heartbeat is older than DELETION_WORKER["STALE_AFTER"] seconds.
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=get_deletion_settings()["STALE_AFTER"])
+    with transaction.atomic():
+        # Rows another worker is claiming are left to it.
+        job = (
+            DeletionJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=DeletionJob.PENDING)
+                | Q(status=DeletionJob.RUNNING, heartbeat_at__lt=stale)
+                | Q(status=DeletionJob.RUNNING, heartbeat_at__isnull=True)
+            )
+            .order_by("requested_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = DeletionJob.RUNNING
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        DeletionJob.objects.filter(pk=job.pk).update(
+            status=job.status, started_at=job.started_at, heartbeat_at=job.heartbeat_at
+        )
+    return job
+
+
+def purge(job, batch_size=None, rate=0):
+    """
+    Deletes the rows of job's target in batches of batch_size, running at
+    most rate DELETEs per second (0 for no limit), then the target itself.
+    job must have been claimed with claim_job().
+    """
+    batch_size = batch_size or get_deletion_settings()["BATCH_SIZE"]
+    throttle = Throttle(rate)
+    jobs = DeletionJob.objects.filter(pk=job.pk, status=DeletionJob.RUNNING)
+
+    if job.kind == DeletionJob.ACCOUNT:
+        owner_ids = [job.target_id]
+        tables = owned_tables(owner_ids)
+    else:
+        owner_ids = []
+        tables = link_tables(job.target_id)
+
+    def record(name, count):
+        job.rows[name] = job.rows.get(name, 0) + count
+        job.heartbeat_at = timezone.now()
+        jobs.update(rows=job.rows, heartbeat_at=job.heartbeat_at)
+
+    purge_tables(tables, batch_size, throttle, owner_ids, on_batch=record)
+
+    with transaction.atomic():
+        if job.kind == DeletionJob.ACCOUNT:
+            # The account's profile and tokens go with it, by cascade.
+            throttle.wait()
+            User.objects.filter(pk=job.target_id).delete()
+        job.status = DeletionJob.DONE
+        job.completed_at = timezone.now()
+        jobs.update(status=job.status, completed_at=job.completed_at)
+
+    logger.info(f"Deletion job {job.pk} purged {job.kind} {job.target_id}: {job.rows}")
+
+
+def process_deletions(batch_size=None, rate=0):
+    """
+    Claims and purges outstanding deletion jobs, oldest first, until none
+    is left, including ones an interrupted worker abandoned. Returns the
+    number of jobs completed.
+    """
+    completed = 0
+    while (job := claim_job()) is not None:
+        purge(job, batch_size=batch_size, rate=rate)
+        completed += 1
+    return completed
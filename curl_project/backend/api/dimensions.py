@@ -0,0 +1,144 @@
+"""
+In-memory name -> primary key maps for the click dimension tables.
+
+Country, Browser, Device and Platform only hold a few hundred rows, so each
+process loads them once and resolves names without touching the database.
+Unknown names are created race-safely, relying on the unique name columns.
+
+Rows are only ever added during normal operation. When one is renamed or
+deleted (e.g. through admin) a version number in the Django cache is bumped;
+the click writer compares it once per batch and reloads on change.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models.analytics import Country, Browser, Device, Platform
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+VERSION_KEY = "dimensions:version"
+
+DEFAULT_SETTINGS = {
+    "RELOAD_INTERVAL": 300,
+}
+
+
+class DimensionMap:
+    """
+    Maps the names of one dimension table to primary keys.
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.max_length = model._meta.get_field(field).max_length
+        self._ids = None
+        self._names = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        self._ids = dict(self.model.objects.values_list(self.field, "pk"))
+        self._names = None
+
+    def name(self, pk):
+        """
+        Returns the name of pk, or None if this map does not know it.
+        """
+        if self._ids is None:
+            self.load()
+        names = self._names
+        if names is None or len(names) != len(self._ids):
+            names = self._names = {pk: name for name, pk in self._ids.items()}
+        return names.get(pk)
+
+    def resolve(self, name):
+        """
+        Returns the primary key for name, creating the row if needed.
+        """
+        name = (name or "Unknown")[: self.max_length]
+        if self._ids is None:
+            self.load()
+        pk = self._ids.get(name)
+        if pk is None:
+            with self._lock:
+                pk = self._ids.get(name)
+                if pk is None:
+                    pk = self._create(name)
+                    self._ids[name] = pk
+        return pk
+
+    def _create(self, name):
+        try:
+            with transaction.atomic():
+                return self.model.objects.create(**{self.field: name}).pk
+        except IntegrityError:
+            # Another worker created it first.
+            return self.model.objects.get(**{self.field: name}).pk
+
+
+class DimensionRegistry:
+    def __init__(self, reload_interval):
+        self.country = DimensionMap(Country, "country_name")
+        self.browser = DimensionMap(Browser, "browser_name")
+        self.device = DimensionMap(Device, "device_type")
+        self.platform = DimensionMap(Platform, "platform_name")
+        self.reload_interval = reload_interval
+        self._version = None
+        self._loaded_at = None
+
+    @property
+    def maps(self):
+        return [self.country, self.browser, self.device, self.platform]
+
+    def load(self):
+        for dimension in self.maps:
+            dimension.load()
+        self._loaded_at = time.monotonic()
+
+    def refresh_if_stale(self):
+        """
+        Reloads every map if another process changed the tables or the
+        reload interval passed. Meant to be called once per batch of clicks.
+        """
+        version = cache.get(VERSION_KEY, 0)
+        expired = (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at > self.reload_interval
+        )
+        if expired or version != self._version:
+            self.load()
+            self._version = version
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                options = dict(DEFAULT_SETTINGS)
+                options.update(getattr(settings, "DIMENSIONS", {}))
+                _registry = DimensionRegistry(options["RELOAD_INTERVAL"])
+    return _registry
+
+
+def bump_version():
+    """
+    Tells every process to reload its dimension maps.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+    if _registry is not None:
+        _registry._loaded_at = None
@@ -0,0 +1,80 @@
+"""
+Sweeping expired links.
+
+Redirects check expiration_date on every request, so an expired link never
+redirects, but until it is deactivated it still counts as live everywhere
+else. sweep_expired_urls() deactivates links whose expiration_date has
+passed, in batches of EXPIRY_SWEEPER["BATCH_SIZE"], each in its own short
+transaction, and drops them from the redirect caches.
+
+The candidates are read through the (is_active, expiration_date) index, so
+a sweep costs in proportion to the links that expired since the last one,
+not to the size of the URL table. Run it periodically with
+`manage.py expire_urls`.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_slugs
+from .models.url_shortening import URL
+from .summaries import mark_owners_changed
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "BATCH_SIZE": 1000,
+    "INTERVAL": 60,
+}
+
+
+def get_expiry_settings():
+    options = dict(DEFAULT_SETTINGS)
+    options.update(getattr(settings, "EXPIRY_SWEEPER", {}))
+    return options
+
+
+def expire_batch(now, batch_size):
+    """
+    Deactivates up to batch_size links that expired at or before now.
+    Returns the number deactivated.
+    """
+    with transaction.atomic():
+        # Rows another sweeper holds are left to it.
+        expired = list(
+            URL.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, expiration_date__lte=now)
+            .order_by("expiration_date")
+            .values_list("uuid", "shortened_slug", "owner_id")[:batch_size]
+        )
+        if not expired:
+            return 0
+        URL.objects.filter(uuid__in=[uuid for uuid, _, _ in expired]).update(is_active=False)
+        invalidate_slugs(slug for _, slug, _ in expired)
+        mark_owners_changed(owner_id for _, _, owner_id in expired)
+    return len(expired)
+
+
+def sweep_expired_urls(batch_size=None, now=None):
+    """
+    Deactivates every link that expired at or before now (default: the
+    start of the sweep). Returns {"expired": links, "batches": transactions}.
+    """
+    batch_size = batch_size or get_expiry_settings()["BATCH_SIZE"]
+    now = now or timezone.now()
+    stats = {"expired": 0, "batches": 0}
+    while True:
+        count = expire_batch(now, batch_size)
+        if count:
+            stats["expired"] += count
+            stats["batches"] += 1
+        if count < batch_size:
+            break
+    if stats["expired"]:
+        logger.info(
+            f"Deactivated {stats['expired']} expired links in {stats['batches']} batches"
+        )
+    return stats
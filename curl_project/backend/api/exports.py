@@ -0,0 +1,159 @@
+"""
+Streaming exports of raw click data.
+
+Rows are read with a single query (dimension names are joined in, never
+looked up per row) through iterator(chunk_size=...), which uses a
+server-side cursor on PostgreSQL, and are encoded a chunk at a time, so
+memory stays flat however many clicks are exported.
+
+CSV and NDJSON stream directly. Parquet is written in row groups to a file,
+because its footer is only known at the end; it needs the optional pyarrow
+package.
+"""
+
+import csv
+import json
+
+from .models.analytics import Click
+
+EXPORT_FORMATS = ["csv", "ndjson", "parquet"]
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Output column -> Click lookup.
+EXPORT_COLUMNS = {
+    "click_id": "click_id",
+    "url_id": "url_id",
+    "slug": "url__shortened_slug",
+    "timestamp": "timestamp",
+    "ip_address": "ip_address",
+    "country": "country__country_name",
+    "browser": "browser__browser_name",
+    "platform": "platform__platform_name",
+    "device": "device__device_type",
+    "redirected": "redirected",
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def export_rows(clicks, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields one tuple per click, in EXPORT_COLUMNS order.
+    """
+    rows = clicks.order_by("timestamp", "click_id").values_list(*EXPORT_COLUMNS.values())
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def clicks_for_owner(owner, url_id=None, start=None, end=None):
+    clicks = Click.objects.filter(url__owner=owner, url__pending_deletion=False)
+    if url_id is not None:
+        clicks = clicks.filter(url_id=url_id)
+    if start is not None:
+        clicks = clicks.filter(timestamp__gte=start)
+    if end is not None:
+        clicks = clicks.filter(timestamp__lt=end)
+    return clicks
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, (bool, int, str)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class _Echo:
+    """
+    A file-like object whose write() returns the value, for csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(list(EXPORT_COLUMNS))
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([_text(value) for value in row]))
+        if len(buffer) >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def ndjson_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    columns = list(EXPORT_COLUMNS)
+    buffer = []
+    for row in rows:
+        record = dict(zip(columns, (_text(value) for value in row)))
+        buffer.append(json.dumps(record) + "\n")
+        if len(buffer) >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+STREAMERS = {
+    "csv": csv_chunks,
+    "ndjson": ndjson_chunks,
+}
+
+
+def write_parquet(rows, where, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Writes rows as Parquet to where (a path or a binary file), one row group
+    per chunk. Returns the number of rows written. Raises ImportError
+    without pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("click_id", pa.string()),
+            ("url_id", pa.string()),
+            ("slug", pa.string()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("ip_address", pa.string()),
+            ("country", pa.string()),
+            ("browser", pa.string()),
+            ("platform", pa.string()),
+            ("device", pa.string()),
+            ("redirected", pa.bool_()),
+        ]
+    )
+    written = 0
+    with pq.ParquetWriter(where, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                writer.write_table(_parquet_table(pa, schema, batch))
+                written += len(batch)
+                batch = []
+        if batch or not written:
+            writer.write_table(_parquet_table(pa, schema, batch))
+            written += len(batch)
+    return written
+
+
+def _parquet_table(pa, schema, batch):
+    columns = list(zip(*batch)) if batch else [[] for _ in schema]
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_string(field.type):
+            values = [None if value is None else str(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
@@ -0,0 +1,200 @@
+"""
+Geolocation backends for click enrichment.
+
+Lookups are answered from a local database file, either a MaxMind-format
+MMDB (memory mapped) or a CSV of IP ranges such as DB-IP's free
+"ip-to-country" dump. Results sit behind an LRU keyed by network prefix.
+The remote DB-IP API is only consulted when GEOIP["REMOTE_FALLBACK"] is on.
+"""
+
+import bisect
+import csv
+import ipaddress
+import threading
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+
+from .cache import LRUCache
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "BACKEND": "auto",
+    "PATH": None,
+    "REMOTE_FALLBACK": False,
+    "CACHE_SIZE": 4096,
+    "CACHE_PREFIX_V4": 24,
+    "CACHE_PREFIX_V6": 48,
+}
+
+_MISSING = object()
+
+
+class GeoBackend(ABC):
+    """
+    Resolves an IP address to a country code, or None when unknown.
+    """
+
+    @abstractmethod
+    def country(self, ip):
+        """
+        Returns the ISO country code for ip, or None.
+        """
+
+
+class MMDBBackend(GeoBackend):
+    def __init__(self, path):
+        import maxminddb
+
+        self.reader = maxminddb.open_database(str(path), maxminddb.MODE_MMAP)
+
+    def country(self, ip):
+        try:
+            record = self.reader.get(ip)
+        except ValueError:
+            # e.g. an IPv6 address against an IPv4-only database
+            return None
+        if not record:
+            return None
+        country = record.get("country") or record.get("registered_country") or {}
+        return country.get("iso_code")
+
+
+class CSVRangeBackend(GeoBackend):
+    """
+    Reads "start_ip,end_ip,country" rows into sorted range tables and
+    answers lookups with a binary search.
+    """
+
+    def __init__(self, path):
+        ranges = {4: [], 6: []}
+        with open(path, newline="") as handle:
+            for row in csv.reader(handle):
+                if len(row) < 3 or row[0].startswith("#"):
+                    continue
+                try:
+                    start = ipaddress.ip_address(row[0].strip())
+                    end = ipaddress.ip_address(row[1].strip())
+                except ValueError:
+                    continue  # header row
+                ranges[start.version].append((int(start), int(end), row[2].strip()))
+        self.starts = {}
+        self.ranges = {}
+        for version, rows in ranges.items():
+            rows.sort()
+            self.ranges[version] = rows
+            self.starts[version] = [row[0] for row in rows]
+
+    def country(self, ip):
+        address = ipaddress.ip_address(ip)
+        value = int(address)
+        index = bisect.bisect_right(self.starts[address.version], value) - 1
+        if index < 0:
+            return None
+        start, end, country = self.ranges[address.version][index]
+        return country if start <= value <= end else None
+
+
+class RemoteDbIpBackend(GeoBackend):
+    """
+    The DB-IP web API. Blocking and rate limited, so only used as a fallback.
+    """
+
+    def country(self, ip):
+        from ip2geotools.databases.noncommercial import DbIpCity
+
+        response = DbIpCity.get(ip, api_key="free")
+        logger.info(f"Geolocation response: {response}")
+        return response.country
+
+
+class GeoLocator:
+    """
+    A local backend plus optional remote fallback, behind a prefix-keyed LRU.
+    """
+
+    def __init__(self, backend=None, fallback=None, cache_size=4096, prefix_v4=24, prefix_v6=48):
+        self.backend = backend
+        self.fallback = fallback
+        self.prefixes = {4: prefix_v4, 6: prefix_v6}
+        self.cache = LRUCache(maxsize=cache_size)
+
+    def cache_key(self, address):
+        network = ipaddress.ip_network(
+            (address, self.prefixes[address.version]), strict=False
+        )
+        return str(network)
+
+    def country(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        key = self.cache_key(address)
+        country = self.cache.get(key, _MISSING)
+        if country is not _MISSING:
+            return country
+
+        country = None
+        if self.backend is not None:
+            country = self.backend.country(str(address))
+        if country is None and self.fallback is not None and address.is_global:
+            try:
+                country = self.fallback.country(str(address))
+            except Exception as e:
+                logger.warning(f"Remote geolocation failed for IP: {ip}, error: {e}")
+                # Leave transient failures uncached so they can be retried.
+                return None
+        self.cache.set(key, country)
+        return country
+
+
+def build_backend(backend, path):
+    if backend == "auto":
+        if not path:
+            return None
+        backend = "csv" if str(path).endswith(".csv") else "mmdb"
+    if backend == "mmdb":
+        return MMDBBackend(path)
+    if backend == "csv":
+        return CSVRangeBackend(path)
+    if backend == "remote":
+        return RemoteDbIpBackend()
+    if backend in (None, "none"):
+        return None
+    raise ValueError(f"Invalid GEOIP BACKEND: {backend}")
+
+
+def build_locator(options=None):
+    if options is None:
+        options = dict(DEFAULT_SETTINGS)
+        options.update(getattr(settings, "GEOIP", {}))
+    try:
+        backend = build_backend(options["BACKEND"], options["PATH"])
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not load geolocation database {options['PATH']}: {e}")
+        backend = None
+    fallback = RemoteDbIpBackend() if options["REMOTE_FALLBACK"] else None
+    return GeoLocator(
+        backend=backend,
+        fallback=fallback,
+        cache_size=options["CACHE_SIZE"],
+        prefix_v4=options["CACHE_PREFIX_V4"],
+        prefix_v6=options["CACHE_PREFIX_V6"],
+    )
+
+
+_locator = None
+_locator_lock = threading.Lock()
+
+
+def get_locator():
+    global _locator
+    if _locator is None:
+        with _locator_lock:
+            if _locator is None:
+                _locator = build_locator()
+    return _locator
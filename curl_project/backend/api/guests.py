@@ -0,0 +1,201 @@
+"""
+Guest accounts: moving a guest's links to the account they log in or sign
+up with, and deleting guests that never came back.
+
+The whole migration is one transaction and a fixed number of set-based
+statements, however many links the guest made: guest URLs the user does
+not have yet are reassigned with one UPDATE, keeping the oldest when the
+guest shortened the same canonical URL more than once, and the rest (the
+user's or another guest link already has that URL) are merged, moving
+their clicks with one UPDATE and folding their rollups and visitor
+sketches into the URL kept, before being deleted together with the guest.
+
+Idle guests are deleted a chunk of users at a time, leaf tables first,
+each table in set-based DELETEs of a bounded number of rows in their own
+short transactions, rather than with user.delete(), whose cascade would
+load every click and delete everything in one long transaction. Each chunk
+is first checked again and deactivated, so a guest who came back after
+being selected keeps their data and one being deleted cannot come back.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, Exists, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from .cache import invalidate_slugs
+from .deletions import Throttle, owned_tables, purge_tables
+from .models.accounts import User
+from .models.analytics import Click, ClickRollup
+from .models.url_shortening import URL
+from .rollups import merge_rollups
+from .summaries import mark_owners_changed
+from .visitors import merge_visitor_sketches
+from curl_project.constants import USER_TYPE_GUEST
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "IDLE_DAYS": 30,
+    "CHUNK_SIZE": 100,
+    "BATCH_SIZE": 5000,
+}
+
+
+def get_guest_cleanup_settings():
+    options = dict(DEFAULT_SETTINGS)
+    options.update(getattr(settings, "GUEST_CLEANUP", {}))
+    return options
+
+
+def migrate_guest(guest, user):
+    """
+    Moves every URL of guest to user and deletes guest. Returns the number
+    of URLs transferred and the number merged into URLs user already had.
+    """
+    guest_id = guest.pk
+    existing = (
+        URL.objects.filter(owner=user, original_url_hash=OuterRef("original_url_hash"))
+        .order_by("creation_date", "uuid")
+        .values("uuid")[:1]
+    )
+    with transaction.atomic():
+        guest_urls = list(
+            URL.objects.select_for_update()
+            .filter(owner=guest)
+            .annotate(target=Subquery(existing))
+            .order_by("creation_date", "uuid")
+            .values_list("uuid", "shortened_slug", "original_url_hash", "target")
+        )
+        # Guest URL id -> id of the URL it is merged into: the user's URL for
+        # the same canonical URL, else the guest's oldest one.
+        merges = {}
+        kept = {}
+        for uuid, _, digest, target in guest_urls:
+            if target is None:
+                target = kept.get(digest)
+            if target is None:
+                kept[digest] = uuid
+            else:
+                merges[uuid] = target
+
+        if merges:
+            Click.objects.filter(url_id__in=list(merges)).update(
+                url_id=Case(
+                    *(When(url_id=source, then=Value(target)) for source, target in merges.items()),
+                    output_field=models.UUIDField(),
+                )
+            )
+            merge_rollups(merges)
+            merge_visitor_sketches(merges)
+
+        # Clicks carry their URL's owner; the guest's would go with it.
+        Click.objects.filter(owner=guest).update(owner=user)
+        transferred = (
+            URL.objects.filter(owner=guest).exclude(uuid__in=list(merges)).update(owner=user)
+        )
+        if merges:
+            URL.objects.filter(uuid__in=list(merges)).delete()
+        guest.delete()
+
+        # update() sends no post_save, so drop the cached owner of each slug.
+        invalidate_slugs(slug for _, slug, _, _ in guest_urls)
+        mark_owners_changed([user.pk])
+
+    logger.info(
+        f"Migrated guest {guest_id} to user {user.pk}: "
+        f"{transferred} transferred, {len(merges)} merged"
+    )
+    return transferred, len(merges)
+
+
+def idle_guests(cutoff):
+    """
+    Guests who have not logged in, created a link or had a click on one of
+    their links since cutoff, including guests with no last_login who
+    joined before cutoff.
+    """
+    recent_links = URL.objects.filter(owner=OuterRef("pk"), creation_date__gte=cutoff)
+    recent_clicks = ClickRollup.objects.filter(
+        url__owner=OuterRef("pk"),
+        granularity=ClickRollup.HOUR,
+        bucket__gte=cutoff - timedelta(hours=1),
+    )
+    return (
+        User.objects.filter(user_type=USER_TYPE_GUEST)
+        .filter(Q(last_login__lt=cutoff) | Q(last_login__isnull=True, date_joined__lt=cutoff))
+        .exclude(Exists(recent_links))
+        .exclude(Exists(recent_clicks))
+    )
+
+
+def _claim_idle_guests(cutoff, guest_ids):
+    """
+    Deactivates those of guest_ids that are still idle since cutoff and
+    returns their ids.
+    """
+    with transaction.atomic():
+        idle = list(
+            idle_guests(cutoff)
+            .filter(pk__in=guest_ids)
+            .select_for_update()
+            .values_list("pk", flat=True)
+        )
+        # As for a deleted account, so they stop authenticating meanwhile.
+        User.objects.filter(pk__in=idle).update(is_active=False)
+    return idle
+
+
+def delete_idle_guests(
+    idle_days=None, chunk_size=None, batch_size=None, rate=0, dry_run=False, on_chunk=None
+):
+    """
+    Deletes guests idle for idle_days with all their data, chunk_size users
+    at a time, removing at most batch_size rows per statement and running at
+    most rate statements per second (0 for no limit). With dry_run, only
+    counts what would be deleted. Calls on_chunk(totals) after each chunk
+    and returns the totals: rows per table, plus "users".
+    """
+    options = get_guest_cleanup_settings()
+    idle_days = options["IDLE_DAYS"] if idle_days is None else idle_days
+    chunk_size = chunk_size or options["CHUNK_SIZE"]
+    batch_size = batch_size or options["BATCH_SIZE"]
+    cutoff = timezone.now() - timedelta(days=idle_days)
+    throttle = Throttle(rate)
+
+    guests = idle_guests(cutoff).order_by("last_login", "pk")
+    totals = {name: 0 for name, _ in owned_tables([])}
+    totals["users"] = 0
+
+    if dry_run:
+        guest_ids = guests.values("pk")
+        for name, queryset in owned_tables(guest_ids):
+            totals[name] = queryset.count()
+        totals["users"] = guests.count()
+        return totals
+
+    def record(name, count):
+        totals[name] = totals.get(name, 0) + count
+
+    while True:
+        candidates = list(guests.values_list("pk", flat=True)[:chunk_size])
+        if not candidates:
+            break
+        guest_ids = _claim_idle_guests(cutoff, candidates)
+        if not guest_ids:
+            continue
+        purge_tables(owned_tables(guest_ids), batch_size, throttle, guest_ids, on_batch=record)
+        # A chunk of guests at once; each takes its profile and tokens along.
+        throttle.wait()
+        with transaction.atomic():
+            User.objects.filter(pk__in=guest_ids).delete()
+        totals["users"] += len(guest_ids)
+        if on_chunk is not None:
+            on_chunk(totals)
+
+    logger.info(f"Deleted {totals['users']} idle guests: {totals}")
+    return totals
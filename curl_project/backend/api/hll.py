@@ -0,0 +1,84 @@
+"""
+HyperLogLog cardinality sketches, used for unique visitor estimates.
+
+A sketch has 2**precision one-byte registers. With the default precision of
+12 (4096 registers) the standard error of an estimate is 1.04 / sqrt(4096),
+about 1.6%, so ~95% of estimates are within 3.3% of the true count. Small
+cardinalities use linear counting and are close to exact. Sketches of the
+same precision merge by taking the register-wise maximum, which gives the
+sketch of the union, so per-day sketches can be combined over any range.
+
+Serialized sketches are zlib-compressed; sparsely filled sketches (most
+links on most days) take a few dozen bytes instead of 4 KB.
+"""
+
+import hashlib
+import math
+import zlib
+
+PRECISION = 12
+
+# 2 ** -rank for every possible register value.
+_INVERSE_POWERS = [2.0**-rank for rank in range(65)]
+
+
+def standard_error(precision=PRECISION):
+    return 1.04 / math.sqrt(1 << precision)
+
+
+class HyperLogLog:
+    def __init__(self, precision=PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = (
+            bytearray(registers) if registers is not None else bytearray(self.size)
+        )
+        if len(self.registers) != self.size:
+            raise ValueError(
+                f"Expected {self.size} registers for precision {precision}, "
+                f"got {len(self.registers)}"
+            )
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (64 - self.precision)
+        remainder_bits = 64 - self.precision
+        remainder = hashed & ((1 << remainder_bits) - 1)
+        rank = remainder_bits - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(
+                f"Cannot merge sketches of precision {other.precision} and {self.precision}"
+            )
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """
+        Returns the estimated number of distinct values added.
+        """
+        size = self.size
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(
+            _INVERSE_POWERS[rank] for rank in self.registers
+        )
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Linear counting is far more accurate for small cardinalities.
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        return cls(precision=data[0], registers=zlib.decompress(data[1:]))
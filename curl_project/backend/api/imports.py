@@ -0,0 +1,117 @@
+"""
+Streaming bulk imports of links.
+
+Rows of original_url, optional shortened_slug and optional expiration_date
+are read from CSV or NDJSON one at a time and shortened a chunk at a time
+with api.bulk.shorten_urls: one set lookup for existing links and custom
+slugs and one bulk_create per chunk, so memory depends on the chunk size,
+not on the file.
+
+Each chunk commits together with the row count of its URLImport, keyed by
+the owner and the SHA-256 of the file, so importing the same file again
+skips the rows already done. Rows are also deduplicated against existing
+links, so even a chunk that is replayed creates nothing twice.
+"""
+
+import csv
+import hashlib
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk import CREATED, EXISTING, FAILED, shorten_urls
+from .models.url_shortening import URLImport
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+IMPORT_FORMATS = ["csv", "ndjson"]
+
+IMPORT_COLUMNS = ["original_url", "shortened_slug", "expiration_date"]
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def source_digest(handle, block_size=1 << 20):
+    """
+    SHA-256 of a binary file, read in blocks. Leaves the file at its start.
+    """
+    digest = hashlib.sha256()
+    for block in iter(lambda: handle.read(block_size), b""):
+        digest.update(block)
+    handle.seek(0)
+    return digest.hexdigest()
+
+
+def read_rows(handle, import_format):
+    """
+    Yields one item per row of a text stream. Blank cells are left out;
+    NDJSON lines that are not JSON objects are yielded as is, and rejected
+    by shorten_urls.
+    """
+    if import_format == "csv":
+        for row in csv.DictReader(handle):
+            yield {
+                column: row[column].strip()
+                for column in IMPORT_COLUMNS
+                if row.get(column) and row[column].strip()
+            }
+        return
+    for line in handle:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line
+            continue
+        if isinstance(record, dict):
+            record = {
+                column: record[column]
+                for column in IMPORT_COLUMNS
+                if record.get(column) not in (None, "")
+            }
+        yield record
+
+
+def import_urls(owner, rows, digest, chunk_size=DEFAULT_CHUNK_SIZE, on_chunk=None):
+    """
+    Shortens rows for owner, resuming the URLImport of this digest. After
+    each chunk, calls on_chunk(job, rejects), where rejects lists the
+    (row number, error) of the chunk's failed rows. Returns the URLImport.
+    """
+    job, _ = URLImport.objects.get_or_create(owner=owner, digest=digest)
+    rows = iter(rows)
+    if job.rows_done:
+        logger.info(f"Resuming import {job.pk} after row {job.rows_done}")
+        for _ in islice(rows, job.rows_done):
+            pass
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        first_row = job.rows_done + 1
+        counts = {CREATED: 0, EXISTING: 0, FAILED: 0}
+        rejects = []
+        with transaction.atomic():
+            for offset, result in enumerate(shorten_urls(owner, chunk)):
+                counts[result.status] += 1
+                if result.status == FAILED:
+                    rejects.append((first_row + offset, result.error))
+            job.rows_done += len(chunk)
+            job.created += counts[CREATED]
+            job.existing += counts[EXISTING]
+            job.failed += counts[FAILED]
+            job.save(update_fields=["rows_done", "created", "existing", "failed"])
+        if on_chunk is not None:
+            on_chunk(job, rejects)
+
+    if job.completed_at is None:
+        job.completed_at = timezone.now()
+        job.save(update_fields=["completed_at"])
+    return job
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from api.retention import archive_clicks, get_retention_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves clicks older than the retention window (CLICK_RETENTION) into "
+        "compressed monthly archive files and deletes them in chunks. Rollups "
+        "and visitor sketches are kept, so analytics are unaffected."
+    )
+
+    def add_arguments(self, parser):
+        options = get_retention_settings()
+        parser.add_argument(
+            "--days",
+            type=int,
+            help=f"Retention window in days (default: {options['DAYS']}).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help=f"Clicks deleted per transaction (default: {options['CHUNK_SIZE']}).",
+        )
+        parser.add_argument(
+            "--dir",
+            dest="directory",
+            help=f"Archive directory (default: {options['ARCHIVE_DIR']}).",
+        )
+
+    def handle(self, *args, **options):
+        archives = archive_clicks(
+            days=options["days"],
+            chunk_size=options["chunk_size"],
+            directory=options["directory"],
+        )
+        for archive in archives:
+            self.stdout.write(f"{archive.path}: {archive.click_count} clicks")
+        total = sum(archive.click_count for archive in archives)
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {total} clicks into {len(archives)} files")
+        )
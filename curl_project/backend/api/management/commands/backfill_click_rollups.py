@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models.url_shortening import URL
+from api.rollups import rebuild_rollups
+from api.visitors import rebuild_visitor_sketches
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the hourly and daily click rollups and the unique visitor "
+        "sketches from the Click table, in chunks of URLs. Each chunk is "
+        "rebuilt in its own transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of URLs rebuilt per transaction (default: 100).",
+        )
+        parser.add_argument(
+            "--url",
+            action="append",
+            dest="urls",
+            help="UUID of a URL to rebuild. May be repeated; defaults to all URLs.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        urls = URL.objects.order_by("uuid")
+        if options["urls"]:
+            urls = urls.filter(uuid__in=options["urls"])
+
+        rebuilt = 0
+        rows = 0
+        last_uuid = None
+        while True:
+            chunk = urls if last_uuid is None else urls.filter(uuid__gt=last_uuid)
+            url_ids = list(chunk.values_list("uuid", flat=True)[:chunk_size])
+            if not url_ids:
+                break
+            last_uuid = url_ids[-1]
+            with transaction.atomic():
+                rows += rebuild_rollups(url_ids)
+                rebuild_visitor_sketches(url_ids)
+            rebuilt += len(url_ids)
+            self.stdout.write(f"Rebuilt rollups for {rebuilt} URLs")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {rows} rollup rows for {rebuilt} URLs")
+        )
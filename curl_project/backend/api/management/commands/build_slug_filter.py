@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.slug_filter import SlugFilter, get_filter_settings, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the slug Bloom filter from the database and writes a snapshot "
+        "that workers load at startup instead of scanning every slug."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            help="Snapshot file to write (default: SLUG_FILTER['SNAPSHOT_PATH']).",
+        )
+
+    def handle(self, *args, **options):
+        filter_settings = get_filter_settings()
+        path = options["path"] or filter_settings["SNAPSHOT_PATH"]
+        if not path:
+            raise CommandError("No snapshot path given and SLUG_FILTER_SNAPSHOT_PATH is not set")
+
+        slug_filter = SlugFilter(filter_settings)
+        slug_filter.rebuild()
+        write_snapshot(slug_filter.bloom, slug_filter.watermark, path)
+
+        stats = slug_filter.stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote slug filter with {stats['slugs']} slugs "
+                f"({stats['size_bytes']} bytes) to {path}"
+            )
+        )
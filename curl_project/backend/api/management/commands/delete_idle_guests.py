@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+
+from api.guests import delete_idle_guests, get_guest_cleanup_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes guest users idle past a threshold (no login, new link or click) "
+        "with their links and clicks, in chunks of users and bounded batches of "
+        "rows, leaf tables first."
+    )
+
+    def add_arguments(self, parser):
+        options = get_guest_cleanup_settings()
+        parser.add_argument(
+            "--idle-days",
+            type=int,
+            help=(
+                "Days without activity before a guest is deleted "
+                f"(default: {options['IDLE_DAYS']})."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help=f"Guests deleted per chunk (default: {options['CHUNK_SIZE']}).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help=f"Rows removed per DELETE (default: {options['BATCH_SIZE']}).",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=0,
+            help="Maximum DELETE statements per second (default: no limit).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the guests and rows that would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        def report(totals):
+            self.stdout.write(self.summarize(totals))
+
+        totals = delete_idle_guests(
+            idle_days=options["idle_days"],
+            chunk_size=options["chunk_size"],
+            batch_size=options["batch_size"],
+            rate=options["rate_limit"],
+            dry_run=options["dry_run"],
+            on_chunk=report,
+        )
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {self.summarize(totals)}"))
+
+    def summarize(self, totals):
+        details = ", ".join(
+            f"{count} {name}" for name, count in totals.items() if name != "users"
+        )
+        return f"{totals['users']} guests ({details})"
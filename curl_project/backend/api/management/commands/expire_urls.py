@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.expiry import get_expiry_settings, sweep_expired_urls
+
+
+class Command(BaseCommand):
+    help = (
+        "Deactivates links whose expiration date has passed, in batches, and "
+        "drops them from the redirect caches. Run it from cron, or with --loop "
+        "to keep sweeping every EXPIRY_SWEEPER['INTERVAL'] seconds."
+    )
+
+    def add_arguments(self, parser):
+        options = get_expiry_settings()
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help=f"Links deactivated per transaction (default: {options['BATCH_SIZE']}).",
+        )
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep sweeping until interrupted."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=options["INTERVAL"],
+            help=f"Seconds between sweeps with --loop (default: {options['INTERVAL']}).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = sweep_expired_urls(batch_size=options["batch_size"])
+            self.stdout.write(
+                f"Deactivated {stats['expired']} expired links "
+                f"in {stats['batches']} batches"
+            )
+            if not options["loop"]:
+                break
+            close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,61 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import (
+    DEFAULT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    STREAMERS,
+    export_rows,
+    write_parquet,
+)
+from api.models.analytics import Click
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports raw clicks as CSV, NDJSON or Parquet, streaming rows through a "
+        "server-side cursor so memory use does not grow with the export size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument(
+            "--output",
+            help="File to write to. Defaults to stdout (not available for parquet).",
+        )
+        parser.add_argument("--url", help="Only export clicks of this URL UUID.")
+        parser.add_argument("--owner", help="Only export clicks of this user's URLs.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Rows fetched and encoded at a time (default: {DEFAULT_CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        clicks = Click.objects.all()
+        if options["url"]:
+            clicks = clicks.filter(url_id=options["url"])
+        if options["owner"]:
+            clicks = clicks.filter(url__owner_id=options["owner"])
+        rows = export_rows(clicks, chunk_size=options["chunk_size"])
+
+        if options["format"] == "parquet":
+            if not options["output"]:
+                raise CommandError("Parquet exports need --output")
+            try:
+                written = write_parquet(rows, options["output"], options["chunk_size"])
+            except ImportError:
+                raise CommandError("Parquet export needs the pyarrow package")
+            self.stderr.write(self.style.SUCCESS(f"Exported {written} clicks"))
+            return
+
+        chunks = STREAMERS[options["format"]](rows, options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", newline="") as handle:
+                handle.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+        self.stderr.write(self.style.SUCCESS("Export complete"))
@@ -0,0 +1,85 @@
+import csv
+import io
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import (
+    DEFAULT_CHUNK_SIZE,
+    IMPORT_FORMATS,
+    import_urls,
+    read_rows,
+    source_digest,
+)
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports links from a CSV or NDJSON file with original_url and optional "
+        "shortened_slug and expiration_date columns, a chunk at a time. Running "
+        "it again on the same file resumes where an interrupted run stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import.")
+        parser.add_argument("--owner", required=True, help="Username owning the links.")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="Input format. Defaults to the file extension.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Rows shortened per transaction (default: {DEFAULT_CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--rejects",
+            help="CSV file to write rejected rows to. Defaults to stderr.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        import_format = options["format"] or path.suffix.lstrip(".").lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f"Cannot tell the format of {path}; pass --format")
+        try:
+            owner = User.objects.get(username=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['owner']}")
+
+        rejects_file = None
+        if options["rejects"]:
+            rejects_file = open(options["rejects"], "a", newline="")
+        rejects = csv.writer(rejects_file or self.stderr)
+
+        def report(job, chunk_rejects):
+            rejects.writerows(chunk_rejects)
+            self.stdout.write(
+                f"{job.rows_done} rows: {job.created} created, "
+                f"{job.existing} existing, {job.failed} rejected"
+            )
+
+        try:
+            with open(path, "rb") as handle:
+                digest = source_digest(handle)
+                text = io.TextIOWrapper(handle, encoding="utf-8-sig", newline="")
+                job = import_urls(
+                    owner,
+                    read_rows(text, import_format),
+                    digest,
+                    chunk_size=options["chunk_size"],
+                    on_chunk=report,
+                )
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {job.rows_done} rows: {job.created} created, "
+                f"{job.existing} existing, {job.failed} rejected"
+            )
+        )
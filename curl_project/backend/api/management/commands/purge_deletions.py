@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.deletions import get_deletion_settings, process_deletions
+
+
+class Command(BaseCommand):
+    help = (
+        "Purges accounts and links whose deletion was requested, with their "
+        "clicks, in bounded batches of rows, leaf tables first. Run it from "
+        "cron, or with --loop to keep polling every DELETION_WORKER['INTERVAL'] "
+        "seconds."
+    )
+
+    def add_arguments(self, parser):
+        options = get_deletion_settings()
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help=f"Rows removed per DELETE (default: {options['BATCH_SIZE']}).",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=0,
+            help="Maximum DELETE statements per second (default: no limit).",
+        )
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep polling until interrupted."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=options["INTERVAL"],
+            help=f"Seconds between polls with --loop (default: {options['INTERVAL']}).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            completed = process_deletions(
+                batch_size=options["batch_size"], rate=options["rate_limit"]
+            )
+            if completed or not options["loop"]:
+                self.stdout.write(f"Completed {completed} deletion jobs")
+            if not options["loop"]:
+                break
+            close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.counters import COUNTED_DIMENSIONS, get_counter
+from api.models.analytics import Click
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes click_count on the dimension tables from the Click table, "
+        "in chunks of dimension rows. Run after repairing or deleting click data, "
+        "or after a click writer was killed before flushing its counts. "
+        "Archived clicks (see archive_clicks) are no longer counted. Counts "
+        "other running processes have not flushed yet are added on top once "
+        "they flush, so stop the click writers first for exact counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Number of dimension rows recounted per query (default: 200).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        # Counts this process recorded are in the Click table already.
+        get_counter().flush()
+        for model, attribute in COUNTED_DIMENSIONS:
+            updated = 0
+            last_pk = None
+            counts = (
+                Click.objects.filter(**{attribute: OuterRef("pk")})
+                .order_by()
+                .values(attribute)
+                .annotate(total=Count("pk"))
+                .values("total")
+            )
+            while True:
+                rows = model.objects.order_by("pk")
+                if last_pk is not None:
+                    rows = rows.filter(pk__gt=last_pk)
+                pks = list(rows.values_list("pk", flat=True)[:chunk_size])
+                if not pks:
+                    break
+                last_pk = pks[-1]
+
+                # Counted and written in one statement, so increments flushed
+                # meanwhile are not overwritten with an older count.
+                model.objects.filter(pk__in=pks).update(
+                    click_count=Coalesce(Subquery(counts), 0)
+                )
+                updated += len(pks)
+
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt click_count for {updated} {model.__name__} rows")
+            )
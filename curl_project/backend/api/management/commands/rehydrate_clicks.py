@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import EXPORT_FORMATS, STREAMERS, write_parquet
+from api.retention import archived_rows
+
+
+def month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"Invalid month {value}, expected YYYY-MM")
+
+
+class Command(BaseCommand):
+    help = (
+        "Reads archived clicks for a range of months back out of the archive "
+        "files and writes them in an export format, for one-off exports. The "
+        "Click table is not modified."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", required=True, help="First month, YYYY-MM.")
+        parser.add_argument("--to", dest="end", help="Last month, YYYY-MM (default: --from).")
+        parser.add_argument("--url", help="Only include clicks of this URL UUID.")
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument(
+            "--output",
+            help="File to write to. Defaults to stdout (not available for parquet).",
+        )
+
+    def handle(self, *args, **options):
+        start = month(options["start"])
+        end = month(options["end"] or options["start"])
+        rows = archived_rows(start, end, url_id=options["url"])
+
+        if options["format"] == "parquet":
+            if not options["output"]:
+                raise CommandError("Parquet exports need --output")
+            try:
+                written = write_parquet(rows, options["output"])
+            except ImportError:
+                raise CommandError("Parquet export needs the pyarrow package")
+            self.stderr.write(self.style.SUCCESS(f"Rehydrated {written} clicks"))
+            return
+
+        chunks = STREAMERS[options["format"]](rows)
+        if options["output"]:
+            with open(options["output"], "w", newline="") as handle:
+                handle.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+        self.stderr.write(self.style.SUCCESS("Rehydration complete"))
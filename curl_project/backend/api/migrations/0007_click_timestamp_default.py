@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_click_redirected"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="click",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+DIMENSIONS = [
+    ("Browser", "browser_name", "browser"),
+    ("Country", "country_name", "country"),
+    ("Device", "device_type", "device"),
+    ("Platform", "platform_name", "platform"),
+]
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """
+    get_or_create could race and insert the same name twice. Keep one row per
+    name, point its clicks at the survivor and drop the rest.
+    """
+    Click = apps.get_model("api", "Click")
+    for model_name, field, click_field in DIMENSIONS:
+        model = apps.get_model("api", model_name)
+        duplicates = (
+            model.objects.values(field).annotate(rows=Count("pk")).filter(rows__gt=1)
+        )
+        for duplicate in duplicates:
+            rows = model.objects.filter(**{field: duplicate[field]}).order_by("pk")
+            survivor = rows.first()
+            others = rows.exclude(pk=survivor.pk)
+            Click.objects.filter(**{f"{click_field}__in": others}).update(
+                **{click_field: survivor}
+            )
+            extra = others.aggregate(total=Sum("click_count"))["total"] or 0
+            model.objects.filter(pk=survivor.pk).update(
+                click_count=survivor.click_count + extra
+            )
+            others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_click_timestamp_default"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="browser",
+            name="browser_name",
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="country",
+            name="country_name",
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="device",
+            name="device_type",
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="platform",
+            name="platform_name",
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_unique_dimension_names"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SlugSequence",
+            fields=[
+                (
+                    "length",
+                    models.PositiveSmallIntegerField(primary_key=True, serialize=False),
+                ),
+                ("next_value", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
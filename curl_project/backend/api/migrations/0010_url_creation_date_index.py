@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_slugsequence"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="url",
+            name="creation_date",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
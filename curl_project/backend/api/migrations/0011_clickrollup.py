@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_url_creation_date_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClickRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=4
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("redirected", models.BooleanField()),
+                ("click_count", models.IntegerField(default=0)),
+                ("first_click", models.DateTimeField()),
+                ("last_click", models.DateTimeField()),
+                (
+                    "browser",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT, to="api.browser"
+                    ),
+                ),
+                (
+                    "country",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT, to="api.country"
+                    ),
+                ),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT, to="api.device"
+                    ),
+                ),
+                (
+                    "platform",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT, to="api.platform"
+                    ),
+                ),
+                (
+                    "url",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api.url"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "url",
+                            "granularity",
+                            "bucket",
+                            "country",
+                            "browser",
+                            "platform",
+                            "device",
+                            "redirected",
+                        ),
+                        name="unique_click_rollup",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_clickrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VisitorSketch",
+            fields=[
+                (
+                    "url",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="api.url",
+                    ),
+                ),
+                ("sketch", models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyVisitorSketch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("sketch", models.BinaryField()),
+                (
+                    "url",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api.url"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("url", "day"), name="unique_daily_visitors"
+                    )
+                ],
+            },
+        ),
+    ]
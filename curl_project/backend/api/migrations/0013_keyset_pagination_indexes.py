@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_visitor_sketches"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="click",
+            index=models.Index(
+                fields=["timestamp", "click_id"], name="click_timestamp_keyset"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="click",
+            index=models.Index(
+                fields=["url", "timestamp", "click_id"],
+                name="click_url_timestamp_keyset",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="url",
+            index=models.Index(
+                fields=["owner", "creation_date", "uuid"],
+                name="url_owner_created_keyset",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["date_joined", "uuid"], name="user_joined_keyset"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+from api.utils import url_hash
+
+
+def hash_original_urls(apps, schema_editor):
+    URL = apps.get_model("api", "URL")
+    batch = []
+    for url in URL.objects.only("uuid", "original_url").iterator(chunk_size=2000):
+        url.original_url_hash = url_hash(url.original_url)
+        batch.append(url)
+        if len(batch) >= 2000:
+            URL.objects.bulk_update(batch, ["original_url_hash"])
+            batch = []
+    URL.objects.bulk_update(batch, ["original_url_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_clickarchive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="url",
+            name="original_url_hash",
+            field=models.CharField(default="", editable=False, max_length=64),
+        ),
+        migrations.RunPython(hash_original_urls, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="url",
+            index=models.Index(
+                fields=["owner", "original_url_hash"], name="url_owner_hash"
+            ),
+        ),
+    ]
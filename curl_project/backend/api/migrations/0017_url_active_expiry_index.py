@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_urlimport"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="url",
+            index=models.Index(
+                fields=["is_active", "expiration_date"], name="url_active_expiry"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_creation_dates(apps, schema_editor):
+    URL = apps.get_model("api", "URL")
+    URL.objects.update(slug_changed_at=models.F("creation_date"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_deletion_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="url",
+            name="slug_changed_at",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.RunPython(copy_creation_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_url_slug_changed_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deletionjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
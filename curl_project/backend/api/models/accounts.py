@@ -65,6 +65,14 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the user list by (date_joined, uuid).
+            models.Index(fields=["date_joined", "uuid"], name="user_joined_keyset"),
+            # Finding idle guests by (user_type, last_login).
+            models.Index(fields=["user_type", "last_login"], name="user_type_last_login"),
+        ]
+
     def __str__(self):
         return self.username
 
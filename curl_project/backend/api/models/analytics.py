@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 from .accounts import User
 from .url_shortening import URL
 
@@ -8,7 +9,8 @@ class Click(models.Model):
     click_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     url = models.ForeignKey(URL, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the click happens, not when the batched writer inserts it.
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField()
     country = models.ForeignKey(
         "Country", on_delete=models.SET_NULL, null=True, blank=True
@@ -24,10 +26,19 @@ class Click(models.Model):
     )
     redirected = models.BooleanField(default=False)
 
+    class Meta:
+        # Keyset pagination orders by (timestamp, click_id), optionally per URL.
+        indexes = [
+            models.Index(fields=["timestamp", "click_id"], name="click_timestamp_keyset"),
+            models.Index(
+                fields=["url", "timestamp", "click_id"], name="click_url_timestamp_keyset"
+            ),
+        ]
+
 
 class Device(models.Model):
     device_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    device_type = models.CharField(max_length=100)
+    device_type = models.CharField(max_length=100, unique=True)
     click_count = models.IntegerField(default=0)
 
     def __str__(self):
@@ -36,7 +47,7 @@ class Device(models.Model):
 
 class Browser(models.Model):
     browser_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    browser_name = models.CharField(max_length=100)
+    browser_name = models.CharField(max_length=100, unique=True)
     click_count = models.IntegerField(default=0)
 
     def __str__(self):
@@ -45,7 +56,7 @@ class Browser(models.Model):
 
 class Country(models.Model):
     country_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    country_name = models.CharField(max_length=100)
+    country_name = models.CharField(max_length=100, unique=True)
     click_count = models.IntegerField(default=0)
 
     def __str__(self):
@@ -54,8 +65,99 @@ class Country(models.Model):
 
 class Platform(models.Model):
     platform_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    platform_name = models.CharField(max_length=100)
+    platform_name = models.CharField(max_length=100, unique=True)
     click_count = models.IntegerField(default=0)
 
     def __str__(self):
         return self.platform_name
+
+
+class ClickRollup(models.Model):
+    """
+    Pre-aggregated click counts per URL, time bucket and dimension values.
+    Maintained by the click writer (see api/rollups.py).
+    """
+
+    HOUR = "hour"
+    DAY = "day"
+    GRANULARITIES = [(HOUR, "Hour"), (DAY, "Day")]
+
+    url = models.ForeignKey(URL, on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES)
+    bucket = models.DateTimeField()
+    country = models.ForeignKey("Country", on_delete=models.PROTECT)
+    browser = models.ForeignKey("Browser", on_delete=models.PROTECT)
+    platform = models.ForeignKey("Platform", on_delete=models.PROTECT)
+    device = models.ForeignKey("Device", on_delete=models.PROTECT)
+    redirected = models.BooleanField()
+    click_count = models.IntegerField(default=0)
+    first_click = models.DateTimeField()
+    last_click = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "url",
+                    "granularity",
+                    "bucket",
+                    "country",
+                    "browser",
+                    "platform",
+                    "device",
+                    "redirected",
+                ],
+                name="unique_click_rollup",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.url_id} {self.granularity} {self.bucket}: {self.click_count}"
+
+
+class VisitorSketch(models.Model):
+    """
+    HyperLogLog sketch of every IP address that visited a URL (see api/hll.py).
+    """
+
+    url = models.OneToOneField(URL, on_delete=models.CASCADE, primary_key=True)
+    sketch = models.BinaryField()
+
+    def __str__(self):
+        return f"Visitors of {self.url_id}"
+
+
+class DailyVisitorSketch(models.Model):
+    """
+    HyperLogLog sketch of the IP addresses that visited a URL on one UTC day.
+    """
+
+    url = models.ForeignKey(URL, on_delete=models.CASCADE)
+    day = models.DateField()
+    sketch = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["url", "day"], name="unique_daily_visitors")
+        ]
+
+    def __str__(self):
+        return f"Visitors of {self.url_id} on {self.day}"
+
+
+class ClickArchive(models.Model):
+    """
+    A compressed file holding the archived clicks of one month for the URLs
+    whose UUID starts with url_prefix (see api/retention.py).
+    """
+
+    month = models.DateField(db_index=True)
+    url_prefix = models.CharField(max_length=1)
+    path = models.CharField(max_length=500, unique=True)
+    click_count = models.IntegerField()
+    first_click = models.DateTimeField()
+    last_click = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.path
@@ -2,15 +2,31 @@ from django.db import models
 from django.utils import timezone
 from django.conf import settings
 from .accounts import User
+from ..utils import url_hash
 import uuid
 
 
+class URLManager(models.Manager):
+    """
+    Hides links awaiting deletion (see api/deletions.py).
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(pending_deletion=False)
+
+
 class URL(models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     original_url = models.URLField(max_length=2000)
+    # Digest of the canonical original_url (see api.utils.url_hash), so
+    # duplicate detection is an index probe instead of a scan.
+    original_url_hash = models.CharField(max_length=64, editable=False, default="")
     shortened_slug = models.CharField(max_length=50, unique=True)
-    creation_date = models.DateTimeField(auto_now_add=True)
+    creation_date = models.DateTimeField(auto_now_add=True, db_index=True)
+    # When the slug was created or last renamed, so every worker's slug
+    # filter can pick up renames as well as new links (see api/slug_filter.py).
+    slug_changed_at = models.DateTimeField(default=timezone.now, db_index=True, editable=False)
     customized = models.BooleanField(
         verbose_name="Customized URL",
         default=False,
@@ -27,10 +43,47 @@ class URL(models.Model):
         blank=True,
         help_text="The date and time when the shortened URL will expire.",
     )
+    # Set when the link's deletion is requested; a background worker purges
+    # it and its clicks later (see api/deletions.py).
+    pending_deletion = models.BooleanField(default=False, editable=False)
+
+    objects = URLManager()
+    # Includes links pending deletion, e.g. for slug uniqueness checks.
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's URLs by (creation_date, uuid).
+            models.Index(
+                fields=["owner", "creation_date", "uuid"], name="url_owner_created_keyset"
+            ),
+            models.Index(fields=["owner", "original_url_hash"], name="url_owner_hash"),
+            # The expiry sweeper reads active links in expiration order.
+            models.Index(fields=["is_active", "expiration_date"], name="url_active_expiry"),
+        ]
 
     def __str__(self):
         return self.original_url
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the slug as loaded so a rename can invalidate the old cache entry.
+        instance._loaded_slug = instance.__dict__.get("shortened_slug")
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.original_url_hash = url_hash(self.original_url)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "original_url" in update_fields:
+            update_fields = kwargs["update_fields"] = {*update_fields, "original_url_hash"}
+        loaded_slug = getattr(self, "_loaded_slug", None)
+        if loaded_slug is not None and loaded_slug != self.shortened_slug:
+            self.slug_changed_at = timezone.now()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "slug_changed_at"}
+        super().save(*args, **kwargs)
+
     @property
     def active_status(self):
         return "Active" if self.is_active else "Not Active"
@@ -54,3 +107,78 @@ class URL(models.Model):
         domain = Site.objects.get_current().domain
         protocol = 'https' if not settings.DEBUG else 'http'
         return f'{protocol}://{domain}/{self.shortened_slug}'
+
+
+class SlugSequence(models.Model):
+    """
+    High-water mark of leased slug IDs for one slug length (see api/slugs.py).
+    """
+
+    length = models.PositiveSmallIntegerField(primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.length}: {self.next_value}"
+
+
+class URLImport(models.Model):
+    """
+    Progress of one bulk import of a source file into an owner's links
+    (see api/imports.py), so an interrupted import resumes where it stopped.
+    """
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    digest = models.CharField(max_length=64)
+    rows_done = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    existing = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "digest"], name="unique_url_import")
+        ]
+
+    def __str__(self):
+        return f"Import {self.digest[:12]} for {self.owner_id}: {self.rows_done} rows"
+
+
+class DeletionJob(models.Model):
+    """
+    Progress of purging a deleted account or link in the background (see
+    api/deletions.py). The target is gone once the job completes, so it is
+    referenced by id rather than by a foreign key.
+    """
+
+    ACCOUNT = "account"
+    LINK = "link"
+    KINDS = [(ACCOUNT, "Account"), (LINK, "Link")]
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    STATUSES = [(PENDING, "Pending"), (RUNNING, "Running"), (DONE, "Done")]
+
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=7, choices=KINDS)
+    target_id = models.UUIDField()
+    status = models.CharField(max_length=7, choices=STATUSES, default=PENDING)
+    # Rows deleted so far, per table.
+    rows = models.JSONField(default=dict)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker holding the job after every batch, so another
+    # worker can tell a running job from one whose worker died.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker reads outstanding jobs oldest first.
+            models.Index(fields=["status", "requested_at"], name="deletion_status_requested"),
+        ]
+
+    def __str__(self):
+        return f"Deletion of {self.kind} {self.target_id}: {self.status}"
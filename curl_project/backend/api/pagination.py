@@ -0,0 +1,157 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are ordered by the view's `ordering`, a tuple of fields ending in a
+unique one, e.g. ("-timestamp", "-click_id"). A cursor holds the ordering
+values of the last row served and the next page is fetched with a WHERE on
+those values, so with a matching composite index every page costs the same
+no matter how deep it is, unlike OFFSET.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+from datetime import date
+from uuid import UUID
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(view.ordering)
+        self.fields = [field.lstrip("-") for field in self.ordering]
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        backwards = bool(cursor and cursor["previous"])
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(_invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            queryset = queryset.filter(self.after(cursor["position"], ordering))
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if backwards:
+            rows.reverse()
+
+        # Moving back from a page means there is a page after it, and vice versa.
+        self.has_next = has_more if not backwards else True
+        self.has_previous = bool(cursor) if not backwards else has_more
+        self.first = self.position(rows[0]) if rows else None
+        self.last = self.position(rows[-1]) if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def after(self, position, ordering):
+        """
+        Rows strictly after position in the given ordering. The leading
+        range condition lets the database seek on the composite index.
+        """
+        lookups = [
+            (field.lstrip("-"), "lt" if field.startswith("-") else "gt")
+            for field in ordering
+        ]
+        first_field, first_op = lookups[0]
+        condition = Q()
+        for index, (field, op) in enumerate(lookups):
+            equal = {name: position[name] for name, _ in lookups[:index]}
+            condition |= Q(**equal, **{f"{field}__{op}": position[field]})
+        return Q(**{f"{first_field}__{first_op}e": position[first_field]}) & condition
+
+    def position(self, row):
+        return {field: getattr(row, field) for field in self.fields}
+
+    def encode_cursor(self, position, previous):
+        payload = {
+            "p": [_dump(position[field]) for field in self.fields],
+            "r": previous,
+        }
+        cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position = {
+                field: self.model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, payload["p"], strict=True)
+            }
+            return {"position": position, "previous": bool(payload["r"])}
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, previous=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            # An empty page past the end; go back to the start.
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.first, previous=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+def _invert(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def _dump(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
@@ -0,0 +1,292 @@
+"""
+Click retention and archival.
+
+Clicks older than CLICK_RETENTION["DAYS"] are moved, a whole UTC month at a
+time, into gzipped NDJSON files partitioned by month and by the first hex
+digit of the URL's UUID, and are then deleted in short chunked transactions.
+Analytics keep working from the rollups and visitor sketches, which are not
+archived, so the Click table only holds the retention window.
+
+Deletion works from the ids read back out of the finished file, so only
+clicks that are safely on disk are removed, and subtracts them from the
+dimension click_count, which counts the clicks in the Click table. Archived
+months can be read back with archived_rows() for a one-off export (see
+rehydrate_clicks).
+
+Archived clicks keep the owner and IP address, so they are personal data
+like live ones: purge_archived_clicks() rewrites the files holding clicks
+of deleted accounts or links without them (see api/deletions.py).
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from pathlib import Path
+from uuid import UUID
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .counters import COUNTED_DIMENSIONS, subtract_click_counts
+from .exports import EXPORT_COLUMNS
+from .models.analytics import Click, ClickArchive
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "DAYS": 395,
+    "ARCHIVE_DIR": "archive",
+    "CHUNK_SIZE": 5000,
+}
+
+URL_PREFIXES = "0123456789abcdef"
+
+# The export columns, plus what is needed to attribute a click to a user.
+ARCHIVE_COLUMNS = dict(EXPORT_COLUMNS, owner_id="owner_id")
+
+
+def get_retention_settings():
+    options = dict(DEFAULT_SETTINGS)
+    options.update(getattr(settings, "CLICK_RETENTION", {}))
+    return options
+
+
+def month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime.combine(moment.date().replace(day=1), time(), tzinfo=dt_timezone.utc)
+
+
+def next_month(month):
+    return month_start(month.replace(day=28) + timedelta(days=4))
+
+
+def archive_horizon():
+    """
+    Returns the moment before which clicks have been archived, or None.
+    Rebuilds from Click must not touch rollups before it.
+    """
+    latest = ClickArchive.objects.aggregate(latest=Max("month"))["latest"]
+    if latest is None:
+        return None
+    return next_month(datetime.combine(latest, time(), tzinfo=dt_timezone.utc))
+
+
+def clicks_in_partition(month, prefix):
+    clicks = Click.objects.filter(
+        timestamp__gte=month,
+        timestamp__lt=next_month(month),
+        url_id__gte=UUID(prefix.ljust(32, "0")),
+    )
+    following = URL_PREFIXES.index(prefix) + 1
+    if following < len(URL_PREFIXES):
+        clicks = clicks.filter(url_id__lt=UUID(URL_PREFIXES[following].ljust(32, "0")))
+    return clicks
+
+
+def _encode(value):
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def archive_path(directory, month, prefix):
+    stamp = timezone.now().strftime("%Y%m%dT%H%M%S%f")
+    return Path(directory) / f"clicks-{month:%Y-%m}-{prefix}-{stamp}.ndjson.gz"
+
+
+def _commit_file(partial, path):
+    with open(partial, "rb") as handle:
+        os.fsync(handle.fileno())
+    os.replace(partial, path)
+
+
+def archive_partition(month, prefix, directory, chunk_size):
+    """
+    Writes one month/prefix partition to a new archive file, records it and
+    deletes the archived clicks. Returns the ClickArchive, or None if the
+    partition was empty.
+    """
+    clicks = clicks_in_partition(month, prefix)
+    rows = (
+        clicks.order_by("timestamp", "click_id")
+        .values_list(*ARCHIVE_COLUMNS.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    path = archive_path(directory, month, prefix)
+    partial = path.with_name(path.name + ".partial")
+
+    timestamp = list(ARCHIVE_COLUMNS).index("timestamp")
+    count = 0
+    first_click = last_click = None
+    with gzip.open(partial, "wt") as handle:
+        for row in rows:
+            record = dict(zip(ARCHIVE_COLUMNS, (_encode(value) for value in row)))
+            handle.write(json.dumps(record) + "\n")
+            count += 1
+            first_click = first_click or row[timestamp]
+            last_click = row[timestamp]
+    if not count:
+        partial.unlink()
+        return None
+    _commit_file(partial, path)
+
+    archive = ClickArchive.objects.create(
+        month=month.date(),
+        url_prefix=prefix,
+        path=str(path),
+        click_count=count,
+        first_click=first_click,
+        last_click=last_click,
+    )
+    deleted = delete_archived_clicks(path, chunk_size)
+    logger.info(f"Archived {count} clicks to {path}, deleted {deleted}")
+    return archive
+
+
+def delete_archived_clicks(path, chunk_size):
+    """
+    Deletes the clicks listed in an archive file, chunk_size at a time, each
+    chunk in its own short transaction.
+    """
+    deleted = 0
+    chunk = []
+    for record in read_archive(path):
+        chunk.append(record["click_id"])
+        if len(chunk) >= chunk_size:
+            deleted += _delete_chunk(chunk)
+            chunk = []
+    if chunk:
+        deleted += _delete_chunk(chunk)
+    return deleted
+
+
+def _delete_chunk(click_ids):
+    attributes = [attribute for _, attribute in COUNTED_DIMENSIONS]
+    with transaction.atomic():
+        # Locked, so clicks another process deletes meanwhile are not
+        # subtracted twice.
+        rows = list(
+            Click.objects.select_for_update()
+            .filter(click_id__in=click_ids)
+            .values_list("click_id", *attributes)
+        )
+        deleted, _ = Click.objects.filter(click_id__in=[row[0] for row in rows]).delete()
+        subtract_click_counts([row[1:] for row in rows])
+    return deleted
+
+
+def archive_clicks(days=None, chunk_size=None, directory=None):
+    """
+    Archives every whole month older than the retention window. Returns the
+    ClickArchive rows created.
+    """
+    options = get_retention_settings()
+    days = options["DAYS"] if days is None else days
+    chunk_size = chunk_size or options["CHUNK_SIZE"]
+    directory = Path(directory or options["ARCHIVE_DIR"])
+    directory.mkdir(parents=True, exist_ok=True)
+
+    cutoff = month_start(timezone.now() - timedelta(days=days))
+    oldest = Click.objects.filter(timestamp__lt=cutoff).aggregate(
+        oldest=Min("timestamp")
+    )["oldest"]
+    archives = []
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        for prefix in URL_PREFIXES:
+            archive = archive_partition(month, prefix, directory, chunk_size)
+            if archive is not None:
+                archives.append(archive)
+        month = next_month(month)
+    return archives
+
+
+def purge_archived_clicks(owner_ids=(), url_ids=()):
+    """
+    Rewrites every archive file holding clicks of these owners or URLs
+    without them, and updates its ClickArchive. Returns the number of
+    clicks removed.
+    """
+    owner_ids = {str(owner_id) for owner_id in owner_ids}
+    url_ids = {str(url_id) for url_id in url_ids}
+    if not owner_ids and not url_ids:
+        return 0
+    archives = ClickArchive.objects.order_by("month", "url_prefix", "created_at")
+    if not owner_ids:
+        # A link's clicks are only in the partitions of its prefix.
+        archives = archives.filter(url_prefix__in={url_id[0] for url_id in url_ids})
+    removed = 0
+    for pk in archives.values_list("pk", flat=True):
+        removed += _scrub_archive(pk, owner_ids, url_ids)
+    return removed
+
+
+def _scrub_archive(pk, owner_ids, url_ids):
+    with transaction.atomic():
+        # Held while the file is rewritten, so two purges of one file do not
+        # overwrite each other.
+        archive = ClickArchive.objects.select_for_update().get(pk=pk)
+        old_path = Path(archive.path)
+        month = datetime.combine(archive.month, time(), tzinfo=dt_timezone.utc)
+        path = archive_path(old_path.parent, month, archive.url_prefix)
+        partial = path.with_name(path.name + ".partial")
+
+        kept = removed = 0
+        first_click = last_click = None
+        with gzip.open(partial, "wt") as handle:
+            for record in read_archive(old_path):
+                if record["owner_id"] in owner_ids or record["url_id"] in url_ids:
+                    removed += 1
+                    continue
+                handle.write(json.dumps(record) + "\n")
+                kept += 1
+                first_click = first_click or record["timestamp"]
+                last_click = record["timestamp"]
+        if not removed:
+            partial.unlink()
+            return 0
+        _commit_file(partial, path)
+
+        archive.path = str(path)
+        archive.click_count = kept
+        if kept:
+            archive.first_click = parse_datetime(first_click)
+            archive.last_click = parse_datetime(last_click)
+        # An emptied file is kept, so the archive horizon does not move back.
+        archive.save(update_fields=["path", "click_count", "first_click", "last_click"])
+    old_path.unlink(missing_ok=True)
+    logger.info(f"Removed {removed} clicks of deleted owners or links from {path}")
+    return removed
+
+
+def read_archive(path):
+    with gzip.open(path, "rt") as handle:
+        for line in handle:
+            yield json.loads(line)
+
+
+def archived_rows(start, end, url_id=None):
+    """
+    Yields archived clicks of the months from start to end (dates, inclusive)
+    as tuples in EXPORT_COLUMNS order, optionally only for one URL.
+    """
+    archives = ClickArchive.objects.filter(
+        month__gte=start.replace(day=1), month__lte=end.replace(day=1)
+    ).order_by("month", "url_prefix", "created_at")
+    if url_id is not None:
+        url_id = str(UUID(str(url_id)))
+        archives = archives.filter(url_prefix=url_id[0])
+    for archive in archives:
+        for record in read_archive(archive.path):
+            if url_id is not None and record["url_id"] != url_id:
+                continue
+            record["timestamp"] = parse_datetime(record["timestamp"])
+            yield tuple(record[column] for column in EXPORT_COLUMNS)
@@ -0,0 +1,347 @@
+"""
+Hourly and daily click rollups.
+
+Every batch written by the click writer is folded into ClickRollup rows keyed
+by url, bucket and dimension values, using one INSERT ... ON CONFLICT DO
+UPDATE per batch so concurrent writers add to the same rows safely. Analytics
+read the rollups instead of scanning Click, so their cost depends on the
+number of distinct (bucket, dimension) combinations, not on raw traffic.
+
+Clicks with a missing dimension (e.g. written before dimensions were
+resolved at ingest, or whose dimension row was deleted) are rolled up under
+"Unknown".
+"""
+
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+from .models.analytics import Click, ClickRollup
+from .dimensions import get_registry
+from .retention import archive_horizon
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+GRANULARITIES = [ClickRollup.HOUR, ClickRollup.DAY]
+
+# Columns identifying a rollup row, in the order of the unique constraint.
+KEY_FIELDS = [
+    "url",
+    "granularity",
+    "bucket",
+    "country",
+    "browser",
+    "platform",
+    "device",
+    "redirected",
+]
+DIMENSION_FIELDS = ["country", "browser", "platform", "device"]
+
+# Scalar two-argument min/max per backend, used to merge first/last click.
+_LEAST = {"postgresql": "LEAST", "sqlite": "MIN"}
+_GREATEST = {"postgresql": "GREATEST", "sqlite": "MAX"}
+
+
+def bucket_start(timestamp, granularity):
+    """
+    Returns the start (UTC) of the hour or day containing timestamp.
+    """
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    timestamp = timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == ClickRollup.DAY:
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+def _unknown_ids():
+    dimensions = get_registry()
+    return {
+        "country": dimensions.country.resolve("Unknown"),
+        "browser": dimensions.browser.resolve("Unknown"),
+        "platform": dimensions.platform.resolve("Unknown"),
+        "device": dimensions.device.resolve("Unknown"),
+    }
+
+
+def rollup_deltas(clicks):
+    """
+    Folds clicks into {key: [count, first_click, last_click]} for both
+    granularities, where key follows KEY_FIELDS.
+    """
+    unknown = None
+    deltas = {}
+    for click in clicks:
+        dimension_ids = []
+        for field in DIMENSION_FIELDS:
+            pk = getattr(click, f"{field}_id")
+            if pk is None:
+                unknown = unknown or _unknown_ids()
+                pk = unknown[field]
+            dimension_ids.append(pk)
+        for granularity in GRANULARITIES:
+            key = (
+                click.url_id,
+                granularity,
+                bucket_start(click.timestamp, granularity),
+                *dimension_ids,
+                click.redirected,
+            )
+            entry = deltas.get(key)
+            if entry is None:
+                deltas[key] = [1, click.timestamp, click.timestamp]
+            else:
+                entry[0] += 1
+                entry[1] = min(entry[1], click.timestamp)
+                entry[2] = max(entry[2], click.timestamp)
+    return deltas
+
+
+def _upsert_sql():
+    quote = connection.ops.quote_name
+    meta = ClickRollup._meta
+    table = quote(meta.db_table)
+    key_columns = [quote(meta.get_field(name).column) for name in KEY_FIELDS]
+    columns = key_columns + [quote("click_count"), quote("first_click"), quote("last_click")]
+    least = _LEAST[connection.vendor]
+    greatest = _GREATEST[connection.vendor]
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+        f"click_count = {table}.click_count + EXCLUDED.click_count, "
+        f"first_click = {least}({table}.first_click, EXCLUDED.first_click), "
+        f"last_click = {greatest}({table}.last_click, EXCLUDED.last_click)"
+    )
+
+
+def _prepare(values, names):
+    meta = ClickRollup._meta
+    return [
+        meta.get_field(name).get_db_prep_save(value, connection)
+        for name, value in zip(names, values)
+    ]
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Adds the deltas to the rollup tables. Keys are applied in sorted order so
+    concurrent writers lock rows in the same order.
+    """
+    if not deltas:
+        return
+    keys = sorted(deltas, key=lambda key: tuple(str(part) for part in key))
+    names = KEY_FIELDS + ["click_count", "first_click", "last_click"]
+
+    if connection.vendor not in _LEAST:
+        # No portable upsert; fall back to row-by-row updates.
+        with transaction.atomic():
+            for key in keys:
+                _apply_one(key, deltas[key])
+        return
+
+    params = [_prepare((*key, *deltas[key]), names) for key in keys]
+    with connection.cursor() as cursor:
+        cursor.executemany(_upsert_sql(), params)
+
+
+def _apply_one(key, delta):
+    count, first_click, last_click = delta
+    lookup = {
+        ClickRollup._meta.get_field(name).attname: value
+        for name, value in zip(KEY_FIELDS, key)
+    }
+    rollup, created = ClickRollup.objects.select_for_update().get_or_create(
+        **lookup,
+        defaults={
+            "click_count": count,
+            "first_click": first_click,
+            "last_click": last_click,
+        },
+    )
+    if not created:
+        rollup.click_count += count
+        rollup.first_click = min(rollup.first_click, first_click)
+        rollup.last_click = max(rollup.last_click, last_click)
+        rollup.save(update_fields=["click_count", "first_click", "last_click"])
+
+
+def record_rollups(clicks):
+    apply_rollup_deltas(rollup_deltas(clicks))
+
+
+def merge_rollups(url_map):
+    """
+    Adds the rollups of each URL in {source_id: target_id} onto the target's,
+    for when one URL is folded into another. The source rows are left to be
+    deleted along with their URL.
+    """
+    columns = [ClickRollup._meta.get_field(name).attname for name in KEY_FIELDS]
+    deltas = {}
+    rows = ClickRollup.objects.filter(url_id__in=list(url_map)).values_list(
+        *columns, "click_count", "first_click", "last_click"
+    )
+    for url_id, *key, count, first_click, last_click in rows.iterator(chunk_size=5000):
+        key = (url_map[url_id], *key)
+        entry = deltas.get(key)
+        if entry is None:
+            deltas[key] = [count, first_click, last_click]
+        else:
+            entry[0] += count
+            entry[1] = min(entry[1], first_click)
+            entry[2] = max(entry[2], last_click)
+    apply_rollup_deltas(deltas)
+
+
+def rebuild_rollups(url_ids):
+    """
+    Recomputes the rollups of the given URLs from their clicks, in one
+    transaction. Rollups of archived months are kept, since their clicks
+    are gone. Returns the number of rollup rows written.
+    """
+    url_ids = list(url_ids)
+    if not url_ids:
+        return 0
+    unknown = _unknown_ids()
+    rows = {}
+    rollups = ClickRollup.objects.filter(url_id__in=url_ids)
+    clicks = Click.objects.filter(url_id__in=url_ids)
+    horizon = archive_horizon()
+    if horizon is not None:
+        rollups = rollups.filter(bucket__gte=horizon)
+        clicks = clicks.filter(timestamp__gte=horizon)
+    with transaction.atomic():
+        rollups.delete()
+        for granularity, trunc in (
+            (ClickRollup.HOUR, TruncHour),
+            (ClickRollup.DAY, TruncDay),
+        ):
+            grouped = (
+                clicks.annotate(bucket=trunc("timestamp", tzinfo=dt_timezone.utc))
+                .values(
+                    "url_id",
+                    "bucket",
+                    *(f"{field}_id" for field in DIMENSION_FIELDS),
+                    "redirected",
+                )
+                .annotate(
+                    count=Count("click_id"),
+                    first=Min("timestamp"),
+                    last=Max("timestamp"),
+                )
+                .order_by()
+            )
+            for row in grouped:
+                key = (
+                    row["url_id"],
+                    granularity,
+                    row["bucket"],
+                    *(row[f"{field}_id"] or unknown[field] for field in DIMENSION_FIELDS),
+                    row["redirected"],
+                )
+                # NULL dimensions merge into the Unknown row.
+                entry = rows.get(key)
+                if entry is None:
+                    rows[key] = [row["count"], row["first"], row["last"]]
+                else:
+                    entry[0] += row["count"]
+                    entry[1] = min(entry[1], row["first"])
+                    entry[2] = max(entry[2], row["last"])
+        ClickRollup.objects.bulk_create(
+            [
+                ClickRollup(
+                    url_id=key[0],
+                    granularity=key[1],
+                    bucket=key[2],
+                    country_id=key[3],
+                    browser_id=key[4],
+                    platform_id=key[5],
+                    device_id=key[6],
+                    redirected=key[7],
+                    click_count=count,
+                    first_click=first_click,
+                    last_click=last_click,
+                )
+                for key, (count, first_click, last_click) in rows.items()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+# Response key -> name field, for the facets in url_breakdown.
+BREAKDOWN_FACETS = {
+    "countries": "country__country_name",
+    "browsers": "browser__browser_name",
+    "platforms": "platform__platform_name",
+    "devices": "device__device_type",
+}
+
+
+def url_breakdown(url):
+    """
+    Totals and per-dimension click counts for a URL.
+    """
+    return breakdown(ClickRollup.objects.filter(url=url))
+
+
+def breakdown(rollups):
+    """
+    Totals and per-dimension click counts over a ClickRollup queryset, e.g.
+    the rollups of one URL or of all of a user's URLs.
+
+    Runs a single grouped query over the daily rollups, one row per
+    combination of dimension values and redirect outcome, and folds it into
+    each facet here; the combinations are few, and this avoids one query per
+    facet on backends without GROUPING SETS.
+    """
+    rows = (
+        rollups.filter(granularity=ClickRollup.DAY)
+        .values(*BREAKDOWN_FACETS.values(), "redirected")
+        .annotate(
+            clicks=Sum("click_count"),
+            first=Min("first_click"),
+            last=Max("last_click"),
+        )
+        .order_by()
+    )
+
+    total = successful = 0
+    first_click = last_click = None
+    facets = {key: {} for key in BREAKDOWN_FACETS}
+    for row in rows:
+        clicks = row["clicks"]
+        redirected = clicks if row["redirected"] else 0
+        total += clicks
+        successful += redirected
+        first_click = min(first_click or row["first"], row["first"])
+        last_click = max(last_click or row["last"], row["last"])
+        for key, field in BREAKDOWN_FACETS.items():
+            counts = facets[key].setdefault(row[field], [0, 0])
+            counts[0] += clicks
+            counts[1] += redirected
+
+    return {
+        "total_clicks": total,
+        "successful_redirects": successful,
+        "failed_redirects": total - successful,
+        "first_click": first_click,
+        "last_click": last_click,
+        "breakdown": {
+            key: [
+                {
+                    "name": name,
+                    "clicks": clicks,
+                    "successful_redirects": redirected,
+                    "failed_redirects": clicks - redirected,
+                }
+                for name, (clicks, redirected) in sorted(
+                    counts.items(), key=lambda item: (-item[1][0], item[0])
+                )
+            ]
+            for key, counts in facets.items()
+        },
+    }
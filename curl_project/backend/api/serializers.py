@@ -1,13 +1,85 @@
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.validators import URLValidator
 from rest_framework import serializers
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from .models.accounts import User, Profile
-from .models.url_shortening import URL
+from .models.url_shortening import URL, DeletionJob
 from .models.analytics import Click, Browser, Device, Country, Platform
+from .timeseries import INTERVALS, DEFAULT_MAX_POINTS
+from .utils import normalize_url
+from datetime import timedelta
+from django.utils import timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class ExpandableFieldsMixin:
+    """
+    Serializes the relations named in `expandable_fields` as primary keys,
+    unless they are listed in the "expand" serializer context, in which case
+    the mapped serializer nests them. Paths such as "url.owner" expand the
+    relations of a nested serializer.
+    """
+
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get("expand", ())
+        for name, serializer_class in self.expandable_fields.items():
+            if name in expand:
+                context = dict(self.context, expand=_nested_expand(expand, name))
+                self.fields[name] = serializer_class(read_only=True, context=context)
+
+    @classmethod
+    def expandable_paths(cls):
+        paths = []
+        for name, serializer_class in cls.expandable_fields.items():
+            paths.append(name)
+            if issubclass(serializer_class, ExpandableFieldsMixin):
+                paths.extend(f"{name}.{path}" for path in serializer_class.expandable_paths())
+        return paths
+
+
+def _nested_expand(expand, name):
+    return {path[len(name) + 1 :] for path in expand if path.startswith(f"{name}.")}
+
+
+def query_plan(serializer_class, expand=(), prefix=""):
+    """
+    Returns (select_related, only) arguments that load exactly what the
+    serializer reads with the given expansions, so a page of any size costs
+    a fixed number of queries.
+    """
+    model = serializer_class.Meta.model
+    declared = serializer_class._declared_fields
+    expandable = getattr(serializer_class, "expandable_fields", {})
+    related, columns = [], []
+    for name in serializer_class.Meta.fields:
+        source = getattr(declared.get(name), "source", None)
+        if name in expand and name in expandable:
+            related.append(prefix + name)
+            columns.append(prefix + name)
+            nested_related, nested_columns = query_plan(
+                expandable[name], _nested_expand(expand, name), f"{prefix}{name}__"
+            )
+            related += nested_related
+            columns += nested_columns
+        elif source and "." in source:
+            # Inline attributes of a relation, e.g. country.country_name.
+            related.append(prefix + source.split(".")[0])
+            columns.append(prefix + source.replace(".", "__"))
+        else:
+            try:
+                model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            columns.append(prefix + name)
+    return related, columns
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -61,8 +133,8 @@ class ProfileSerializer(serializers.ModelSerializer):
         ]
 
 
-class URLSerializer(serializers.ModelSerializer):
-    owner = UserSerializer(read_only=True)
+class URLSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {"owner": UserSerializer}
 
     class Meta:
         model = URL
@@ -76,6 +148,21 @@ class URLSerializer(serializers.ModelSerializer):
             "is_active",
             "expiration_date",
         ]
+        read_only_fields = ["owner"]
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeletionJob
+        fields = [
+            "uuid",
+            "kind",
+            "status",
+            "rows",
+            "requested_at",
+            "started_at",
+            "completed_at",
+        ]
 
 
 class BrowserSerializer(serializers.ModelSerializer):
@@ -102,12 +189,21 @@ class PlatformSerializer(serializers.ModelSerializer):
         fields = ["platform_id", "platform_name", "click_count"]
 
 
-class ClickSerializer(serializers.ModelSerializer):
-    country = CountrySerializer(read_only=True)
-    browser = BrowserSerializer(read_only=True)
-    platform = PlatformSerializer(read_only=True)
-    device = DeviceSerializer(read_only=True)
-    url = URLSerializer(read_only=True)
+class ClickSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    country = serializers.CharField(
+        source="country.country_name", read_only=True, allow_null=True
+    )
+    browser = serializers.CharField(
+        source="browser.browser_name", read_only=True, allow_null=True
+    )
+    platform = serializers.CharField(
+        source="platform.platform_name", read_only=True, allow_null=True
+    )
+    device = serializers.CharField(
+        source="device.device_type", read_only=True, allow_null=True
+    )
+
+    expandable_fields = {"url": URLSerializer, "owner": UserSerializer}
 
     class Meta:
         model = Click
@@ -123,6 +219,97 @@ class ClickSerializer(serializers.ModelSerializer):
             "device",
             "redirected",
         ]
+        read_only_fields = ["owner", "url"]
+
+
+class TimeSeriesQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the click time-series endpoints.
+    The range defaults to the 30 days before now.
+    """
+
+    interval = serializers.ChoiceField(choices=INTERVALS, default="day")
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    tz = serializers.CharField(default="UTC")
+    max_points = serializers.IntegerField(
+        min_value=2, max_value=2000, default=DEFAULT_MAX_POINTS
+    )
+
+    def validate_tz(self, value):
+        try:
+            return ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError(f"Unknown time zone: {value}")
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.now())
+        attrs.setdefault("start", attrs["end"] - timedelta(days=30))
+        if attrs["start"] >= attrs["end"]:
+            raise serializers.ValidationError("start must be before end.")
+        return attrs
+
+
+class VisitorQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must not be after end.")
+        return attrs
+
+
+class DateRangeFilterSerializer(serializers.Serializer):
+    """
+    Validates the start/end query parameters of the paginated list views.
+    """
+
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] >= attrs["end"]:
+            raise serializers.ValidationError("start must be before end.")
+        return attrs
+
+
+class ClickFilterSerializer(DateRangeFilterSerializer):
+    url = serializers.UUIDField(required=False)
+    redirected = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+
+class BulkShortenSerializer(serializers.Serializer):
+    """
+    Validates the envelope of a bulk shorten request. Items are validated
+    one by one with BulkShortenItemSerializer, so one bad item does not fail
+    the batch.
+    """
+
+    urls = serializers.ListField(child=serializers.JSONField(), allow_empty=False)
+
+    def validate_urls(self, value):
+        limit = self.context.get("max_urls")
+        if limit is not None and len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} URLs per request.")
+        return value
+
+
+class BulkShortenItemSerializer(serializers.Serializer):
+    original_url = serializers.CharField(max_length=2000)
+    shortened_slug = serializers.CharField(
+        max_length=50, required=False, allow_blank=True, default=""
+    )
+    expiration_date = serializers.DateTimeField(required=False, allow_null=True, default=None)
+
+    def validate_original_url(self, value):
+        value = normalize_url(value)
+        try:
+            URLValidator()(value)
+        except DjangoValidationError:
+            raise serializers.ValidationError("Enter a valid URL.")
+        return value
+
 
 class CustomRegisterSerializer(RegisterSerializer):
     """
@@ -1,8 +1,14 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from guest_user.signals import guest_created, converted as guest_user_converted
 from .models.accounts import User, Profile
+from .models.url_shortening import URL
+from .models.analytics import Country, Browser, Device, Platform
+from .dimensions import bump_version as bump_dimensions_version
+from .cache import ResolvedURL, invalidate_slug, prime_slug
+from .slug_filter import remember_slugs
+from .summaries import mark_owners_changed
 from curl_project.constants import USER_TYPE_FREE, USER_TYPE_GUEST
 from logging import getLogger
 
@@ -40,3 +46,52 @@ def handle_guest_user_converted(sender, guest, user, request, **kwargs):
     """
     user.user_type = USER_TYPE_FREE
     user.save(update_fields=["user_type"])
+
+
+@receiver(post_save, sender=URL)
+def invalidate_saved_url(sender, instance, created, **kwargs):
+    """
+    Drops the cached redirect data when a URL is edited or moved between
+    owners, including the old slug if it was renamed. New and renamed slugs
+    are added to the slug filter and primed in the shared cache, so other
+    workers resolve them before their filters refresh. Either way the
+    owner's dashboard summary is out of date.
+    """
+    mark_owners_changed([instance.owner_id])
+    if created:
+        remember_slugs([instance.shortened_slug])
+        invalidate_slug(instance.shortened_slug)
+        prime_slug(instance.shortened_slug, ResolvedURL.from_instance(instance))
+        instance._loaded_slug = instance.shortened_slug
+        return
+
+    loaded_slug = getattr(instance, "_loaded_slug", None)
+    renamed = loaded_slug and loaded_slug != instance.shortened_slug
+    if renamed:
+        invalidate_slug(loaded_slug)
+        remember_slugs([instance.shortened_slug])
+    invalidate_slug(instance.shortened_slug)
+    if renamed:
+        prime_slug(instance.shortened_slug, ResolvedURL.from_instance(instance))
+    instance._loaded_slug = instance.shortened_slug
+
+
+@receiver(post_delete, sender=URL)
+def invalidate_deleted_url(sender, instance, **kwargs):
+    mark_owners_changed([instance.owner_id])
+    invalidate_slug(getattr(instance, "_loaded_slug", None))
+    invalidate_slug(instance.shortened_slug)
+
+
+def invalidate_dimension_maps(sender, instance, created=False, **kwargs):
+    """
+    Renamed or deleted dimension rows make every process reload its maps.
+    New rows need nothing: unknown names fall through to the database.
+    """
+    if not created:
+        bump_dimensions_version()
+
+
+for dimension_model in (Country, Browser, Device, Platform):
+    post_save.connect(invalidate_dimension_maps, sender=dimension_model)
+    post_delete.connect(invalidate_dimension_maps, sender=dimension_model)
@@ -0,0 +1,301 @@
+"""
+Bloom filter over every shortened_slug.
+
+A definite miss means the slug does not exist, so the redirect endpoint can
+404 and URLCreateView can accept a custom slug without a database query.
+A "maybe" falls through to the normal lookup.
+
+Each worker builds its filter once (from a snapshot when one is configured,
+then only the slugs changed since), adds the slugs it creates or renames
+itself, and every REFRESH_INTERVAL seconds pulls slugs other workers
+created or renamed, going by URL.slug_changed_at. New and renamed URLs are
+also primed in the shared slug cache, which is consulted before the
+filter, and a miss triggers an early refresh at most every
+MISS_REFRESH_INTERVAL seconds before the slug is rejected, so a fresh slug
+is not turned away for long even without a shared cache. Bloom filters
+cannot forget, so deleted slugs stay "maybe" until the filter is rebuilt.
+
+A failed build is retried at most every LOAD_RETRY_INTERVAL seconds, so a
+struggling database is not hit with a full scan per request meanwhile.
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "ENABLED": True,
+    "CAPACITY": 1_000_000,
+    "ERROR_RATE": 0.001,
+    "REFRESH_INTERVAL": 60,
+    "MISS_REFRESH_INTERVAL": 1,
+    "LOAD_RETRY_INTERVAL": 30,
+    "SNAPSHOT_PATH": None,
+    "BUILD_IN_BACKGROUND": True,
+}
+
+# URLs committed slightly out of creation_date order must not be skipped.
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def get_filter_settings():
+    options = dict(DEFAULT_SETTINGS)
+    options.update(getattr(settings, "SLUG_FILTER", {}))
+    return options
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter using double hashing over one blake2b digest.
+    """
+
+    def __init__(self, capacity, error_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    @property
+    def is_saturated(self):
+        return self.count > self.capacity
+
+
+class SlugFilter:
+    """
+    The process-wide slug filter plus the bookkeeping to keep it current.
+    """
+
+    def __init__(self, options=None):
+        self._options = options
+        self.bloom = None
+        self.watermark = None
+        self.refreshed_at = None
+        self.rejections = 0
+        self._lock = threading.Lock()
+        self._loading = False
+        self._failed_at = None
+
+    @property
+    def options(self):
+        # Read live unless pinned, so settings overrides apply to the singleton.
+        return self._options or get_filter_settings()
+
+    @property
+    def ready(self):
+        return self.bloom is not None
+
+    def _backing_off(self):
+        return (
+            self._failed_at is not None
+            and time.monotonic() - self._failed_at < self.options["LOAD_RETRY_INTERVAL"]
+        )
+
+    def ensure_loaded(self):
+        if self.ready or self._loading or self._backing_off():
+            return
+        with self._lock:
+            if self.ready or self._loading or self._backing_off():
+                return
+            self._loading = True
+        if self.options["BUILD_IN_BACKGROUND"]:
+            threading.Thread(target=self._load, name="slug-filter", daemon=True).start()
+        else:
+            self._load()
+
+    def _load(self):
+        from django.db import close_old_connections
+
+        try:
+            path = self.options["SNAPSHOT_PATH"]
+            if path and os.path.exists(path):
+                bloom, self.watermark = read_snapshot(path)
+                # Catch up before publishing so no new slug is rejected.
+                self.refresh(bloom)
+                logger.info(f"Slug filter loaded from snapshot {path}")
+            else:
+                self.rebuild()
+            self._failed_at = None
+        except Exception:
+            self._failed_at = time.monotonic()
+            logger.exception("Failed to build the slug filter")
+        finally:
+            self._loading = False
+            if self.options["BUILD_IN_BACKGROUND"]:
+                close_old_connections()
+
+    def rebuild(self):
+        """
+        Builds a fresh filter from every slug in the database.
+        """
+        from .models.url_shortening import URL
+
+        started = timezone.now()
+        total = URL.all_objects.count()
+        bloom = BloomFilter(
+            max(self.options["CAPACITY"], total * 2), self.options["ERROR_RATE"]
+        )
+        for slug in URL.all_objects.values_list("shortened_slug", flat=True).iterator(
+            chunk_size=5000
+        ):
+            bloom.add(slug)
+        self.bloom = bloom
+        self.watermark = started - REFRESH_OVERLAP
+        self.refreshed_at = time.monotonic()
+        logger.info(f"Slug filter built with {bloom.count} slugs")
+
+    def refresh(self, bloom=None):
+        """
+        Adds slugs created or renamed since the last refresh, rebuilding if
+        the filter has outgrown its capacity.
+        """
+        from .models.url_shortening import URL
+
+        bloom = bloom or self.bloom
+        started = timezone.now()
+        slugs = URL.all_objects.filter(slug_changed_at__gte=self.watermark).values_list(
+            "shortened_slug", flat=True
+        )
+        for slug in slugs.iterator(chunk_size=5000):
+            bloom.add(slug)
+        self.watermark = started - REFRESH_OVERLAP
+        self.refreshed_at = time.monotonic()
+        self.bloom = bloom
+        if bloom.is_saturated:
+            self.rebuild()
+
+    def refresh_if_due(self, interval=None):
+        """
+        Refreshes if the last refresh is older than interval (default
+        REFRESH_INTERVAL) seconds. Returns whether it refreshed.
+        """
+        if interval is None:
+            interval = self.options["REFRESH_INTERVAL"]
+        due = time.monotonic() - self.refreshed_at > interval
+        if not due or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self.refresh()
+            return True
+        except Exception:
+            logger.exception("Failed to refresh the slug filter")
+            return False
+        finally:
+            self._lock.release()
+
+    def might_contain(self, slug):
+        """
+        False only when the slug definitely does not exist.
+        """
+        if not self.options["ENABLED"]:
+            return True
+        self.ensure_loaded()
+        if not self.ready:
+            return True
+        self.refresh_if_due()
+        if slug in self.bloom:
+            return True
+        # The slug may have been created or renamed by another worker since
+        # the last refresh; catch up, rate limited, before rejecting it.
+        if self.refresh_if_due(self.options["MISS_REFRESH_INTERVAL"]) and slug in self.bloom:
+            return True
+        self.rejections += 1
+        return False
+
+    def add(self, slug):
+        if self.ready:
+            self.bloom.add(slug)
+
+    def stats(self):
+        if not self.ready:
+            return {"ready": False}
+        return {
+            "ready": True,
+            "slugs": self.bloom.count,
+            "capacity": self.bloom.capacity,
+            "size_bytes": len(self.bloom.bits),
+            "rejections": self.rejections,
+        }
+
+
+def write_snapshot(bloom, watermark, path):
+    header = {
+        "capacity": bloom.capacity,
+        "error_rate": bloom.error_rate,
+        "count": bloom.count,
+        "watermark": watermark.isoformat(),
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("wb", dir=directory, delete=False) as handle:
+        handle.write(json.dumps(header).encode() + b"\n")
+        handle.write(bloom.bits)
+    os.replace(handle.name, path)
+
+
+def read_snapshot(path):
+    with open(path, "rb") as handle:
+        header = json.loads(handle.readline())
+        bits = bytearray(handle.read())
+    bloom = BloomFilter(
+        header["capacity"], header["error_rate"], bits=bits, count=header["count"]
+    )
+    if len(bits) != (bloom.size + 7) // 8:
+        raise ValueError(f"Slug filter snapshot {path} is truncated")
+    return bloom, parse_datetime(header["watermark"])
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_slug_filter():
+    global _filter
+    if _filter is None:
+        with _filter_lock:
+            if _filter is None:
+                _filter = SlugFilter()
+    return _filter
+
+
+def slug_might_exist(slug):
+    return get_slug_filter().might_contain(slug)
+
+
+def remember_slugs(slugs):
+    """
+    Adds newly created slugs to this worker's filter.
+    """
+    slug_filter = get_slug_filter()
+    for slug in slugs:
+        slug_filter.add(slug)
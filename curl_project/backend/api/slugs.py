@@ -0,0 +1,174 @@
+"""
+Slug allocation for generated short URLs.
+
+Each process leases a block of integer IDs from the SlugSequence row for the
+current slug length (hi/lo style) and hands them out from memory. IDs are
+passed through a reversible permutation of [0, 62**length) before being
+base62 encoded, so consecutive IDs do not give consecutive slugs. No two
+leases overlap, so generated slugs need no existence check. When a length's
+space is used up, allocation moves on to the next length.
+"""
+
+import os
+import string
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models.url_shortening import SlugSequence
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+
+# Both multipliers are odd and not divisible by 31, so they are invertible
+# modulo 62**length for every length.
+MULTIPLIER_A = 0x9E3779B97F4A7C15
+MULTIPLIER_B = 0xC2B2AE3D27D4EB4F
+OFFSET_A = 0x632BE59BD9B4E019
+OFFSET_B = 0x85EBCA77C2B2AE63
+
+# Inserts retried with a fresh slug when a generated one clashes with a
+# custom or legacy slug.
+SLUG_CREATE_ATTEMPTS = 5
+
+DEFAULT_SETTINGS = {
+    "BLOCK_SIZE": 1000,
+    "MIN_LENGTH": 6,
+}
+
+
+def capacity(length):
+    return BASE**length
+
+
+def encode(number, length):
+    digits = []
+    for _ in range(length):
+        number, remainder = divmod(number, BASE)
+        digits.append(ALPHABET[remainder])
+    return "".join(reversed(digits))
+
+
+def decode(slug):
+    number = 0
+    for char in slug:
+        number = number * BASE + ALPHABET.index(char)
+    return number
+
+
+def _reverse_digits(number, length):
+    return decode(encode(number, length)[::-1])
+
+
+def permute(value, length):
+    """
+    Maps value to a scrambled position in [0, 62**length). Bijective.
+    """
+    size = capacity(length)
+    value = (value * MULTIPLIER_A + OFFSET_A) % size
+    value = _reverse_digits(value, length)
+    return (value * MULTIPLIER_B + OFFSET_B) % size
+
+
+def unpermute(value, length):
+    size = capacity(length)
+    value = ((value - OFFSET_B) * pow(MULTIPLIER_B, -1, size)) % size
+    value = _reverse_digits(value, length)
+    return ((value - OFFSET_A) * pow(MULTIPLIER_A, -1, size)) % size
+
+
+def slug_for(value, length):
+    return encode(permute(value, length), length)
+
+
+def lease_block(length, block_size):
+    """
+    Reserves up to block_size IDs for the given slug length, moving to longer
+    slugs when a length is exhausted. Returns (length, start, end).
+    """
+    while True:
+        size = capacity(length)
+        with transaction.atomic():
+            SlugSequence.objects.get_or_create(length=length)
+            reserved = SlugSequence.objects.filter(
+                length=length, next_value__lt=size
+            ).update(next_value=F("next_value") + block_size)
+            if reserved:
+                end = SlugSequence.objects.get(length=length).next_value
+                return length, end - block_size, min(end, size)
+        logger.info(f"Slug space of length {length} exhausted, moving to {length + 1}")
+        length += 1
+
+
+class SlugAllocator:
+    """
+    Hands out slugs from a leased block of IDs, leasing more as needed.
+    """
+
+    def __init__(self, block_size=1000, min_length=6):
+        self.block_size = block_size
+        self.length = min_length
+        self._next = 0
+        self._end = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        slugs = []
+        with self._lock:
+            # A block leased before a fork would be handed out twice.
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            while len(slugs) < count:
+                if self._next >= self._end:
+                    self.length, self._next, self._end = lease_block(
+                        self.length, max(self.block_size, count - len(slugs))
+                    )
+                take = min(count - len(slugs), self._end - self._next)
+                slugs.extend(
+                    slug_for(value, self.length)
+                    for value in range(self._next, self._next + take)
+                )
+                self._next += take
+        return slugs
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                options = dict(DEFAULT_SETTINGS)
+                options.update(getattr(settings, "SLUG_ALLOCATOR", {}))
+                _allocator = SlugAllocator(
+                    block_size=options["BLOCK_SIZE"], min_length=options["MIN_LENGTH"]
+                )
+    return _allocator
+
+
+def allocate_slug():
+    """
+    Returns a fresh generated slug.
+    """
+    return get_allocator().allocate()
+
+
+def allocate_slugs(count):
+    """
+    Returns count fresh generated slugs, leasing blocks only as needed.
+    """
+    return get_allocator().allocate_many(count)
@@ -0,0 +1,370 @@
+"""
+Per-owner dashboard summaries.
+
+A summary holds the totals of each of a user's URLs, their top links, and
+their clicks by day and by dimension. It is built from the rollups (see
+api/rollups.py) in a fixed number of queries, however many URLs the user
+has, only when it is not in the Django cache.
+
+Once cached, it is maintained incrementally: after each batch of clicks
+commits, the click writer folds the batch into the cached summaries of its
+owners, OWNER_SUMMARY["CHUNK_SIZE"] owners at a time, each under a short
+cache lock. Changes a delta cannot express (a URL created, edited or
+deleted, a new day past the end of clicks_by_day) or a batch that finds an
+owner's summary locked mark the summary changed instead; it is then still
+served for up to OWNER_SUMMARY["MAX_STALENESS"] seconds from when it was
+built before being rebuilt.
+
+A summary being built may have read the rollups before a batch committed,
+so while a build is in progress its owner carries a marker, and batches for
+that owner mark the summary changed rather than lose their clicks.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .dimensions import get_registry
+from .models.analytics import ClickRollup
+from .models.url_shortening import URL
+from .rollups import breakdown
+from .timeseries import DAY, click_series
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "MAX_STALENESS": 60,
+    "TIMEOUT": 3600,
+    "TOP_LINKS": 10,
+    "DAYS": 30,
+    "CHUNK_SIZE": 500,
+}
+
+# Seconds a click batch may hold an owner's summary while updating it.
+LOCK_TIMEOUT = 5
+
+# Seconds a build-in-progress marker outlives a build that never finishes.
+BUILD_TIMEOUT = 60
+
+# Summary breakdown facet -> Click dimension.
+FACET_DIMENSIONS = {
+    "countries": "country",
+    "browsers": "browser",
+    "platforms": "platform",
+    "devices": "device",
+}
+
+
+def get_summary_settings():
+    options = dict(DEFAULT_SETTINGS)
+    options.update(getattr(settings, "OWNER_SUMMARY", {}))
+    return options
+
+
+def _summary_key(owner_id):
+    return f"owner-summary:{owner_id}"
+
+
+def _changed_key(owner_id):
+    return f"owner-summary-changed:{owner_id}"
+
+
+def _lock_key(owner_id):
+    return f"owner-summary-lock:{owner_id}"
+
+
+def _building_key(owner_id):
+    return f"owner-summary-building:{owner_id}"
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def mark_owners_changed(owner_ids):
+    """
+    Records that the summaries of these owners are out of date, once the
+    current transaction commits.
+    """
+    owner_ids = {owner_id for owner_id in owner_ids if owner_id is not None}
+    if not owner_ids:
+        return
+
+    transaction.on_commit(lambda: _mark_changed(owner_ids))
+
+
+def _mark_changed(owner_ids):
+    options = get_summary_settings()
+    # Outlives any summary built before now, which expires with TIMEOUT.
+    changed_at = time.time()
+    for chunk in _chunks(owner_ids, options["CHUNK_SIZE"]):
+        cache.set_many(
+            {_changed_key(owner_id): changed_at for owner_id in chunk},
+            options["TIMEOUT"],
+        )
+
+
+def record_summary_clicks(clicks):
+    """
+    Folds a batch of new clicks into the cached summaries of their owners,
+    once the current transaction commits.
+    """
+    deltas = summary_deltas(clicks)
+    if deltas:
+        transaction.on_commit(lambda: apply_summary_deltas(deltas))
+
+
+def summary_deltas(clicks):
+    """
+    Folds clicks into one delta per owner: totals, first and last click,
+    and click and successful redirect counts per URL, dimension and day.
+    """
+    dimensions = get_registry()
+    deltas = {}
+    for click in clicks:
+        if click.owner_id is None:
+            continue
+        delta = deltas.get(click.owner_id)
+        if delta is None:
+            delta = deltas[click.owner_id] = {
+                "clicks": 0,
+                "successful": 0,
+                "first": click.timestamp,
+                "last": click.timestamp,
+                "urls": {},
+                "facets": {facet: {} for facet in FACET_DIMENSIONS},
+                "days": {},
+            }
+        successful = 1 if click.redirected else 0
+        delta["clicks"] += 1
+        delta["successful"] += successful
+        delta["first"] = min(delta["first"], click.timestamp)
+        delta["last"] = max(delta["last"], click.timestamp)
+
+        url = delta["urls"].setdefault(click.url_id, [0, 0, click.timestamp])
+        url[0] += 1
+        url[1] += successful
+        url[2] = max(url[2], click.timestamp)
+
+        for facet, dimension in FACET_DIMENSIONS.items():
+            pk = getattr(click, f"{dimension}_id")
+            name = getattr(dimensions, dimension).name(pk) or "Unknown"
+            counts = delta["facets"][facet].setdefault(name, [0, 0])
+            counts[0] += 1
+            counts[1] += successful
+
+        day = click.timestamp.astimezone(dt_timezone.utc).date()
+        counts = delta["days"].setdefault(day, [0, 0])
+        counts[0] += 1
+        counts[1] += successful
+    return deltas
+
+
+def apply_summary_deltas(deltas):
+    """
+    Applies per-owner deltas to the cached summaries, a chunk of owners at a
+    time. Owners whose summary is being built, or whose summary cannot be
+    updated, are marked changed; owners without a cached summary are
+    skipped, as their next read builds one from rollups that hold the batch.
+    """
+    options = get_summary_settings()
+    for chunk in _chunks(deltas, options["CHUNK_SIZE"]):
+        cached = cache.get_many(
+            [_summary_key(owner_id) for owner_id in chunk]
+            + [_building_key(owner_id) for owner_id in chunk]
+        )
+        updated, dropped, locked, changed = {}, [], [], []
+        for owner_id in chunk:
+            key = _summary_key(owner_id)
+            if _building_key(owner_id) in cached:
+                # The build may have read the rollups before this batch.
+                changed.append(owner_id)
+                continue
+            if key not in cached:
+                continue
+            # Another batch may be updating this summary; never overwrite it.
+            if not cache.add(_lock_key(owner_id), True, LOCK_TIMEOUT):
+                changed.append(owner_id)
+                continue
+            locked.append(_lock_key(owner_id))
+            entry = cache.get(key)
+            if entry is None:
+                changed.append(owner_id)
+                continue
+            age = time.time() - entry["built_at"]
+            if age < options["TIMEOUT"] and _apply_delta(
+                entry["summary"], deltas[owner_id], options["TOP_LINKS"]
+            ):
+                updated[key] = entry
+            else:
+                dropped.append(key)
+        if updated:
+            # Expire with the build, so a summary is rebuilt at least every TIMEOUT.
+            oldest = min(entry["built_at"] for entry in updated.values())
+            cache.set_many(updated, max(1, int(options["TIMEOUT"] - (time.time() - oldest))))
+        cache.delete_many(dropped + locked)
+        if changed:
+            _mark_changed(changed)
+
+
+def _apply_delta(summary, delta, top_links):
+    """
+    Adds delta to summary in place. Returns False when the summary cannot
+    absorb it and has to be rebuilt.
+    """
+    urls = {url["uuid"]: url for url in summary["urls"]}
+    if any(url_id not in urls for url_id in delta["urls"]):
+        return False
+    days = {point["bucket"].date(): point for point in summary["clicks_by_day"]}
+    if days and max(delta["days"]) > max(days):
+        return False
+
+    summary["total_clicks"] += delta["clicks"]
+    summary["successful_redirects"] += delta["successful"]
+    summary["failed_redirects"] = summary["total_clicks"] - summary["successful_redirects"]
+    summary["first_click"] = min(summary["first_click"] or delta["first"], delta["first"])
+    summary["last_click"] = max(summary["last_click"] or delta["last"], delta["last"])
+
+    for url_id, (clicks, successful, last) in delta["urls"].items():
+        url = urls[url_id]
+        url["clicks"] += clicks
+        url["successful_redirects"] += successful
+        url["failed_redirects"] = url["clicks"] - url["successful_redirects"]
+        url["last_click"] = max(url["last_click"] or last, last)
+    summary["top_links"] = sorted(
+        (url for url in summary["urls"] if url["clicks"]), key=lambda url: -url["clicks"]
+    )[:top_links]
+
+    for facet, counts in delta["facets"].items():
+        rows = {row["name"]: row for row in summary["breakdown"][facet]}
+        for name, (clicks, successful) in counts.items():
+            row = rows.setdefault(
+                name,
+                {"name": name, "clicks": 0, "successful_redirects": 0, "failed_redirects": 0},
+            )
+            row["clicks"] += clicks
+            row["successful_redirects"] += successful
+            row["failed_redirects"] = row["clicks"] - row["successful_redirects"]
+        summary["breakdown"][facet] = sorted(
+            rows.values(), key=lambda row: (-row["clicks"], row["name"])
+        )
+
+    for day, (clicks, successful) in delta["days"].items():
+        point = days.get(day)
+        if point is not None:
+            point["clicks"] += clicks
+            point["successful_redirects"] += successful
+    return True
+
+
+def build_owner_summary(owner, days=None, top_links=None):
+    """
+    Computes the summary of an owner's URLs from the daily rollups.
+    """
+    options = get_summary_settings()
+    days = options["DAYS"] if days is None else days
+    top_links = options["TOP_LINKS"] if top_links is None else top_links
+
+    rollups = ClickRollup.objects.filter(
+        url__owner=owner, url__pending_deletion=False, granularity=ClickRollup.DAY
+    )
+    totals = {
+        row["url_id"]: row
+        for row in rollups.values("url_id")
+        .annotate(
+            clicks=Sum("click_count"),
+            successful=Sum("click_count", filter=Q(redirected=True)),
+            last=Max("last_click"),
+        )
+        .order_by()
+    }
+
+    urls = []
+    for url in (
+        URL.objects.filter(owner=owner)
+        .values("uuid", "shortened_slug", "original_url", "is_active")
+        .order_by("-creation_date", "-uuid")
+    ):
+        row = totals.get(url["uuid"], {})
+        clicks = row.get("clicks") or 0
+        successful = row.get("successful") or 0
+        urls.append(
+            {
+                "uuid": url["uuid"],
+                "shortened_slug": url["shortened_slug"],
+                "original_url": url["original_url"],
+                "is_active": url["is_active"],
+                "clicks": clicks,
+                "successful_redirects": successful,
+                "failed_redirects": clicks - successful,
+                "last_click": row.get("last"),
+            }
+        )
+
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+    end = datetime.combine(today + timedelta(days=1), datetime.min.time(), dt_timezone.utc)
+    _, by_day = click_series(
+        [url["uuid"] for url in urls],
+        end - timedelta(days=days),
+        end,
+        DAY,
+        ZoneInfo("UTC"),
+    )
+
+    summary = breakdown(rollups)
+    summary["total_links"] = len(urls)
+    summary["urls"] = urls
+    summary["top_links"] = sorted(
+        (url for url in urls if url["clicks"]), key=lambda url: -url["clicks"]
+    )[:top_links]
+    summary["clicks_by_day"] = by_day
+    return summary
+
+
+def get_owner_summary(owner):
+    """
+    Returns (summary, generated_at) for an owner, from the cache when it is
+    fresh enough, otherwise rebuilt and cached.
+    """
+    options = get_summary_settings()
+    summary_key = _summary_key(owner.pk)
+    changed_key = _changed_key(owner.pk)
+    cached = cache.get_many([summary_key, changed_key])
+    entry = cached.get(summary_key)
+    if entry is not None:
+        changed_at = cached.get(changed_key)
+        built_at = entry["built_at"]
+        if (
+            changed_at is None
+            or changed_at < built_at
+            or time.time() - built_at <= options["MAX_STALENESS"]
+        ):
+            return entry["summary"], _moment(built_at)
+
+    # Set before reading, so click batches committed during the build mark
+    # it changed instead of updating the entry it replaces.
+    building_key = _building_key(owner.pk)
+    built_at = time.time()
+    cache.set(building_key, built_at, BUILD_TIMEOUT)
+    try:
+        summary = build_owner_summary(owner)
+        cache.set(summary_key, {"built_at": built_at, "summary": summary}, options["TIMEOUT"])
+    finally:
+        # Leave a marker set by a build that started since.
+        if cache.get(building_key) == built_at:
+            cache.delete(building_key)
+    return summary, _moment(built_at)
+
+
+def _moment(timestamp):
+    return datetime.fromtimestamp(timestamp, dt_timezone.utc)
@@ -0,0 +1,104 @@
+"""
+Writes geoip-test.mmdb, a tiny IPv4 MaxMind-format database for the tests.
+
+It holds the same IPv4 networks as geoip-test.csv. Run it from this
+directory if the fixture ever needs to change:
+
+    python build_geoip_test_mmdb.py
+"""
+
+import ipaddress
+import struct
+
+NETWORKS = {
+    "1.0.0.0/24": "AU",
+    "8.8.8.0/24": "US",
+    "81.2.69.0/24": "GB",
+}
+RECORD_SIZE = 24
+METADATA_MARKER = b"\xab\xcd\xefMaxMind.com"
+
+
+def control(type_, size):
+    extra = b""
+    if size >= 29:
+        size, extra = 29, bytes([size - 29])
+    if type_ <= 7:
+        return bytes([(type_ << 5) | size]) + extra
+    return bytes([size, type_ - 7]) + extra
+
+
+def encode(value):
+    if isinstance(value, str):
+        data = value.encode()
+        return control(2, len(data)) + data
+    if isinstance(value, dict):
+        out = control(7, len(value))
+        for key, item in value.items():
+            out += encode(key) + encode(item)
+        return out
+    if isinstance(value, list):
+        return control(11, len(value)) + b"".join(encode(item) for item in value)
+    if isinstance(value, tuple):
+        type_, number = value
+        data = number.to_bytes((number.bit_length() + 7) // 8, "big")
+        return control(type_, len(data)) + data
+    raise TypeError(value)
+
+
+def build():
+    data = b""
+    offsets = {}
+    for code in sorted(set(NETWORKS.values())):
+        offsets[code] = len(data)
+        data += encode({"country": {"iso_code": code}})
+
+    # nodes[i] = [left, right], each ("node", i), ("data", code) or None
+    nodes = [[None, None]]
+    for cidr, code in NETWORKS.items():
+        network = ipaddress.ip_network(cidr)
+        bits = int(network.network_address)
+        node = 0
+        for depth in range(network.prefixlen):
+            bit = (bits >> (31 - depth)) & 1
+            if depth == network.prefixlen - 1:
+                nodes[node][bit] = ("data", code)
+            else:
+                if nodes[node][bit] is None:
+                    nodes.append([None, None])
+                    nodes[node][bit] = ("node", len(nodes) - 1)
+                node = nodes[node][bit][1]
+
+    node_count = len(nodes)
+
+    def record(value):
+        if value is None:
+            return node_count
+        kind, target = value
+        if kind == "node":
+            return target
+        return node_count + 16 + offsets[target]
+
+    tree = b"".join(
+        record(left).to_bytes(3, "big") + record(right).to_bytes(3, "big")
+        for left, right in nodes
+    )
+    metadata = encode(
+        {
+            "binary_format_major_version": (5, 2),
+            "binary_format_minor_version": (5, 0),
+            "build_epoch": (9, 1700000000),
+            "database_type": "cu.rl-Test-Country",
+            "description": {"en": "cu.rl geolocation test fixture"},
+            "ip_version": (5, 4),
+            "languages": ["en"],
+            "node_count": (6, node_count),
+            "record_size": (5, RECORD_SIZE),
+        }
+    )
+    return tree + b"\x00" * 16 + data + METADATA_MARKER + metadata
+
+
+if __name__ == "__main__":
+    with open("geoip-test.mmdb", "wb") as handle:
+        handle.write(build())
@@ -1,7 +1,64 @@
+import csv
+import json
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory, TemporaryFile
+from unittest.mock import Mock, patch
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
+from user_agents import parse
 from .models.accounts import User
+from .models.url_shortening import URL, DeletionJob, URLImport
+from .models.analytics import Click, ClickArchive, ClickRollup, Country
+
+# Build the slug filter on the test thread so it sees the test transaction.
+SYNC_SLUG_FILTER = {"BUILD_IN_BACKGROUND": False}
+from .cache import (
+    SLUG_CACHE_SETTINGS,
+    check_shared_cache,
+    clear_slug_cache,
+    resolve_slug,
+    slug_cache_stats,
+)
+from .views import AsyncURLRedirectView
+from .clicks import ClickEvent, ClickRecorder, OVERFLOW_DROP, ingest_clicks
+from .counters import ClickCounter, get_counter
+from .dimensions import DimensionRegistry, bump_version as reload_dimensions
+from curl_project.constants import USER_TYPE_FREE, USER_TYPE_GUEST
+from .deletions import claim_job, process_deletions
+from .expiry import sweep_expired_urls
+from . import guests
+from .guests import delete_idle_guests, idle_guests, migrate_guest
+from .imports import import_urls, read_rows, source_digest
+from .retention import archived_rows, purge_archived_clicks
+from .rollups import url_breakdown
+from .summaries import build_owner_summary
+from .visitors import unique_visitors
+from .geo import GeoBackend, GeoLocator, CSVRangeBackend, MMDBBackend
+from .hll import HyperLogLog, standard_error
+from .slugs import SlugAllocator, permute, unpermute
+from .slug_filter import (
+    BloomFilter,
+    SlugFilter,
+    get_filter_settings,
+    get_slug_filter,
+    read_snapshot,
+    write_snapshot,
+)
+from .utils import canonicalize_url, classify_user_agent, url_hash
+
 
 class AuthTests(APITestCase):
     def setUp(self):
@@ -22,4 +79,1549 @@ class AuthTests(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('access', response.data)
-        self.assertIn('refresh', response.data)
\ No newline at end of file
+        self.assertIn('refresh', response.data)
+
+@override_settings(CLICK_RECORDER={"ASYNC": False}, SLUG_FILTER=SYNC_SLUG_FILTER)
+class SlugCacheTests(APITestCase):
+    def setUp(self):
+        clear_slug_cache()
+        reload_dimensions()
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="testpassword"
+        )
+        self.url = URL.objects.create(
+            original_url="https://example.com", shortened_slug="abc123", owner=self.user
+        )
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_redirect_is_served_from_cache(self):
+        redirect_url = reverse("url-redirect", args=["abc123"])
+        self.client.get(redirect_url)
+        with self.assertNumQueries(0):
+            resolved = resolve_slug("abc123")
+        self.assertEqual(resolved.uuid, self.url.uuid)
+        self.assertEqual(slug_cache_stats()["local"]["hits"], 1)
+
+    def test_update_through_detail_view_invalidates_entry(self):
+        resolve_slug("abc123")
+        self.client.force_authenticate(self.user)
+        self.client.patch(
+            reverse("user-url-detail", args=[self.url.uuid]),
+            {"is_active": False},
+            format="json",
+        )
+        response = self.client.get(reverse("url-redirect", args=["abc123"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_invalidates_entry(self):
+        resolve_slug("abc123")
+        self.url.delete()
+        self.assertIsNone(resolve_slug("abc123"))
+
+    def test_rename_primes_shared_tier(self):
+        self.addCleanup(cache.clear)
+        with patch.dict(SLUG_CACHE_SETTINGS, SHARED=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.url.shortened_slug = "xyz789"
+                self.url.save()
+        self.assertEqual(cache.get("slug:xyz789").uuid, self.url.uuid)
+        self.assertIsNone(cache.get("slug:abc123"))
+
+    def test_process_local_cache_skips_shared_tier(self):
+        self.assertFalse(slug_cache_stats()["shared"]["enabled"])
+        resolve_slug("abc123")
+        self.assertIsNone(cache.get("slug:abc123"))
+
+    def test_several_workers_need_a_shared_cache(self):
+        with override_settings(WEB_CONCURRENCY=4):
+            with self.assertRaises(ImproperlyConfigured):
+                check_shared_cache()
+        redis = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://localhost:6379/0",
+            }
+        }
+        with override_settings(WEB_CONCURRENCY=4, CACHES=redis):
+            check_shared_cache()
+
+
+class ClickRecorderTests(TestCase):
+    def setUp(self):
+        reload_dimensions()
+        self.url = URL.objects.create(
+            original_url="https://example.com", shortened_slug="rec123"
+        )
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_recorder(self, **kwargs):
+        options = dict(
+            queue_size=10,
+            batch_size=3,
+            flush_interval=1.0,
+            overflow=OVERFLOW_DROP,
+            block_timeout=0,
+        )
+        options.update(kwargs)
+        recorder = ClickRecorder(**options)
+        # Drive the recorder from the test thread instead of a flusher thread.
+        recorder._ensure_started = lambda: None
+        return recorder
+
+    def make_event(self):
+        return ClickEvent(
+            url_id=self.url.uuid,
+            owner_id=None,
+            ip_address="10.0.0.1",
+            user_agent="Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0",
+            redirected=True,
+            timestamp=timezone.now(),
+        )
+
+    def test_flush_writes_queued_events_in_batches(self):
+        recorder = self.make_recorder()
+        for _ in range(7):
+            recorder.record(self.make_event())
+        self.assertEqual(Click.objects.count(), 0)
+        with patch("api.clicks.Click.objects.bulk_create", wraps=Click.objects.bulk_create) as bulk_create:
+            recorder.flush()
+        self.assertEqual(bulk_create.call_count, 3)
+        self.assertEqual(Click.objects.filter(redirected=True).count(), 7)
+        self.assertEqual(recorder.stats["written"], 7)
+
+    def test_drop_policy_discards_events_when_full(self):
+        recorder = self.make_recorder(queue_size=2)
+        for _ in range(5):
+            recorder.record(self.make_event())
+        recorder.flush()
+        self.assertEqual(Click.objects.count(), 2)
+        self.assertEqual(recorder.stats["dropped"], 3)
+
+
+class ClickRecorderDeletedURLTests(TransactionTestCase):
+    # Foreign keys are only checked on commit, so this needs real transactions.
+
+    def setUp(self):
+        reload_dimensions()
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_clicks_on_deleted_urls_do_not_fail_the_batch(self):
+        kept = URL.objects.create(original_url="https://example.com/kept", shortened_slug="kept1")
+        gone = URL.objects.create(original_url="https://example.com/gone", shortened_slug="gone1")
+        recorder = ClickRecorder(
+            queue_size=10, batch_size=10, flush_interval=1.0, overflow=OVERFLOW_DROP, block_timeout=0
+        )
+        recorder._ensure_started = lambda: None
+        for url in (kept, gone, kept):
+            recorder.record(
+                ClickEvent(url.uuid, None, "10.0.0.1", "", True, timezone.now())
+            )
+        gone.delete()
+        recorder.flush()
+        self.assertEqual(Click.objects.filter(url=kept).count(), 2)
+        self.assertEqual((recorder.stats["written"], recorder.stats["failed"]), (2, 1))
+
+
+TESTDATA = Path(__file__).resolve().parent / "testdata"
+
+
+class GeoLocatorTests(TestCase):
+    def test_backends_resolve_fixture_networks(self):
+        for backend in (
+            CSVRangeBackend(TESTDATA / "geoip-test.csv"),
+            MMDBBackend(TESTDATA / "geoip-test.mmdb"),
+        ):
+            locator = GeoLocator(backend=backend)
+            self.assertEqual(locator.country("8.8.8.8"), "US")
+            self.assertEqual(locator.country("81.2.69.160"), "GB")
+            self.assertIsNone(locator.country("9.9.9.9"))
+            self.assertIsNone(locator.country("not-an-ip"))
+
+    def test_backend_without_lookup_cannot_be_constructed(self):
+        class Incomplete(GeoBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_csv_backend_handles_ipv6_ranges(self):
+        locator = GeoLocator(backend=CSVRangeBackend(TESTDATA / "geoip-test.csv"))
+        self.assertEqual(locator.country("2001:4860::8888"), "US")
+
+    def test_lookups_are_cached_by_prefix(self):
+        backend = CSVRangeBackend(TESTDATA / "geoip-test.csv")
+        locator = GeoLocator(backend=backend)
+        with patch.object(backend, "country", wraps=backend.country) as lookup:
+            locator.country("1.0.0.1")
+            locator.country("1.0.0.200")
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(locator.cache.stats()["hits"], 1)
+
+    def test_remote_fallback_is_only_used_for_local_misses(self):
+        fallback = Mock()
+        fallback.country.return_value = "CH"
+        locator = GeoLocator(
+            backend=CSVRangeBackend(TESTDATA / "geoip-test.csv"), fallback=fallback
+        )
+        self.assertEqual(locator.country("8.8.8.8"), "US")
+        self.assertEqual(locator.country("9.9.9.9"), "CH")
+        fallback.country.assert_called_once_with("9.9.9.9")
+
+
+class UserAgentClassificationTests(TestCase):
+    def test_classifies_once_per_distinct_user_agent(self):
+        classify_user_agent.cache_clear()
+        agent = (
+            "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 "
+            "(KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1"
+        )
+        with patch("api.utils.parse", wraps=parse) as parser:
+            info = classify_user_agent(agent)
+            classify_user_agent(agent)
+        self.assertEqual(parser.call_count, 1)
+        self.assertEqual(info.browser, "Mobile Safari")
+        self.assertEqual(info.platform, "iOS")
+        self.assertEqual(info.device, "Mobile")
+
+
+class DimensionRegistryTests(TestCase):
+    def test_resolves_names_from_memory_after_load(self):
+        existing = Country.objects.create(country_name="GB")
+        registry = DimensionRegistry(reload_interval=300)
+        registry.load()
+        with self.assertNumQueries(0):
+            self.assertEqual(registry.country.resolve("GB"), existing.pk)
+        created = registry.country.resolve("FR")
+        self.assertTrue(Country.objects.filter(pk=created, country_name="FR").exists())
+
+    def test_creation_race_falls_back_to_existing_row(self):
+        registry = DimensionRegistry(reload_interval=300)
+        registry.load()
+        # Created by another worker after this one loaded its map.
+        other = Country.objects.create(country_name="DE")
+        self.assertEqual(registry.country.resolve("DE"), other.pk)
+        self.assertEqual(Country.objects.filter(country_name="DE").count(), 1)
+
+    def test_deleting_a_row_triggers_reload(self):
+        registry = DimensionRegistry(reload_interval=300)
+        registry.load()
+        registry.refresh_if_stale()
+        stale = registry.country.resolve("NL")
+        Country.objects.filter(pk=stale).delete()
+        Country.objects.create(country_name="NL")
+        registry.refresh_if_stale()
+        self.assertNotEqual(registry.country.resolve("NL"), stale)
+
+
+class ClickCounterTests(TestCase):
+    def setUp(self):
+        self.url = URL.objects.create(
+            original_url="https://example.com", shortened_slug="cnt123"
+        )
+        self.gb = Country.objects.create(country_name="GB")
+        self.us = Country.objects.create(country_name="US")
+
+    def make_clicks(self, country, count):
+        return Click.objects.bulk_create(
+            Click(url=self.url, ip_address="10.0.0.1", country=country)
+            for _ in range(count)
+        )
+
+    def test_deltas_are_applied_in_bulk(self):
+        counter = ClickCounter(flush_interval=60)
+        counter.add(self.make_clicks(self.gb, 3))
+        counter.add(self.make_clicks(self.us, 3))
+        self.gb.refresh_from_db()
+        self.assertEqual(self.gb.click_count, 0)
+        with self.assertNumQueries(1):
+            counter.flush()
+        self.gb.refresh_from_db()
+        self.us.refresh_from_db()
+        self.assertEqual((self.gb.click_count, self.us.click_count), (3, 3))
+
+    def test_rebuild_command_recounts_from_clicks(self):
+        self.make_clicks(self.gb, 2)
+        Country.objects.filter(pk=self.us.pk).update(click_count=99)
+        # Pending in this process; the rebuild must not count them twice.
+        get_counter().add(Click.objects.filter(country=self.gb))
+        call_command("rebuild_click_counts", chunk_size=1, stdout=StringIO())
+        get_counter().flush()
+        self.gb.refresh_from_db()
+        self.us.refresh_from_db()
+        self.assertEqual((self.gb.click_count, self.us.click_count), (2, 0))
+
+
+class SlugAllocatorTests(TestCase):
+    def test_permutation_is_reversible_and_scrambled(self):
+        values = [permute(value, 2) for value in range(62**2)]
+        self.assertEqual(len(set(values)), 62**2)
+        self.assertEqual([unpermute(value, 2) for value in values[:100]], list(range(100)))
+        self.assertNotEqual(values[1] - values[0], values[2] - values[1])
+
+    def test_allocators_never_overlap_and_grow_slug_length(self):
+        first = SlugAllocator(block_size=20, min_length=1)
+        second = SlugAllocator(block_size=20, min_length=1)
+        slugs = first.allocate_many(50) + second.allocate_many(50) + first.allocate_many(50)
+        self.assertEqual(len(set(slugs)), 150)
+        self.assertEqual({len(slug) for slug in slugs}, {1, 2})
+
+    def test_allocation_within_a_block_needs_no_queries(self):
+        allocator = SlugAllocator(block_size=100, min_length=6)
+        allocator.allocate()
+        with self.assertNumQueries(0):
+            allocator.allocate_many(50)
+
+
+class ClickRollupTests(APITestCase):
+    def setUp(self):
+        reload_dimensions()
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="testpassword"
+        )
+        self.url = URL.objects.create(
+            original_url="https://example.com", shortened_slug="rol123", owner=self.user
+        )
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ingest(self, *times, redirected=True):
+        return ingest_clicks(
+            [
+                ClickEvent(self.url.uuid, self.user.uuid, "10.0.0.1", "", redirected, at)
+                for at in times
+            ]
+        )
+
+    def rollup_counts(self, granularity):
+        return dict(
+            ClickRollup.objects.filter(granularity=granularity)
+            .values_list("bucket", "click_count")
+            .order_by("bucket")
+        )
+
+    def test_ingest_maintains_hourly_and_daily_rollups(self):
+        start = datetime(2025, 3, 1, 10, 15, tzinfo=dt_timezone.utc)
+        self.ingest(start, start + timedelta(minutes=30))
+        self.ingest(start + timedelta(hours=1), start + timedelta(days=1))
+        self.assertEqual(
+            self.rollup_counts(ClickRollup.HOUR),
+            {
+                datetime(2025, 3, 1, 10, tzinfo=dt_timezone.utc): 2,
+                datetime(2025, 3, 1, 11, tzinfo=dt_timezone.utc): 1,
+                datetime(2025, 3, 2, 10, tzinfo=dt_timezone.utc): 1,
+            },
+        )
+        self.assertEqual(
+            self.rollup_counts(ClickRollup.DAY),
+            {
+                datetime(2025, 3, 1, tzinfo=dt_timezone.utc): 3,
+                datetime(2025, 3, 2, tzinfo=dt_timezone.utc): 1,
+            },
+        )
+        first_day = ClickRollup.objects.get(
+            granularity=ClickRollup.DAY, bucket=datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(
+            (first_day.first_click, first_day.last_click), (start, start + timedelta(hours=1))
+        )
+
+    def test_analytics_view_reads_rollups(self):
+        now = timezone.now()
+        self.ingest(now, now)
+        self.ingest(now, redirected=False)
+        Click.objects.all().delete()
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("url-analytics", args=[self.url.uuid]))
+        self.assertEqual(response.data["total_clicks"], 3)
+        self.assertEqual(response.data["successful_redirects"], 2)
+        self.assertEqual(response.data["failed_redirects"], 1)
+        self.assertEqual(response.data["countries"], ["Testland"])
+
+    def test_breakdown_counts_each_facet_in_one_query(self):
+        first = datetime(2025, 3, 1, 10, tzinfo=dt_timezone.utc)
+        with patch("api.clicks.get_geolocation", return_value="GB"):
+            self.ingest(first, first + timedelta(days=1))
+        self.ingest(first + timedelta(hours=2), redirected=False)
+        self.client.force_authenticate(self.user)
+        # The URL, the whole breakdown in one pass, and the visitor sketch.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("url-analytics", args=[self.url.uuid]))
+        self.assertEqual(response.data["first_click"], first)
+        self.assertEqual(response.data["last_click"], first + timedelta(days=1))
+        self.assertEqual(response.data["countries"], ["GB", "Testland"])
+        self.assertEqual(
+            response.data["breakdown"]["countries"],
+            [
+                {"name": "GB", "clicks": 2, "successful_redirects": 2, "failed_redirects": 0},
+                {"name": "Testland", "clicks": 1, "successful_redirects": 0, "failed_redirects": 1},
+            ],
+        )
+        self.assertEqual(
+            response.data["breakdown"]["browsers"],
+            [{"name": "Other", "clicks": 3, "successful_redirects": 2, "failed_redirects": 1}],
+        )
+
+    def test_backfill_rebuilds_from_clicks(self):
+        now = timezone.now()
+        self.ingest(now, now - timedelta(days=2))
+        # Clicks without dimensions roll up under Unknown.
+        Click.objects.create(url=self.url, ip_address="10.0.0.2", timestamp=now)
+        ClickRollup.objects.all().delete()
+        call_command("backfill_click_rollups", chunk_size=1, stdout=StringIO())
+        for granularity in (ClickRollup.HOUR, ClickRollup.DAY):
+            rollups = ClickRollup.objects.filter(granularity=granularity)
+            self.assertEqual(rollups.aggregate(total=Sum("click_count"))["total"], 3)
+        unknown = ClickRollup.objects.filter(country__country_name="Unknown")
+        self.assertEqual(unknown.count(), 2)
+
+
+class ClickTimeSeriesTests(APITestCase):
+    def setUp(self):
+        reload_dimensions()
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="testpassword"
+        )
+        self.urls = [
+            URL.objects.create(
+                original_url=f"https://example.com/{i}", shortened_slug=f"ts{i}", owner=self.user
+            )
+            for i in range(2)
+        ]
+        self.created = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        URL.objects.filter(owner=self.user).update(creation_date=self.created)
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_authenticate(self.user)
+
+    def ingest(self, url, *times):
+        ingest_clicks(
+            [ClickEvent(url.uuid, self.user.uuid, "10.0.0.1", "", True, at) for at in times]
+        )
+
+    def series(self, url=None, **params):
+        if url is None:
+            path = reverse("click-timeseries")
+        else:
+            path = reverse("url-timeseries", args=[url.uuid])
+        return self.client.get(path, params)
+
+    def test_hourly_series_fills_gaps_with_zeros(self):
+        start = datetime(2025, 3, 1, 10, tzinfo=dt_timezone.utc)
+        self.ingest(self.urls[0], start + timedelta(minutes=15), start + timedelta(hours=2))
+        response = self.series(
+            self.urls[0],
+            interval="hour",
+            start=start.isoformat(),
+            end=(start + timedelta(hours=3)).isoformat(),
+        )
+        self.assertEqual([p["clicks"] for p in response.data["points"]], [1, 0, 1])
+
+    def test_buckets_follow_the_requested_time_zone(self):
+        # 23:30 UTC on March 1st is already March 2nd in Berlin.
+        self.ingest(self.urls[0], datetime(2025, 3, 1, 23, 30, tzinfo=dt_timezone.utc))
+        response = self.series(
+            interval="day",
+            tz="Europe/Berlin",
+            start="2025-03-01T00:00:00+01:00",
+            end="2025-03-03T00:00:00+01:00",
+        )
+        points = response.data["points"]
+        self.assertEqual([p["clicks"] for p in points], [0, 1])
+        self.assertEqual(points[1]["bucket"].isoformat(), "2025-03-02T00:00:00+01:00")
+
+    def test_owner_series_covers_all_urls_and_downsamples(self):
+        day = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        self.ingest(self.urls[0], day)
+        self.ingest(self.urls[1], day + timedelta(hours=5))
+        response = self.series(
+            interval="hour",
+            start=day.isoformat(),
+            end=(day + timedelta(days=365)).isoformat(),
+            max_points=100,
+        )
+        self.assertEqual(response.data["interval"], "week")
+        self.assertLessEqual(len(response.data["points"]), 100)
+        self.assertEqual(sum(p["clicks"] for p in response.data["points"]), 2)
+
+    def test_range_that_exactly_fills_max_points_keeps_the_interval(self):
+        start = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        response = self.series(
+            interval="hour",
+            start=start.isoformat(),
+            end=(start + timedelta(hours=24)).isoformat(),
+            max_points=24,
+        )
+        self.assertEqual(response.data["interval"], "hour")
+        self.assertEqual(len(response.data["points"]), 24)
+
+    def test_start_is_clamped_to_the_oldest_url(self):
+        response = self.series(
+            self.urls[0],
+            interval="month",
+            start="1900-01-01T00:00:00Z",
+            end="2025-04-01T00:00:00Z",
+        )
+        self.assertEqual(response.data["start"], self.created)
+        self.assertEqual(len(response.data["points"]), 3)
+
+    def test_range_too_wide_for_monthly_points_is_rejected(self):
+        response = self.series(
+            interval="month", start="2025-01-01T00:00:00Z", end="2035-01-01T00:00:00Z", max_points=12
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+    def test_unknown_time_zone_is_rejected(self):
+        response = self.series(tz="Mars/Olympus")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UniqueVisitorTests(APITestCase):
+    def setUp(self):
+        reload_dimensions()
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="testpassword"
+        )
+        self.url = URL.objects.create(
+            original_url="https://example.com", shortened_slug="uv1234", owner=self.user
+        )
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_authenticate(self.user)
+
+    def test_estimates_are_within_error_bounds(self):
+        for exact in (100, 5000, 50000):
+            sketch = HyperLogLog()
+            sketch.update(f"10.{i >> 16}.{(i >> 8) & 255}.{i & 255}" for i in range(exact))
+            error = abs(sketch.count() - exact) / exact
+            self.assertLess(error, 3 * standard_error(), exact)
+
+    def test_merged_sketches_estimate_the_union(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        first.update(range(0, 3000))
+        second.update(range(2000, 5000))
+        first.merge(HyperLogLog.from_bytes(second.to_bytes()))
+        self.assertLess(abs(first.count() - 5000) / 5000, 3 * standard_error())
+
+    def test_visitors_are_counted_per_url_and_day_range(self):
+        day = datetime(2025, 3, 1, 12, tzinfo=dt_timezone.utc)
+        ingest_clicks(
+            ClickEvent(self.url.uuid, None, f"10.0.{i % 150}.1", "", True, day)
+            for i in range(300)
+        )
+        ingest_clicks(
+            ClickEvent(self.url.uuid, None, f"10.0.{i}.1", "", True, day + timedelta(days=1))
+            for i in range(100, 200)
+        )
+        exact = Click.objects.values("ip_address").distinct().count()
+        path = reverse("url-visitors", args=[self.url.uuid])
+        self.assertEqual(exact, 200)
+        self.assertAlmostEqual(self.client.get(path).data["unique_visitors"], exact, delta=4)
+        second_day = self.client.get(path, {"start": "2025-03-02", "end": "2025-03-02"})
+        self.assertAlmostEqual(second_day.data["unique_visitors"], 100, delta=2)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="testpassword"
+        )
+        self.urls = [
+            URL.objects.create(
+                original_url=f"https://example.com/{i}", shortened_slug=f"page{i}", owner=self.user
+            )
+            for i in range(7)
+        ]
+        # Ties on creation_date must be broken by uuid without skipping rows.
+        created = timezone.now()
+        URL.objects.filter(pk__in=[url.pk for url in self.urls[:4]]).update(
+            creation_date=created
+        )
+        self.client.force_authenticate(self.user)
+
+    def walk(self, path, params):
+        pages = []
+        while path:
+            response = self.client.get(path, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            path, params = response.data["next"], None
+        return pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        pages = self.walk(reverse("user-url-list"), {"page_size": 3})
+        self.assertEqual([len(page["results"]) for page in pages], [3, 3, 1])
+        served = [row["uuid"] for page in pages for row in page["results"]]
+        expected = URL.objects.order_by("-creation_date", "-uuid").values_list("uuid", flat=True)
+        self.assertEqual(served, [str(uuid) for uuid in expected])
+
+        back = self.client.get(pages[2]["previous"]).data
+        self.assertEqual(back["results"], pages[1]["results"])
+
+    def test_deep_pages_are_fetched_by_key_not_offset(self):
+        path = reverse("user-url-list")
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(path, {"page_size": 2})
+        for _ in range(2):
+            response = self.client.get(response.data["next"])
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(response.data["next"])
+        self.assertEqual(len(deep), len(first))
+        self.assertNotIn("OFFSET", deep[0]["sql"])
+
+    def test_click_list_filters(self):
+        now = timezone.now()
+        for i, url in enumerate(self.urls[:2]):
+            Click.objects.create(url=url, ip_address="10.0.0.1", redirected=bool(i))
+            Click.objects.create(
+                url=url, ip_address="10.0.0.1", timestamp=now - timedelta(days=3)
+            )
+        path = reverse("click-list")
+        response = self.client.get(path, {"url": self.urls[1].uuid, "redirected": "true"})
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get(path, {"start": (now - timedelta(days=1)).isoformat()})
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(path, {"start": now.isoformat(), "end": now.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FlatSerializationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="testpassword"
+        )
+        self.country = Country.objects.create(country_name="GB")
+        for i in range(3):
+            url = URL.objects.create(
+                original_url=f"https://example.com/{i}", shortened_slug=f"flat{i}", owner=self.user
+            )
+            for _ in range(4):
+                Click.objects.create(
+                    url=url, owner=self.user, ip_address="10.0.0.1", country=self.country
+                )
+        self.client.force_authenticate(self.user)
+
+    def test_click_page_costs_one_query_with_or_without_expansion(self):
+        with self.assertNumQueries(1):
+            flat = self.client.get(reverse("click-list"))
+        click = flat.data["results"][0]
+        self.assertEqual(click["country"], "GB")
+        self.assertIsNone(click["browser"])
+        self.assertEqual(click["owner"], self.user.uuid)
+        self.assertIn(click["url"], URL.objects.values_list("uuid", flat=True))
+
+        with self.assertNumQueries(1):
+            expanded = self.client.get(
+                reverse("click-list"), {"expand": "url,owner,url.owner"}
+            )
+        click = expanded.data["results"][0]
+        self.assertEqual(click["owner"]["username"], "owner")
+        self.assertEqual(click["url"]["owner"]["username"], "owner")
+        self.assertEqual(len(expanded.data["results"]), 12)
+
+    def test_url_page_costs_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("user-url-list"), {"expand": "owner"})
+        self.assertEqual(response.data["results"][0]["owner"]["username"], "owner")
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.client.get(reverse("click-list"), {"expand": "url.password"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ClickExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="testpassword"
+        )
+        self.url = URL.objects.create(
+            original_url="https://example.com", shortened_slug="exp123", owner=self.user
+        )
+        other = URL.objects.create(original_url="https://example.com/other", shortened_slug="exp456")
+        country = Country.objects.create(country_name="GB")
+        for i in range(5):
+            Click.objects.create(
+                url=self.url, ip_address=f"10.0.0.{i}", country=country, redirected=True
+            )
+        Click.objects.create(url=other, ip_address="10.0.0.9")
+        self.client.force_authenticate(self.user)
+
+    def test_csv_streams_only_the_owners_clicks(self):
+        response = self.client.get(reverse("click-export", args=["csv"]))
+        self.assertTrue(response.streaming)
+        # The rows are fetched lazily, in one query, while streaming.
+        with self.assertNumQueries(1):
+            body = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["slug"], "exp123")
+        self.assertEqual(rows[0]["country"], "GB")
+        self.assertEqual(rows[0]["redirected"], "True")
+
+    def test_ndjson_export_of_one_url(self):
+        response = self.client.get(
+            reverse("url-click-export", args=[self.url.uuid, "ndjson"])
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]["url_id"], str(self.url.uuid))
+
+    def test_export_command_writes_file(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "clicks.ndjson"
+            call_command(
+                "export_clicks", format="ndjson", output=str(path), chunk_size=2, stderr=StringIO()
+            )
+            self.assertEqual(len(path.read_text().splitlines()), 6)
+
+    def test_failed_parquet_export_is_reported_and_cleaned_up(self):
+        handles = []
+
+        def temporary_file():
+            handles.append(TemporaryFile())
+            return handles[-1]
+
+        with patch("api.views.tempfile.TemporaryFile", side_effect=temporary_file), patch(
+            "api.views.write_parquet", side_effect=OSError("No space left on device")
+        ):
+            response = self.client.get(reverse("click-export", args=["parquet"]))
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn("error", response.data)
+        self.assertTrue(handles[0].closed)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse("click-export", args=["xlsx"]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ClickRetentionTests(APITestCase):
+    def setUp(self):
+        reload_dimensions()
+        self.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="testpassword"
+        )
+        self.url = URL.objects.create(
+            original_url="https://example.com", shortened_slug="ret123", owner=self.user
+        )
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.old = datetime(2024, 1, 15, tzinfo=dt_timezone.utc)
+        ingest_clicks(
+            ClickEvent(self.url.uuid, None, f"10.0.0.{i}", "", True, self.old + timedelta(days=i * 20))
+            for i in range(5)
+        )
+        ingest_clicks([ClickEvent(self.url.uuid, None, "10.0.1.1", "", True, timezone.now())])
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_old_clicks_are_archived_and_analytics_unchanged(self):
+        call_command(
+            "archive_clicks", days=30, chunk_size=2, directory=self.directory.name, stdout=StringIO()
+        )
+        self.assertEqual(Click.objects.count(), 1)
+        self.assertEqual(ClickArchive.objects.count(), 4)
+        self.assertEqual(sum(ClickArchive.objects.values_list("click_count", flat=True)), 5)
+
+        # Rebuilding from the remaining clicks keeps the archived rollups.
+        call_command("backfill_click_rollups", stdout=StringIO())
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("url-analytics", args=[self.url.uuid]))
+        self.assertEqual(response.data["total_clicks"], 6)
+        self.assertEqual(response.data["unique_visitors"], 6)
+
+    def test_archived_clicks_leave_the_dimension_counts(self):
+        get_counter().flush()
+        testland = Country.objects.get(country_name="Testland")
+        self.assertEqual(testland.click_count, 6)
+        call_command("archive_clicks", days=30, directory=self.directory.name, stdout=StringIO())
+        testland.refresh_from_db()
+        self.assertEqual(testland.click_count, 1)
+
+    def test_purged_clicks_leave_the_archive(self):
+        other = URL.objects.create(
+            original_url="https://example.com/other", shortened_slug="ret456", owner=self.user
+        )
+        ingest_clicks([ClickEvent(other.uuid, None, "10.0.2.1", "", True, self.old)])
+        call_command("archive_clicks", days=30, directory=self.directory.name, stdout=StringIO())
+        paths = set(ClickArchive.objects.values_list("path", flat=True))
+
+        self.assertEqual(purge_archived_clicks(url_ids=[self.url.uuid]), 5)
+        start, end = self.old.date(), timezone.now().date()
+        self.assertEqual([row[1] for row in archived_rows(start, end)], [str(other.uuid)])
+        self.assertEqual(sum(ClickArchive.objects.values_list("click_count", flat=True)), 1)
+        # The old files are gone, not just unlisted.
+        for path in paths - set(ClickArchive.objects.values_list("path", flat=True)):
+            self.assertFalse(Path(path).exists())
+        self.assertEqual(purge_archived_clicks(url_ids=[self.url.uuid]), 0)
+
+    def test_archived_months_can_be_rehydrated(self):
+        call_command(
+            "archive_clicks", days=30, directory=self.directory.name, stdout=StringIO()
+        )
+        output = Path(self.directory.name) / "jan-feb.ndjson"
+        call_command(
+            "rehydrate_clicks",
+            start="2024-01",
+            end="2024-02",
+            url=str(self.url.uuid),
+            format="ndjson",
+            output=str(output),
+            stderr=StringIO(),
+        )
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        self.assertEqual([r["ip_address"] for r in records], ["10.0.0.0", "10.0.0.1", "10.0.0.2"])
+        self.assertEqual(records[0]["country"], "Testland")
+
+
+class OwnerSummaryTests(APITestCase):
+    def setUp(self):
+        reload_dimensions()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="summary", email="summary@example.com", password="testpassword"
+        )
+        self.urls = [
+            URL.objects.create(
+                original_url=f"https://example.com/summary/{i}",
+                shortened_slug=f"sum{i}",
+                owner=self.user,
+            )
+            for i in range(3)
+        ]
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_authenticate(self.user)
+
+    def ingest(self, url, count, redirected=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_clicks(
+                [
+                    ClickEvent(url.uuid, self.user.uuid, "10.0.0.1", "", redirected, timezone.now())
+                    for _ in range(count)
+                ]
+            )
+
+    def summary(self):
+        return self.client.get(reverse("owner-summary")).data
+
+    def test_summary_covers_every_url(self):
+        self.ingest(self.urls[0], 2)
+        self.ingest(self.urls[1], 3)
+        self.ingest(self.urls[1], 1, redirected=False)
+
+        data = self.summary()
+        self.assertEqual(data["total_links"], 3)
+        self.assertEqual(data["total_clicks"], 6)
+        self.assertEqual(data["failed_redirects"], 1)
+        clicks = {url["uuid"]: url["clicks"] for url in data["urls"]}
+        self.assertEqual(clicks[self.urls[2].uuid], 0)
+        self.assertEqual(
+            [url["uuid"] for url in data["top_links"]], [self.urls[1].uuid, self.urls[0].uuid]
+        )
+        self.assertEqual(len(data["clicks_by_day"]), 30)
+        self.assertEqual(data["clicks_by_day"][-1]["clicks"], 6)
+        self.assertEqual(data["breakdown"]["countries"][0]["name"], "Testland")
+
+    def test_new_clicks_are_applied_to_the_cached_summary(self):
+        self.ingest(self.urls[0], 1)
+        self.ingest(self.urls[1], 1, redirected=False)
+        built = self.summary()
+        with self.assertNumQueries(0):
+            self.summary()
+
+        self.ingest(self.urls[1], 2)
+        self.ingest(self.urls[2], 1, redirected=False)
+        with self.assertNumQueries(0):
+            data = self.summary()
+        self.assertEqual(data["generated_at"], built["generated_at"])
+
+        cache.clear()
+        rebuilt = self.summary()
+        for field in ("total_clicks", "failed_redirects", "urls", "top_links", "breakdown"):
+            self.assertEqual(data[field], rebuilt[field], field)
+        self.assertEqual(
+            [p["clicks"] for p in data["clicks_by_day"]],
+            [p["clicks"] for p in rebuilt["clicks_by_day"]],
+        )
+        self.assertEqual(data["total_clicks"], 5)
+
+    @override_settings(OWNER_SUMMARY={"MAX_STALENESS": 60})
+    def test_clicks_committed_during_a_build_are_not_lost(self):
+        self.ingest(self.urls[0], 1)
+        self.assertEqual(self.summary()["total_clicks"], 1)
+
+        def build_racing_a_batch(owner):
+            summary = build_owner_summary(owner)
+            # Commits after the build read the rollups, before it is cached.
+            self.ingest(self.urls[0], 1)
+            return summary
+
+        cache.delete(f"owner-summary:{self.user.pk}")
+        with patch("api.summaries.build_owner_summary", side_effect=build_racing_a_batch):
+            self.assertEqual(self.summary()["total_clicks"], 1)
+        self.assertIsNone(cache.get(f"owner-summary-building:{self.user.pk}"))
+        later = time.time() + 61
+        with patch("api.summaries.time.time", return_value=later):
+            self.assertEqual(self.summary()["total_clicks"], 2)
+
+    @override_settings(OWNER_SUMMARY={"MAX_STALENESS": 60})
+    def test_locked_summary_is_rebuilt_once_stale(self):
+        self.ingest(self.urls[0], 1)
+        self.assertEqual(self.summary()["total_clicks"], 1)
+
+        cache.add(f"owner-summary-lock:{self.user.pk}", True)
+        self.ingest(self.urls[0], 1)
+        self.assertEqual(self.summary()["total_clicks"], 1)
+        later = time.time() + 61
+        with patch("api.summaries.time.time", return_value=later):
+            self.assertEqual(self.summary()["total_clicks"], 2)
+
+    @override_settings(OWNER_SUMMARY={"MAX_STALENESS": 0})
+    def test_url_changes_invalidate_the_summary(self):
+        self.assertEqual(self.summary()["total_links"], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.urls[2].delete()
+        self.assertEqual(self.summary()["total_links"], 2)
+
+
+@override_settings(SLUG_FILTER=SYNC_SLUG_FILTER, BULK_SHORTEN={"MAX_URLS": 100})
+class BulkShortenTests(APITestCase):
+    def setUp(self):
+        get_slug_filter().rebuild()
+        self.user = User.objects.create_user(
+            username="bulk", email="bulk@example.com", password="testpassword"
+        )
+        URL.objects.create(original_url="https://other.example/", shortened_slug="taken1")
+        self.existing = URL.objects.create(
+            original_url="https://example.com/old", shortened_slug="bulkold", owner=self.user
+        )
+        self.client.force_authenticate(self.user)
+
+    def shorten(self, urls):
+        return self.client.post(reverse("url-bulk-create"), {"urls": urls}, format="json")
+
+    def test_results_follow_input_order(self):
+        response = self.shorten(
+            [
+                {"original_url": "example.com/new"},
+                {"original_url": "https://example.com/old"},
+                {"original_url": "https://example.com/custom", "shortened_slug": "mine1"},
+                {"original_url": "https://example.com/clash", "shortened_slug": "taken1"},
+                {"original_url": "not a url"},
+                {"original_url": "https://example.com/new"},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.data["results"]
+        self.assertEqual(
+            [item["status"] for item in results],
+            ["created", "existing", "created", "error", "error", "existing"],
+        )
+        self.assertEqual(results[0]["url"]["original_url"], "https://example.com/new")
+        self.assertEqual(results[5]["url"]["uuid"], results[0]["url"]["uuid"])
+        self.assertEqual(results[1]["url"]["uuid"], str(self.existing.uuid))
+        self.assertEqual(results[2]["url"]["shortened_slug"], "mine1")
+        self.assertEqual(results[3]["error"], "This slug is already in use")
+        self.assertEqual(
+            (response.data["created"], response.data["existing"], response.data["failed"]),
+            (2, 2, 2),
+        )
+        self.assertEqual(URL.objects.filter(owner=self.user).count(), 3)
+        self.assertTrue(get_slug_filter().might_contain("mine1"))
+        self.assertEqual(resolve_slug("mine1").original_url, "https://example.com/custom")
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        def queries(prefix, count):
+            urls = [
+                {"original_url": f"https://example.com/{prefix}/{i}", "shortened_slug": f"{prefix}{i}"}
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as captured:
+                response = self.shorten(urls)
+            self.assertEqual(response.data["created"], count)
+            return len(captured)
+
+        self.assertEqual(queries("few", 3), queries("many", 60))
+
+    def test_rejects_oversized_batches(self):
+        urls = [{"original_url": f"https://example.com/{i}"} for i in range(101)]
+        self.assertEqual(self.shorten(urls).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.shorten([]).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class URLDeduplicationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="dedup", email="dedup@example.com", password="testpassword"
+        )
+        self.url = URL.objects.create(
+            original_url="https://example.com/docs?b=2&a=1",
+            shortened_slug="dedup1",
+            owner=self.user,
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_canonical_form(self):
+        self.assertEqual(
+            canonicalize_url("HTTPS://Example.COM:443/docs/?b=2&a=1"),
+            "https://example.com/docs?a=1&b=2",
+        )
+        self.assertEqual(canonicalize_url("example.com"), "https://example.com/")
+        self.assertEqual(canonicalize_url("http://example.com:8080"), "http://example.com:8080/")
+        self.assertNotEqual(url_hash("https://example.com/a"), url_hash("https://example.com/b"))
+
+    def test_hash_follows_edits(self):
+        self.assertEqual(self.url.original_url_hash, url_hash("example.com/docs?a=1&b=2"))
+        self.url.original_url = "https://example.org/"
+        self.url.save(update_fields=["original_url"])
+        self.url.refresh_from_db()
+        self.assertEqual(self.url.original_url_hash, url_hash("https://example.org"))
+
+    def test_create_finds_equivalent_url(self):
+        response = self.client.post(
+            reverse("url-create"),
+            {"original_url": "Example.com/docs/?a=1&b=2"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["uuid"], str(self.url.uuid))
+
+
+class GuestMigrationTests(TestCase):
+    def setUp(self):
+        reload_dimensions()
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(
+            username="member", email="member@example.com", password="testpassword"
+        )
+
+    def make_guest(self, name, count):
+        guest = User.objects.create_user(username=name, email="")
+        guest.user_type = USER_TYPE_GUEST
+        guest.save(update_fields=["user_type"])
+        urls = [
+            URL.objects.create(
+                original_url=f"https://example.com/{name}/{i}",
+                shortened_slug=f"{name}{i}",
+                owner=guest,
+            )
+            for i in range(count)
+        ]
+        return guest, urls
+
+    def click(self, url, ip_address="10.0.0.1"):
+        ingest_clicks(
+            [ClickEvent(url.uuid, url.owner_id, ip_address, "", True, timezone.now())]
+        )
+
+    def test_transfers_and_merges(self):
+        guest, (kept, duplicate) = self.make_guest("guest", 2)
+        mine = URL.objects.create(
+            original_url="example.com/guest/1/", shortened_slug="mine", owner=self.user
+        )
+        self.click(kept)
+        self.click(mine, "10.0.0.1")
+        self.click(duplicate, "10.0.0.2")
+        self.click(duplicate, "10.0.0.3")
+
+        self.assertEqual(migrate_guest(guest, self.user), (1, 1))
+
+        self.assertFalse(User.objects.filter(username="guest").exists())
+        self.assertEqual(
+            set(URL.objects.filter(owner=self.user).values_list("shortened_slug", flat=True)),
+            {"guest0", "mine"},
+        )
+        self.assertEqual(Click.objects.filter(url=mine).count(), 3)
+        self.assertEqual(Click.objects.filter(owner=self.user).count(), 4)
+        self.assertEqual(url_breakdown(mine)["total_clicks"], 3)
+        self.assertEqual(unique_visitors(mine.uuid), 3)
+        self.assertEqual(resolve_slug("guest0").owner_id, self.user.uuid)
+
+    def test_merges_duplicate_guest_links(self):
+        guest = User.objects.create_user(username="twice", email="")
+        first, second = [
+            URL.objects.create(original_url=url, shortened_slug=f"twice{i}", owner=guest)
+            for i, url in enumerate(["https://example.com/same", "example.com/same/"])
+        ]
+        self.click(first, "10.0.0.1")
+        self.click(second, "10.0.0.2")
+
+        self.assertEqual(migrate_guest(guest, self.user), (1, 1))
+
+        self.assertEqual(
+            list(URL.objects.filter(owner=self.user).values_list("uuid", flat=True)),
+            [first.uuid],
+        )
+        self.assertEqual(Click.objects.filter(url=first).count(), 2)
+        self.assertEqual(url_breakdown(first)["total_clicks"], 2)
+        self.assertEqual(unique_visitors(first.uuid), 2)
+
+    def test_statements_do_not_grow_with_the_links(self):
+        def statements(name, count):
+            guest, urls = self.make_guest(name, count)
+            for url in urls[::2]:
+                URL.objects.create(
+                    original_url=url.original_url,
+                    shortened_slug=f"{url.shortened_slug}m",
+                    owner=self.user,
+                )
+                self.click(url)
+            with CaptureQueriesContext(connection) as captured:
+                migrate_guest(guest, self.user)
+            return len(captured)
+
+        self.assertEqual(statements("few", 2), statements("many", 20))
+
+
+@override_settings(SLUG_FILTER=SYNC_SLUG_FILTER)
+class URLImportTests(APITestCase):
+    CSV = (
+        "original_url,shortened_slug,expiration_date\n"
+        "example.com/one,,\n"
+        "https://example.com/two,imp2,2030-01-01T00:00:00Z\n"
+        "not a url,,\n"
+        "https://Example.com/one/,,\n"
+        "https://example.com/three,,\n"
+    )
+
+    def setUp(self):
+        get_slug_filter().rebuild()
+        self.user = User.objects.create_user(
+            username="importer", email="importer@example.com", password="testpassword"
+        )
+        self.directory = Path(self.enterContext(TemporaryDirectory()))
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content)
+        return path
+
+    def test_command_imports_and_reports_rejects(self):
+        path = self.write("links.csv", self.CSV)
+        rejects = self.directory / "rejects.csv"
+        out = StringIO()
+        call_command(
+            "import_urls",
+            str(path),
+            owner="importer",
+            chunk_size=2,
+            rejects=str(rejects),
+            stdout=out,
+        )
+        urls = URL.objects.filter(owner=self.user)
+        self.assertEqual(urls.count(), 3)
+        self.assertEqual(urls.get(shortened_slug="imp2").expiration_date.year, 2030)
+        self.assertEqual(
+            list(csv.reader(rejects.open())), [["3", "original_url: Enter a valid URL."]]
+        )
+        self.assertIn("5 rows: 3 created, 1 existing, 1 rejected", out.getvalue())
+
+    def test_rerun_resumes_after_interruption(self):
+        path = self.write("links.csv", self.CSV)
+        with open(path, "rb") as handle:
+            digest = source_digest(handle)
+
+        def interrupt(job, rejects):
+            raise KeyboardInterrupt
+
+        with open(path, newline="") as handle, self.assertRaises(KeyboardInterrupt):
+            import_urls(self.user, read_rows(handle, "csv"), digest, 2, on_chunk=interrupt)
+        self.assertEqual(URL.objects.filter(owner=self.user).count(), 2)
+
+        call_command(
+            "import_urls",
+            str(path),
+            owner="importer",
+            chunk_size=2,
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+        job = URLImport.objects.get(owner=self.user, digest=digest)
+        self.assertEqual((job.rows_done, job.created, job.existing, job.failed), (5, 3, 1, 1))
+        self.assertIsNotNone(job.completed_at)
+        self.assertEqual(URL.objects.filter(owner=self.user).count(), 3)
+
+    def test_upload_endpoint(self):
+        self.client.force_authenticate(self.user)
+        upload = SimpleUploadedFile(
+            "links.ndjson",
+            b'{"original_url": "https://example.com/a"}\n'
+            b"\n"
+            b"{broken\n"
+            b'{"original_url": "https://example.com/b", "shortened_slug": "impb"}\n',
+        )
+        response = self.client.post(
+            reverse("url-import", args=["ndjson"]), {"file": upload}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["rows"], response.data["created"]), (3, 2))
+        self.assertEqual(
+            response.data["rejects"], [{"row": 2, "error": "Each item must be an object"}]
+        )
+        self.assertTrue(URL.objects.filter(owner=self.user, shortened_slug="impb").exists())
+
+
+@override_settings(SLUG_FILTER=SYNC_SLUG_FILTER)
+class ExpirySweeperTests(TestCase):
+    def setUp(self):
+        clear_slug_cache()
+        past = timezone.now() - timedelta(hours=1)
+        self.expired = [
+            URL.objects.create(
+                original_url=f"https://example.com/old/{i}",
+                shortened_slug=f"exp{i}",
+                expiration_date=past,
+            )
+            for i in range(5)
+        ]
+        URL.objects.create(
+            original_url="https://example.com/later",
+            shortened_slug="later",
+            expiration_date=timezone.now() + timedelta(days=1),
+        )
+        URL.objects.create(original_url="https://example.com/forever", shortened_slug="forever")
+
+    def test_sweep_deactivates_expired_links_in_batches(self):
+        self.assertTrue(resolve_slug("exp0").is_active)
+        self.assertEqual(sweep_expired_urls(batch_size=2), {"expired": 5, "batches": 3})
+        self.assertEqual(
+            set(URL.objects.filter(is_active=True).values_list("shortened_slug", flat=True)),
+            {"later", "forever"},
+        )
+        self.assertFalse(resolve_slug("exp0").is_active)
+        self.assertEqual(sweep_expired_urls(), {"expired": 0, "batches": 0})
+
+    def test_command_reports_counts(self):
+        out = StringIO()
+        call_command("expire_urls", batch_size=10, stdout=out)
+        self.assertIn("Deactivated 5 expired links in 1 batches", out.getvalue())
+
+
+class IdleGuestCleanupTests(TestCase):
+    def setUp(self):
+        reload_dimensions()
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.long_ago = timezone.now() - timedelta(days=90)
+
+    def make_user(self, name, user_type=USER_TYPE_GUEST, clicked_at=None):
+        user = User.objects.create_user(username=name, email="")
+        User.objects.filter(pk=user.pk).update(user_type=user_type, last_login=self.long_ago)
+        url = URL.objects.create(
+            original_url=f"https://example.com/{name}", shortened_slug=name, owner=user
+        )
+        URL.objects.filter(pk=url.pk).update(creation_date=self.long_ago)
+        ingest_clicks(
+            [ClickEvent(url.uuid, user.pk, "10.0.0.1", "", True, clicked_at or self.long_ago)]
+        )
+        return user
+
+    def test_deletes_guests_that_never_logged_in(self):
+        # Only the visit that created the guest, and no links.
+        never = User.objects.create_user(username="never", email="")
+        User.objects.filter(pk=never.pk).update(
+            user_type=USER_TYPE_GUEST, date_joined=self.long_ago, last_login=self.long_ago
+        )
+        self.assertEqual(list(idle_guests(timezone.now() - timedelta(days=30))), [never])
+        self.assertEqual(delete_idle_guests(idle_days=30)["users"], 1)
+        self.assertFalse(User.objects.filter(pk=never.pk).exists())
+
+    def test_deletes_only_idle_guests(self):
+        for i in range(3):
+            self.make_user(f"idle{i}")
+        self.make_user("clicked", clicked_at=timezone.now())
+        self.make_user("member", user_type=USER_TYPE_FREE)
+        active = self.make_user("active")
+        User.objects.filter(pk=active.pk).update(last_login=timezone.now())
+
+        preview = delete_idle_guests(idle_days=30, dry_run=True)
+        self.assertEqual((preview["users"], preview["urls"], preview["clicks"]), (3, 3, 3))
+        self.assertEqual(User.objects.count(), 6)
+
+        totals = delete_idle_guests(idle_days=30, chunk_size=2, batch_size=1)
+        self.assertEqual((totals["users"], totals["urls"], totals["clicks"]), (3, 3, 3))
+        self.assertEqual(
+            set(User.objects.values_list("username", flat=True)), {"clicked", "member", "active"}
+        )
+        self.assertEqual(URL.objects.count(), 3)
+        self.assertEqual(Click.objects.count(), 3)
+        # One hourly and one daily rollup per remaining link.
+        self.assertEqual(ClickRollup.objects.count(), 6)
+
+    def test_guest_who_comes_back_meanwhile_is_kept(self):
+        self.make_user("idle")
+        back = self.make_user("back")
+        claim = guests._claim_idle_guests
+
+        def come_back_then_claim(cutoff, guest_ids):
+            User.objects.filter(pk=back.pk).update(last_login=timezone.now())
+            return claim(cutoff, guest_ids)
+
+        with patch("api.guests._claim_idle_guests", side_effect=come_back_then_claim):
+            totals = delete_idle_guests(idle_days=30)
+        self.assertEqual((totals["users"], totals["urls"]), (1, 1))
+        back.refresh_from_db()
+        self.assertTrue(back.is_active)
+        self.assertEqual(URL.objects.filter(owner=back).count(), 1)
+
+    def test_command_dry_run(self):
+        self.make_user("idle")
+        out = StringIO()
+        call_command("delete_idle_guests", dry_run=True, stdout=out)
+        self.assertIn("Would delete 1 guests", out.getvalue())
+        self.assertTrue(User.objects.filter(username="idle").exists())
+
+
+@override_settings(SLUG_FILTER=SYNC_SLUG_FILTER)
+class DeletionTests(APITestCase):
+    def setUp(self):
+        reload_dimensions()
+        clear_slug_cache()
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username="leaving", email="leaving@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.urls = [
+            URL.objects.create(
+                original_url=f"https://example.com/{i}", shortened_slug=f"del{i}", owner=self.user
+            )
+            for i in range(2)
+        ]
+        ingest_clicks(
+            [
+                ClickEvent(url.uuid, self.user.pk, f"10.0.0.{i}", "", True, timezone.now())
+                for url in self.urls
+                for i in range(3)
+            ]
+        )
+
+    def test_link_is_hidden_at_once_and_purged_in_batches(self):
+        doomed, kept = self.urls
+        self.assertIsNotNone(resolve_slug(doomed.shortened_slug))
+        response = self.client.delete(reverse("user-url-detail", args=[doomed.pk]))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], DeletionJob.PENDING)
+
+        self.assertIsNone(resolve_slug(doomed.shortened_slug))
+        listed = self.client.get(reverse("user-url-list")).data["results"]
+        self.assertEqual([url["uuid"] for url in listed], [str(kept.pk)])
+        self.assertEqual(
+            self.client.get(reverse("user-url-detail", args=[doomed.pk])).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+        # Its clicks stay until the worker runs.
+        self.assertEqual(Click.objects.filter(url=doomed).count(), 3)
+
+        self.assertEqual(process_deletions(batch_size=2), 1)
+        self.assertFalse(URL.all_objects.filter(pk=doomed.pk).exists())
+        self.assertEqual(Click.objects.filter(url=kept).count(), 3)
+        self.assertEqual(Click.objects.count(), 3)
+
+        job = self.client.get(reverse("deletion-job", args=[response.data["uuid"]])).data
+        self.assertEqual(job["status"], DeletionJob.DONE)
+        self.assertEqual(job["rows"]["clicks"], 3)
+        self.assertEqual(job["rows"]["urls"], 1)
+        self.assertIsNotNone(job["completed_at"])
+
+    def test_account_is_deactivated_at_once_and_purged_in_background(self):
+        response = self.client.delete(reverse("delete-account"))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data["job"]["uuid"]
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(URL.objects.filter(owner=self.user).exists())
+        self.assertEqual(URL.all_objects.filter(owner=self.user).count(), 2)
+        for url in self.urls:
+            self.assertIsNone(resolve_slug(url.shortened_slug))
+
+        out = StringIO()
+        call_command("purge_deletions", batch_size=4, stdout=out)
+        self.assertIn("Completed 1 deletion jobs", out.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(URL.all_objects.count(), 0)
+        self.assertEqual(Click.objects.count(), 0)
+
+        self.client.force_authenticate(user=None)
+        job = self.client.get(reverse("deletion-job", args=[job_id])).data
+        self.assertEqual(job["status"], DeletionJob.DONE)
+        self.assertEqual((job["rows"]["clicks"], job["rows"]["urls"]), (6, 2))
+
+    def test_archived_clicks_are_purged(self):
+        old = timezone.now() - timedelta(days=90)
+        ingest_clicks([ClickEvent(self.urls[0].uuid, self.user.pk, "10.0.1.1", "", True, old)])
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        call_command("archive_clicks", days=30, directory=directory.name, stdout=StringIO())
+        self.assertEqual(len(list(archived_rows(old.date(), old.date()))), 1)
+
+        self.client.delete(reverse("delete-account"))
+        self.assertEqual(process_deletions(), 1)
+        self.assertEqual(list(archived_rows(old.date(), old.date())), [])
+        self.assertEqual(DeletionJob.objects.get().rows["archived_clicks"], 1)
+
+    def test_running_job_is_left_to_its_worker(self):
+        self.client.delete(reverse("user-url-detail", args=[self.urls[0].pk]))
+        job = claim_job()
+        self.assertEqual(job.status, DeletionJob.RUNNING)
+        self.assertIsNone(claim_job())
+        self.assertEqual(process_deletions(), 0)
+        self.assertTrue(URL.all_objects.filter(pk=self.urls[0].pk).exists())
+
+        # Its worker died: once the heartbeat is stale another worker takes over.
+        DeletionJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(process_deletions(), 1)
+        self.assertFalse(URL.all_objects.filter(pk=self.urls[0].pk).exists())
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+
+    def test_custom_slug_stays_taken_until_purged(self):
+        self.user.user_type = USER_TYPE_FREE
+        self.user.save()
+        self.client.delete(reverse("user-url-detail", args=[self.urls[0].pk]))
+        response = self.client.post(
+            reverse("url-create"),
+            {"original_url": "https://example.com/new", "shortened_slug": "del0"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CLICK_RECORDER={"ASYNC": False}, SLUG_FILTER=SYNC_SLUG_FILTER)
+class AsyncRedirectTests(TestCase):
+    def setUp(self):
+        clear_slug_cache()
+        reload_dimensions()
+        self.url = URL.objects.create(
+            original_url="example.com/async", shortened_slug="asy123"
+        )
+        patcher = patch("api.clicks.get_geolocation", return_value="Testland")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def redirect(self, slug):
+        request = AsyncRequestFactory().get(f"/api/v1/urls/{slug}/", REMOTE_ADDR="10.0.0.1")
+        return await AsyncURLRedirectView.as_view()(request, slug=slug)
+
+    async def test_redirects_and_records_click(self):
+        response = await self.redirect("asy123")
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, {"original_url": "https://example.com/async"})
+        self.assertTrue(await Click.objects.filter(url=self.url, redirected=True).aexists())
+
+    async def test_inactive_link_is_not_found_but_recorded(self):
+        await URL.objects.filter(pk=self.url.pk).aupdate(is_active=False)
+        response = await self.redirect("asy123")
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(await Click.objects.filter(url=self.url, redirected=False).aexists())
+
+    async def test_unknown_slug_is_not_found(self):
+        response = await self.redirect("nope00")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SLUG_FILTER=SYNC_SLUG_FILTER)
+class SlugFilterTests(APITestCase):
+    def setUp(self):
+        clear_slug_cache()
+        self.user = User.objects.create_user(
+            username="filter", email="filter@example.com", password="testpassword"
+        )
+        URL.objects.create(original_url="https://example.com", shortened_slug="known1")
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        slugs = [f"slug{i}" for i in range(1000)]
+        for slug in slugs:
+            bloom.add(slug)
+        self.assertTrue(all(slug in bloom for slug in slugs))
+        false_positives = sum(f"other{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_failed_load_is_retried_after_a_pause(self):
+        slug_filter = SlugFilter(dict(get_filter_settings(), BUILD_IN_BACKGROUND=False))
+        with patch.object(slug_filter, "rebuild", side_effect=DatabaseError) as rebuild:
+            slug_filter.ensure_loaded()
+            slug_filter.ensure_loaded()
+            self.assertEqual(rebuild.call_count, 1)
+            self.assertFalse(slug_filter.ready)
+            self.assertTrue(slug_filter.might_contain("missing"))
+
+            later = time.monotonic() + slug_filter.options["LOAD_RETRY_INTERVAL"] + 1
+            with patch("api.slug_filter.time.monotonic", return_value=later):
+                slug_filter.ensure_loaded()
+            self.assertEqual(rebuild.call_count, 2)
+
+    def test_unknown_slug_is_rejected_without_a_query(self):
+        slug_filter = get_slug_filter()
+        slug_filter.rebuild()
+        resolve_slug("known1")
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolve_slug("missing"))
+        self.assertIsNotNone(resolve_slug("known1"))
+
+    def test_new_slugs_are_added_and_custom_slug_check_skips_database(self):
+        get_slug_filter().rebuild()
+        URL.objects.create(original_url="https://example.org", shortened_slug="fresh1")
+        self.assertTrue(get_slug_filter().might_contain("fresh1"))
+
+        self.client.force_authenticate(self.user)
+        with patch("api.views.URL.objects.filter", wraps=URL.objects.filter) as lookup:
+            response = self.client.post(
+                reverse("url-create"),
+                {"original_url": "https://example.net", "shortened_slug": "custom1"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        slug_lookups = [call for call in lookup.call_args_list if "shortened_slug" in call.kwargs]
+        self.assertEqual(slug_lookups, [])
+
+    def other_worker_filter(self, **options):
+        slug_filter = SlugFilter(dict(get_filter_settings(), **SYNC_SLUG_FILTER, **options))
+        slug_filter.rebuild()
+        return slug_filter
+
+    def test_renamed_slug_reaches_other_workers_on_refresh(self):
+        url = URL.objects.get(shortened_slug="known1")
+        URL.objects.filter(pk=url.pk).update(
+            creation_date=timezone.now() - timedelta(days=3),
+            slug_changed_at=timezone.now() - timedelta(days=3),
+        )
+        other = self.other_worker_filter(MISS_REFRESH_INTERVAL=3600)
+        url.shortened_slug = "renamed1"
+        url.save()
+        self.assertFalse(other.might_contain("renamed1"))
+        other.refresh()
+        self.assertTrue(other.might_contain("renamed1"))
+
+    def test_miss_refreshes_before_rejecting(self):
+        other = self.other_worker_filter(MISS_REFRESH_INTERVAL=0)
+        URL.objects.create(original_url="https://example.org", shortened_slug="fresh2")
+        with self.assertNumQueries(1):
+            self.assertTrue(other.might_contain("fresh2"))
+
+    def test_snapshot_round_trip(self):
+        slug_filter = SlugFilter(dict(SYNC_SLUG_FILTER, CAPACITY=100, ERROR_RATE=0.01))
+        slug_filter.rebuild()
+        path = Path(self.enterContext(TemporaryDirectory())) / "slugs.bloom"
+        write_snapshot(slug_filter.bloom, slug_filter.watermark, path)
+        bloom, watermark = read_snapshot(path)
+        self.assertIn("known1", bloom)
+        self.assertEqual(watermark, slug_filter.watermark)
@@ -0,0 +1,145 @@
+"""
+Click time series built from the rollup tables.
+
+Buckets are truncated in the database, in the requested time zone, then gaps
+are filled with zeros here. When a range would produce more than max_points
+buckets the interval is coarsened (hour -> day -> week -> month) until it
+fits; a range too wide even for monthly buckets is refused with
+TooManyPoints, so any accepted range returns a bounded number of points.
+
+Daily rollups are only used for UTC; other zones are bucketed from the
+hourly rollups, which are exact for zones with whole-hour offsets.
+"""
+
+import math
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek
+
+from .models.analytics import ClickRollup
+
+HOUR = "hour"
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+
+INTERVALS = [HOUR, DAY, WEEK, MONTH]
+
+TRUNCATE = {
+    HOUR: TruncHour,
+    DAY: TruncDay,
+    WEEK: TruncWeek,
+    MONTH: TruncMonth,
+}
+
+# Length of the fixed-size intervals, used to count their buckets.
+STEP = {
+    HOUR: timedelta(hours=1),
+    DAY: timedelta(days=1),
+    WEEK: timedelta(weeks=1),
+}
+
+DEFAULT_MAX_POINTS = 500
+
+
+class TooManyPoints(ValueError):
+    """
+    The range needs more than max_points buckets even at monthly intervals.
+    """
+
+
+def bucket_count(start, end, interval, tz):
+    """
+    Number of buckets click_series returns for [start, end) at interval.
+    """
+    first = floor_bucket(start, interval, tz)
+    if interval != MONTH:
+        return math.ceil((end - first) / STEP[interval])
+    last = floor_bucket(end, MONTH, tz)
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return months + (1 if last < end else 0)
+
+
+def choose_interval(interval, start, end, max_points, tz=dt_timezone.utc):
+    """
+    Returns the finest interval, no finer than the one requested, that covers
+    [start, end) in at most max_points buckets. Raises TooManyPoints when
+    not even monthly buckets fit.
+    """
+    for candidate in INTERVALS[INTERVALS.index(interval):]:
+        if bucket_count(start, end, candidate, tz) <= max_points:
+            return candidate
+    raise TooManyPoints(
+        f"The range needs more than {max_points} points even by month; narrow it."
+    )
+
+
+def floor_bucket(moment, interval, tz):
+    local = moment.astimezone(tz)
+    if interval == HOUR:
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.date()
+    if interval == WEEK:
+        day -= timedelta(days=day.weekday())
+    elif interval == MONTH:
+        day = day.replace(day=1)
+    return datetime.combine(day, time(), tzinfo=tz)
+
+
+def next_bucket(bucket, interval, tz):
+    if interval == HOUR:
+        # Step in absolute time so DST transitions neither skip nor repeat.
+        return (bucket.astimezone(dt_timezone.utc) + timedelta(hours=1)).astimezone(tz)
+    day = bucket.date()
+    if interval == DAY:
+        day += timedelta(days=1)
+    elif interval == WEEK:
+        day += timedelta(weeks=1)
+    else:
+        day = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return datetime.combine(day, time(), tzinfo=tz)
+
+
+def click_series(urls, start, end, interval, tz, max_points=DEFAULT_MAX_POINTS):
+    """
+    Clicks per bucket for the given URL ids (a list or a values queryset)
+    over [start, end). Buckets are whole, so the first and last may include
+    clicks just outside the range.
+
+    Returns (interval, points), where interval may be coarser than requested
+    and each point is {"bucket", "clicks", "successful_redirects"}. Raises
+    TooManyPoints if the range cannot fit in max_points buckets.
+    """
+    if start >= end:
+        return interval, []
+    interval = choose_interval(interval, start, end, max_points, tz)
+    first = floor_bucket(start, interval, tz)
+
+    granularity = ClickRollup.HOUR
+    if interval != HOUR and str(tz) == "UTC":
+        granularity = ClickRollup.DAY
+
+    rows = (
+        ClickRollup.objects.filter(
+            url__in=urls, granularity=granularity, bucket__gte=first, bucket__lt=end
+        )
+        .annotate(point=TRUNCATE[interval]("bucket", tzinfo=tz))
+        .values("point")
+        .annotate(
+            clicks=Sum("click_count"),
+            successful=Sum("click_count", filter=Q(redirected=True)),
+        )
+        .order_by()
+    )
+    counts = {row["point"]: (row["clicks"], row["successful"] or 0) for row in rows}
+
+    points = []
+    bucket = first
+    while bucket < end:
+        clicks, successful = counts.get(bucket, (0, 0))
+        points.append(
+            {"bucket": bucket, "clicks": clicks, "successful_redirects": successful}
+        )
+        bucket = next_bucket(bucket, interval, tz)
+    return interval, points
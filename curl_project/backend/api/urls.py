@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path, include
 
 from .views import (
     UserListView,
     URLCreateView,
+    BulkURLCreateView,
+    URLImportView,
     URLRedirectView,
+    AsyncURLRedirectView,
     UserURLListView,
     UserURLDetailView,
     ClickListView,
@@ -17,24 +21,37 @@ from .views import (
     DeviceListView,
     DeviceDetailView,
     URLAnalyticsView,
+    OwnerSummaryView,
+    ClickTimeSeriesView,
+    URLVisitorsView,
+    ClickExportView,
     HealthCheckView,
+    CacheStatsView,
     GuestTokenView,
     CurrentUserView,
     DeleteAccountView,
+    DeletionJobView,
 )
 
 auth_urls = [
     path("guest-token/", GuestTokenView.as_view(), name="guest-token"),
     path("me/", CurrentUserView.as_view(), name="current-user"),
     path("delete-account/", DeleteAccountView.as_view(), name="delete-account"),
+    path("deletions/<uuid:pk>/", DeletionJobView.as_view(), name="deletion-job"),
 ]
 
 health_urls = [
     path("", HealthCheckView.as_view(), name="health-check"),
+    path("cache/", CacheStatsView.as_view(), name="cache-stats"),
 ]
 
+# The native async redirect view avoids a thread hop per request under ASGI.
+redirect_view = AsyncURLRedirectView if settings.ASYNC_REDIRECTS else URLRedirectView
+
 url_urls = [
     path("shorten/", URLCreateView.as_view(), name="url-create"),
+    path("shorten/bulk/", BulkURLCreateView.as_view(), name="url-bulk-create"),
+    path("import/<str:import_format>/", URLImportView.as_view(), name="url-import"),
     path("", UserURLListView.as_view(), name="user-url-list"),
     path("<uuid:pk>/", UserURLDetailView.as_view(), name="user-url-detail"),
     path(
@@ -42,10 +59,30 @@ url_urls = [
         URLAnalyticsView.as_view(),
         name="url-analytics",
     ),
-    path("<str:slug>/", URLRedirectView.as_view(), name="url-redirect"),
+    path(
+        "<uuid:url_id>/timeseries/",
+        ClickTimeSeriesView.as_view(),
+        name="url-timeseries",
+    ),
+    path(
+        "<uuid:url_id>/visitors/",
+        URLVisitorsView.as_view(),
+        name="url-visitors",
+    ),
+    path(
+        "<uuid:url_id>/export/<str:export_format>/",
+        ClickExportView.as_view(),
+        name="url-click-export",
+    ),
+    path("<str:slug>/", redirect_view.as_view(), name="url-redirect"),
 ]
 
 analytics_urls = [
+    path("summary/", OwnerSummaryView.as_view(), name="owner-summary"),
+    path("timeseries/", ClickTimeSeriesView.as_view(), name="click-timeseries"),
+    path(
+        "export/<str:export_format>/", ClickExportView.as_view(), name="click-export"
+    ),
     path("clicks/", ClickListView.as_view(), name="click-list"),
     path("clicks/<uuid:pk>/", ClickDetailView.as_view(), name="click-detail"),
     path("countries/", CountryListView.as_view(), name="country-list"),
@@ -2,15 +2,14 @@
 Utility functions for the API.
 """
 
-import random
-import string
+import hashlib
 import re
-from urllib.parse import urlparse
-from ip2geotools.databases.noncommercial import DbIpCity
+from functools import lru_cache
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlsplit, urlunsplit
+from django.conf import settings
 from user_agents import parse
 
-from .models.url_shortening import URL
-
 from logging import getLogger
 
 logger = getLogger(__name__)
@@ -27,6 +26,43 @@ def normalize_url(url: str) -> str:
     return url
 
 
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Returns a canonical spelling of a URL, used to spot duplicates: the
+    scheme and host lower-cased, default ports dropped, trailing slashes
+    removed from the path and query parameters sorted. Falls back to the
+    normalized URL when it cannot be parsed.
+    """
+    url = normalize_url(url)
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if parts.username is not None:
+        userinfo = parts.netloc.rpartition("@")[0]
+        host = f"{userinfo}@{host}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, parts.fragment))
+
+
+def url_hash(url: str) -> str:
+    """
+    Fixed-width digest of the canonical form of a URL, for indexed lookups.
+    """
+    return hashlib.sha256(canonicalize_url(url).encode()).hexdigest()
+
+
 def get_ip_address(request):
     """
     Returns the IP address of the user.
@@ -41,52 +77,68 @@ def get_ip_address(request):
 
 def get_geolocation(ip_address):
     """
-    Returns the geolocation of the user.
+    Returns the country code of the user, using the configured GEOIP backend.
     """
+    from .geo import get_locator
+
     try:
-        response = DbIpCity.get(ip_address, api_key="free")
-        logger.info(f"Geolocation response: {response}")
-        return response.country
-    except Exception:
+        return get_locator().country(ip_address)
+    except Exception as e:
+        logger.error(f"Geolocation lookup failed for IP: {ip_address}, error: {e}")
         return None
 
 
+class UserAgentInfo(NamedTuple):
+    browser: str
+    platform: str
+    device: str
+
+
+@lru_cache(maxsize=getattr(settings, "USER_AGENT_CACHE_SIZE", 1024))
+def classify_user_agent(user_agent):
+    """
+    Parses a user agent string once and returns its browser, platform and
+    device class. Memoized, since few distinct user agents drive most clicks.
+    """
+    parsed = parse(user_agent or "")
+    if parsed.is_mobile:
+        device = "Mobile"
+    elif parsed.is_tablet:
+        device = "Tablet"
+    elif parsed.is_pc:
+        device = "PC"
+    elif parsed.is_bot:
+        device = "Bot"
+    else:
+        device = "Unknown"
+    return UserAgentInfo(
+        browser=parsed.browser.family, platform=parsed.os.family, device=device
+    )
+
+
+def get_user_agent_info(request):
+    """
+    Returns the browser, platform and device class of the user.
+    """
+    return classify_user_agent(request.META.get("HTTP_USER_AGENT", ""))
+
+
 def get_browser(request):
     """
     Returns the browser of the user.
     """
-    return parse(request.META.get("HTTP_USER_AGENT", "")).browser.family
+    return get_user_agent_info(request).browser
 
 
 def get_device(request):
     """
     Returns the device of the user.
     """
-    user_agent = parse(request.META.get("HTTP_USER_AGENT", ""))
-    if user_agent.is_mobile:
-        return "Mobile"
-    if user_agent.is_tablet:
-        return "Tablet"
-    if user_agent.is_pc:
-        return "PC"
-    if user_agent.is_bot:
-        return "Bot"
-    return "Unknown"
+    return get_user_agent_info(request).device
 
 
 def get_platform(request):
     """
     Returns the platform of the user.
     """
-    return parse(request.META.get("HTTP_USER_AGENT", "")).os.family
-
-
-def generate_unique_slug(length=6):
-    """
-    Generates a unique slug for a URL.
-    """
-    characters = string.ascii_letters + string.digits
-    while True:
-        slug = "".join(random.choice(characters) for _ in range(length))
-        if not URL.objects.filter(shortened_slug=slug).exists():
-            return slug
\ No newline at end of file
+    return get_user_agent_info(request).platform
@@ -2,9 +2,12 @@ from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from .permissions import IsFreeUser, IsAdminOrReadOnly
-from .models import URL, Click, Country, Browser, Device, Platform, User
+from .pagination import KeysetPagination
+from .models import URL, Click, Country, Browser, Device, Platform, User, DeletionJob
 from .serializers import (
     URLSerializer,
     ClickSerializer,
@@ -13,27 +16,70 @@ from .serializers import (
     PlatformSerializer,
     DeviceSerializer,
     UserSerializer,
+    TimeSeriesQuerySerializer,
+    VisitorQuerySerializer,
+    DateRangeFilterSerializer,
+    ClickFilterSerializer,
+    BulkShortenSerializer,
+    DeletionJobSerializer,
+    query_plan,
 )
+from .bulk import (
+    CREATED as BULK_CREATED,
+    EXISTING as BULK_EXISTING,
+    FAILED as BULK_FAILED,
+    get_bulk_settings,
+    shorten_urls,
+)
+from .imports import IMPORT_FORMATS, import_urls, read_rows, source_digest
+from .cache import resolve_slug, aresolve_slug, slug_cache_stats
+from .clicks import ClickEvent, record_click, arecord_click
+from .rollups import url_breakdown
+from .timeseries import TooManyPoints, click_series
+from .visitors import unique_visitors
+from .summaries import get_owner_summary
+from .guests import migrate_guest
+from .deletions import request_account_deletion, request_link_deletion
+from .hll import standard_error
+from .exports import (
+    CONTENT_TYPES,
+    EXPORT_FORMATS,
+    STREAMERS,
+    clicks_for_owner,
+    export_rows,
+    write_parquet,
+)
+from .slugs import SLUG_CREATE_ATTEMPTS, allocate_slug
+from .slug_filter import slug_might_exist, get_slug_filter
 from .utils import (
-    generate_unique_slug,
     get_ip_address,
-    get_geolocation,
-    get_browser,
-    get_device,
-    get_platform,
     normalize_url,
+    url_hash,
 )
 from guest_user.decorators import allow_guest_user
 from django.utils.decorators import method_decorator
 from logging import getLogger
-from django.http import HttpResponseRedirect
+from django.http import (
+    FileResponse,
+    HttpResponseRedirect,
+    Http404,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.views import View
 from rest_framework_simplejwt.tokens import RefreshToken
 from dj_rest_auth.views import LoginView
 from dj_rest_auth.registration.views import RegisterView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Min
+from django.utils import timezone
 from datetime import timedelta
+import csv
+import io
+import tempfile
 
 
 logger = getLogger(__name__)
@@ -97,31 +143,10 @@ class CustomLoginView(LoginView):
             logger.info(f"Checking migration: guest={guest_user.uuid}, logged_in={user.uuid}")
             if guest_user.uuid != user.uuid:
                 logger.info(f"🔄 STARTING URL MIGRATION: guest {guest_user.uuid} → user {user.uuid}")
-                guest_urls = URL.objects.filter(owner=guest_user)
-                migrated_count = 0
-                merged_count = 0
-                
-                for guest_url in guest_urls:
-                    existing_url = URL.objects.filter(
-                        original_url=guest_url.original_url, owner=user
-                    ).first()
-                    if existing_url:
-                        # Merge clicks
-                        click_count = Click.objects.filter(url=guest_url).count()
-                        Click.objects.filter(url=guest_url).update(url=existing_url)
-                        logger.info(f"  ✓ Merged {click_count} clicks: {guest_url.shortened_slug} → {existing_url.shortened_slug}")
-                        guest_url.delete()
-                        merged_count += 1
-                    else:
-                        # Just transfer ownership
-                        guest_url.owner = user
-                        guest_url.save()
-                        logger.info(f"  ✓ Transferred URL: {guest_url.shortened_slug} to {user.username}")
-                        migrated_count += 1
-                
-                guest_user.delete()
+                guest_uuid = guest_user.uuid
+                migrated_count, merged_count = migrate_guest(guest_user, user)
                 logger.info(f"✅ MIGRATION COMPLETE: {migrated_count} transferred, {merged_count} merged")
-                logger.info(f"✅ Guest user {guest_user.uuid} deleted")
+                logger.info(f"✅ Guest user {guest_uuid} deleted")
             else:
                 logger.warning(f"Guest user and logged-in user are the same: {user.uuid}")
         else:
@@ -217,31 +242,10 @@ class CustomRegisterView(RegisterView):
                 # Transfer URLs from guest to newly registered user
                 if guest_user and guest_user.uuid != new_user.uuid:
                     logger.info(f"🔄 STARTING URL MIGRATION: guest {guest_user.uuid} → user {new_user.uuid}")
-                    guest_urls = URL.objects.filter(owner=guest_user)
-                    migrated_count = 0
-                    merged_count = 0
-                    
-                    for guest_url in guest_urls:
-                        existing_url = URL.objects.filter(
-                            original_url=guest_url.original_url, owner=new_user
-                        ).first()
-                        if existing_url:
-                            # Merge clicks
-                            click_count = Click.objects.filter(url=guest_url).count()
-                            Click.objects.filter(url=guest_url).update(url=existing_url)
-                            logger.info(f"  ✓ Merged {click_count} clicks: {guest_url.shortened_slug} → {existing_url.shortened_slug}")
-                            guest_url.delete()
-                            merged_count += 1
-                        else:
-                            # Just transfer ownership
-                            guest_url.owner = new_user
-                            guest_url.save()
-                            logger.info(f"  ✓ Transferred URL: {guest_url.shortened_slug} to {new_user.username}")
-                            migrated_count += 1
-                    
-                    guest_user.delete()
+                    guest_uuid = guest_user.uuid
+                    migrated_count, merged_count = migrate_guest(guest_user, new_user)
                     logger.info(f"✅ MIGRATION COMPLETE: {migrated_count} transferred, {merged_count} merged")
-                    logger.info(f"✅ Guest user {guest_user.uuid} deleted")
+                    logger.info(f"✅ Guest user {guest_uuid} deleted")
                 elif guest_user:
                     logger.warning(f"Guest user and new user are the same: {new_user.uuid}")
                 else:
@@ -265,6 +269,20 @@ class HealthCheckView(APIView):
         return Response({"status": "ok"})
 
 
+class CacheStatsView(APIView):
+    """
+    Hit/miss counters for this worker's slug cache and slug filter.
+    """
+
+    tags = ["Health Check"]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {"slug_cache": slug_cache_stats(), "slug_filter": get_slug_filter().stats()}
+        )
+
+
 class CurrentUserView(APIView):
     """
     Get current authenticated user information.
@@ -280,7 +298,9 @@ class CurrentUserView(APIView):
 
 class DeleteAccountView(APIView):
     """
-    Delete the authenticated user's account and all associated data.
+    Delete the authenticated user's account and all associated data. The
+    account is deactivated at once and its data purged in the background;
+    the response carries the deletion job to poll.
     """
     tags = ["Authentication"]
     permission_classes = [IsAuthenticated]
@@ -302,16 +322,18 @@ class DeleteAccountView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        username = user.username
-        logger.info(f"User {username} ({user.uuid}) requested account deletion")
+        logger.info(f"User {user.username} ({user.uuid}) requested account deletion")
         
-        # Django will cascade delete all related objects (URLs, Clicks, Profile)
-        user.delete()
-        logger.info(f"User {username} account successfully deleted")
+        # The account is deactivated now; its URLs and clicks are purged in
+        # the background (see api/deletions.py).
+        job = request_account_deletion(user)
         
         return Response(
-            {"message": "Account successfully deleted"},
-            status=status.HTTP_200_OK
+            {
+                "message": "Account scheduled for deletion",
+                "job": DeletionJobSerializer(job).data,
+            },
+            status=status.HTTP_202_ACCEPTED
         )
 
 
@@ -407,33 +429,154 @@ class URLCreateView(APIView):
                     {"error": "Guests cannot create custom URLs"},
                     status=status.HTTP_403_FORBIDDEN,
                 )
-            if URL.objects.filter(shortened_slug=slug).exists():
+            # A definite miss in the slug filter needs no database query.
+            if slug_might_exist(slug) and URL.all_objects.filter(shortened_slug=slug).exists():
                 return Response(
                     {"error": "This slug is already in use"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
             customized = True
         else:
-            slug = generate_unique_slug()
+            slug = allocate_slug()
 
         # Check if the URL already exists for the user
         existing_url = URL.objects.filter(
-            original_url=original_url, owner=owner
+            owner=owner, original_url_hash=url_hash(original_url)
         ).first()
         if existing_url:
             serializer = URLSerializer(existing_url)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        url_instance = URL.objects.create(
-            original_url=original_url,
-            shortened_slug=slug,
-            owner=owner,
-            customized=customized,
-        )
+        url_instance = None
+        for _ in range(SLUG_CREATE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    url_instance = URL.objects.create(
+                        original_url=original_url,
+                        shortened_slug=slug,
+                        owner=owner,
+                        customized=customized,
+                    )
+                break
+            except IntegrityError:
+                if customized:
+                    return Response(
+                        {"error": "This slug is already in use"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                # A generated slug can only clash with a custom or legacy slug.
+                logger.warning(f"Generated slug {slug} is already taken, retrying")
+                slug = allocate_slug()
+        if url_instance is None:
+            return Response(
+                {"error": "Could not allocate a slug, please try again"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
         serializer = URLSerializer(url_instance)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class BulkURLCreateView(APIView):
+    """
+    Shorten up to BULK_SHORTEN["MAX_URLS"] URLs in one request. The body is
+    {"urls": [{"original_url": ..., "shortened_slug": ..., "expiration_date":
+    ...}, ...]}; each item gets a result, in input order, with either the URL
+    or an error.
+    """
+
+    tags = ["URLs"]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkShortenSerializer(
+            data=request.data, context={"max_urls": get_bulk_settings()["MAX_URLS"]}
+        )
+        serializer.is_valid(raise_exception=True)
+        results = shorten_urls(request.user, serializer.validated_data["urls"])
+
+        counts = {BULK_CREATED: 0, BULK_EXISTING: 0, BULK_FAILED: 0}
+        items = []
+        for index, result in enumerate(results):
+            counts[result.status] += 1
+            item = {"index": index, "status": result.status}
+            if result.url is not None:
+                item["url"] = URLSerializer(result.url).data
+            else:
+                item["error"] = result.error
+            items.append(item)
+        return Response(
+            {
+                "created": counts[BULK_CREATED],
+                "existing": counts[BULK_EXISTING],
+                "failed": counts[BULK_FAILED],
+                "results": items,
+            },
+            status=status.HTTP_201_CREATED if counts[BULK_CREATED] else status.HTTP_200_OK,
+        )
+
+
+class URLImportView(APIView):
+    """
+    Imports links from an uploaded CSV or NDJSON file (multipart field
+    "file") with original_url and optional shortened_slug and
+    expiration_date columns. Uploading the same file again after an
+    interruption resumes where the previous import stopped.
+    """
+
+    tags = ["URLs"]
+    permission_classes = [IsFreeUser]
+    parser_classes = [MultiPartParser]
+    max_rejects = 1000
+
+    def post(self, request, import_format, *args, **kwargs):
+        if import_format not in IMPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported format. Must be one of: {IMPORT_FORMATS}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rejects = []
+        rejected = 0
+
+        def collect(job, chunk_rejects):
+            nonlocal rejected
+            rejected += len(chunk_rejects)
+            room = self.max_rejects - len(rejects)
+            rejects.extend(
+                {"row": row, "error": error} for row, error in chunk_rejects[:room]
+            )
+
+        digest = source_digest(upload.file)
+        text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            job = import_urls(
+                request.user, read_rows(text, import_format), digest, on_chunk=collect
+            )
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response(
+                {"error": f"Could not read the file: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        finally:
+            text.detach()
+        return Response(
+            {
+                "import": job.pk,
+                "rows": job.rows_done,
+                "created": job.created,
+                "existing": job.existing,
+                "failed": job.failed,
+                "rejects": rejects,
+                "rejects_truncated": rejected > len(rejects),
+            }
+        )
+
+
 class URLRedirectView(APIView):
     """
     Retrieve the original URL for a given slug and record the click.
@@ -443,37 +586,23 @@ class URLRedirectView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, slug, *args, **kwargs):
-        url_instance = get_object_or_404(URL, shortened_slug=slug)
-
-        try:
-            ip_address = get_ip_address(request)
-            country_name = get_geolocation(ip_address) or "Unknown"
-        except Exception as e:
-            logger.error(
-                f"Error getting geolocation data for IP: {ip_address}, error: {e}"
+        url_instance = resolve_slug(slug)
+        if url_instance is None:
+            raise Http404("No URL matches the given query.")
+
+        accessible = url_instance.is_accessible
+        record_click(
+            ClickEvent(
+                url_id=url_instance.uuid,
+                owner_id=url_instance.owner_id,
+                ip_address=get_ip_address(request),
+                user_agent=request.META.get("HTTP_USER_AGENT", ""),
+                redirected=accessible,
+                timestamp=timezone.now(),
             )
-            country_name = "Unknown"
-
-        browser_name = get_browser(request)
-        device_type = get_device(request)
-        platform_name = get_platform(request)
-
-        country, _ = Country.objects.get_or_create(country_name=country_name)
-        browser, _ = Browser.objects.get_or_create(browser_name=browser_name)
-        device, _ = Device.objects.get_or_create(device_type=device_type)
-        platform, _ = Platform.objects.get_or_create(platform_name=platform_name)
-
-        click = Click.objects.create(
-            url=url_instance,
-            owner=url_instance.owner,
-            ip_address=ip_address,
-            country=country,
-            browser=browser,
-            device=device,
-            platform=platform,
         )
 
-        if not url_instance.is_accessible:
+        if not accessible:
             logger.warning(
                 f"URL redirection failed for slug: {slug} (URL not accessible)"
             )
@@ -482,33 +611,113 @@ class URLRedirectView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        click.redirected = True
-        click.save()
         logger.info(f"URL redirection successful for slug: {slug}")
 
         return Response({"original_url": normalize_url(url_instance.original_url)})
 
 
+class AsyncURLRedirectView(View):
+    """
+    Native async version of URLRedirectView for ASGI deployments.
+
+    Same semantics: 404 for unknown slugs, 404 for inactive or expired links,
+    and the click is recorded either way. Enrichment happens in the click
+    writer, so the request only resolves the slug and enqueues the event.
+    """
+
+    async def get(self, request, slug, *args, **kwargs):
+        url_instance = await aresolve_slug(slug)
+        if url_instance is None:
+            return JsonResponse(
+                {"detail": "No URL matches the given query."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        accessible = url_instance.is_accessible
+        await arecord_click(
+            ClickEvent(
+                url_id=url_instance.uuid,
+                owner_id=url_instance.owner_id,
+                ip_address=get_ip_address(request),
+                user_agent=request.META.get("HTTP_USER_AGENT", ""),
+                redirected=accessible,
+                timestamp=timezone.now(),
+            )
+        )
+
+        if not accessible:
+            logger.warning(
+                f"URL redirection failed for slug: {slug} (URL not accessible)"
+            )
+            return JsonResponse(
+                {"error": "This URL is not active or has expired."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        logger.info(f"URL redirection successful for slug: {slug}")
+        return JsonResponse({"original_url": normalize_url(url_instance.original_url)})
+
+
+class ExpandMixin:
+    """
+    Reads ?expand=a,b.c for serializers using ExpandableFieldsMixin and loads
+    the queryset with the matching select_related/only.
+    """
+
+    def get_expand(self):
+        if not hasattr(self, "_expand"):
+            requested = self.request.query_params.get("expand", "")
+            expand = {path.strip() for path in requested.split(",") if path.strip()}
+            unknown = expand - set(self.get_serializer_class().expandable_paths())
+            if unknown:
+                raise ValidationError(
+                    {"expand": f"Cannot expand: {', '.join(sorted(unknown))}"}
+                )
+            self._expand = expand
+        return self._expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
+
+    def plan_queryset(self, queryset):
+        related, columns = query_plan(self.get_serializer_class(), self.get_expand())
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
 
 
-class UserURLListView(generics.ListAPIView):
+class UserURLListView(ExpandMixin, generics.ListAPIView):
     """
-    List all URLs for the authenticated user.
+    List the authenticated user's URLs, newest first, a page at a time.
+    Accepts start/end to filter on creation date.
     """
 
     tags = ["User URLs"]
     serializer_class = URLSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ("-creation_date", "-uuid")
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return URL.objects.none()
-        return URL.objects.filter(owner=self.request.user)
+        query = DateRangeFilterSerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        urls = self.plan_queryset(URL.objects.filter(owner=self.request.user))
+        if "start" in query.validated_data:
+            urls = urls.filter(creation_date__gte=query.validated_data["start"])
+        if "end" in query.validated_data:
+            urls = urls.filter(creation_date__lt=query.validated_data["end"])
+        return urls
 
 
-class UserURLDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UserURLDetailView(ExpandMixin, generics.RetrieveUpdateDestroyAPIView):
     """
-    Retrieve, update or delete a URL instance.
+    Retrieve, update or delete a URL instance. A deleted URL stops
+    redirecting at once and is purged with its clicks in the background;
+    the response carries the deletion job to poll.
     """
 
     tags = ["User URLs"]
@@ -518,7 +727,26 @@ class UserURLDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return URL.objects.none()
-        return URL.objects.filter(owner=self.request.user)
+        return self.plan_queryset(URL.objects.filter(owner=self.request.user))
+
+    def destroy(self, request, *args, **kwargs):
+        job = request_link_deletion(self.get_object())
+        return Response(
+            DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+        )
+
+
+class DeletionJobView(generics.RetrieveAPIView):
+    """
+    Progress of deleting an account or URL. The job id is only handed to
+    whoever requested the deletion, and a deleted account can no longer
+    authenticate, so the id itself grants access.
+    """
+
+    tags = ["Authentication"]
+    queryset = DeletionJob.objects.all()
+    serializer_class = DeletionJobSerializer
+    permission_classes = [AllowAny]
 
 
 class UserListView(generics.ListAPIView):
@@ -530,21 +758,48 @@ class UserListView(generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    ordering = ("date_joined", "uuid")
 
 
-class ClickListView(generics.ListAPIView):
+class ClickListView(ExpandMixin, generics.ListAPIView):
+    """
+    List clicks, newest first, a page at a time. Accepts url, start/end and
+    redirected filters.
+    """
+
     tags = ["Analytics"]
-    queryset = Click.objects.all()
     serializer_class = ClickSerializer
     permission_classes = [IsAdminOrReadOnly]
+    pagination_class = KeysetPagination
+    ordering = ("-timestamp", "-click_id")
 
-
-class ClickDetailView(generics.RetrieveAPIView):
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Click.objects.none()
+        query = ClickFilterSerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        filters = query.validated_data
+        clicks = self.plan_queryset(Click.objects.all())
+        if "url" in filters:
+            clicks = clicks.filter(url_id=filters["url"])
+        if "start" in filters:
+            clicks = clicks.filter(timestamp__gte=filters["start"])
+        if "end" in filters:
+            clicks = clicks.filter(timestamp__lt=filters["end"])
+        if filters["redirected"] is not None:
+            clicks = clicks.filter(redirected=filters["redirected"])
+        return clicks
+
+
+class ClickDetailView(ExpandMixin, generics.RetrieveAPIView):
     tags = ["Analytics"]
-    queryset = Click.objects.all()
     serializer_class = ClickSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    def get_queryset(self):
+        return self.plan_queryset(Click.objects.all())
+
 
 class CountryListView(generics.ListAPIView):
     tags = ["Analytics"]
@@ -610,26 +865,169 @@ class URLAnalyticsView(APIView):
         if getattr(self, "swagger_fake_view", False):
             return Response(data={})
         url_instance = get_object_or_404(URL, uuid=url_id, owner=request.user)
-        clicks = Click.objects.filter(url=url_instance)
+        analytics = url_breakdown(url_instance)
+        analytics["unique_visitors"] = unique_visitors(url_instance.uuid)
+        # The flat name lists predate the breakdown and are kept for clients.
+        for key, facet in analytics["breakdown"].items():
+            analytics[key] = [entry["name"] for entry in facet]
+        return Response(analytics)
+
+
+class OwnerSummaryView(APIView):
+    """
+    Dashboard summary of all of the user's URLs: per-URL totals, top links,
+    and clicks by day and by dimension. Served from a per-user cache that
+    may lag new clicks by up to OWNER_SUMMARY["MAX_STALENESS"] seconds.
+    """
 
-        # Aggregate data
-        total_clicks = clicks.count()
-        successful_redirects = clicks.filter(redirected=True).count()
-        failed_redirects = total_clicks - successful_redirects
+    tags = ["Analytics"]
+    permission_classes = [IsFreeUser]
+
+    def get(self, request, *args, **kwargs):
+        if getattr(self, "swagger_fake_view", False):
+            return Response(data={})
+        summary, generated_at = get_owner_summary(request.user)
+        return Response(dict(summary, generated_at=generated_at))
 
-        countries = clicks.values("country__country_name").distinct()
-        browsers = clicks.values("browser__browser_name").distinct()
-        platforms = clicks.values("platform__platform_name").distinct()
-        devices = clicks.values("device__device_type").distinct()
 
+class ClickTimeSeriesView(APIView):
+    """
+    Clicks per hour, day, week or month, for one URL or for all of the
+    user's URLs. Query parameters: interval, start, end, tz and max_points.
+    The interval in the response may be coarser than requested, to keep the
+    number of points within max_points, and the range starts no earlier than
+    the oldest of the URLs. A range too wide even for monthly points is a 400.
+    """
+
+    tags = ["Analytics"]
+    permission_classes = [IsFreeUser]
+
+    def get(self, request, url_id=None, *args, **kwargs):
+        if getattr(self, "swagger_fake_view", False):
+            return Response(data={})
+        query = TimeSeriesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        if url_id is None:
+            urls = URL.objects.filter(owner=request.user)
+            created = urls.aggregate(first=Min("creation_date"))["first"]
+            urls = urls.values("uuid")
+        else:
+            url = get_object_or_404(URL, uuid=url_id, owner=request.user)
+            created, urls = url.creation_date, [url.uuid]
+        # Nothing can have been clicked before the first URL existed.
+        start = max(params["start"], created) if created else params["start"]
+
+        try:
+            interval, points = click_series(
+                urls,
+                start,
+                params["end"],
+                params["interval"],
+                params["tz"],
+                params["max_points"],
+            )
+        except TooManyPoints as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(
             {
-                "total_clicks": total_clicks,
-                "successful_redirects": successful_redirects,
-                "failed_redirects": failed_redirects,
-                "countries": [c["country__country_name"] for c in countries],
-                "browsers": [b["browser__browser_name"] for b in browsers],
-                "platforms": [p["platform__platform_name"] for p in platforms],
-                "devices": [d["device__device_type"] for d in devices],
+                "interval": interval,
+                "timezone": str(params["tz"]),
+                "start": start,
+                "end": params["end"],
+                "points": points,
             }
         )
+
+
+class URLVisitorsView(APIView):
+    """
+    Estimated unique visitors (distinct IP addresses) of a URL, over its
+    lifetime or between the optional start and end dates (inclusive, UTC).
+    """
+
+    tags = ["Analytics"]
+    permission_classes = [IsFreeUser]
+
+    def get(self, request, url_id, *args, **kwargs):
+        if getattr(self, "swagger_fake_view", False):
+            return Response(data={})
+        query = VisitorQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        url_instance = get_object_or_404(URL, uuid=url_id, owner=request.user)
+        return Response(
+            {
+                "start": params.get("start"),
+                "end": params.get("end"),
+                "unique_visitors": unique_visitors(
+                    url_instance.uuid, params.get("start"), params.get("end")
+                ),
+                "relative_error": round(standard_error(), 4),
+            }
+        )
+
+
+class ClickExportView(APIView):
+    """
+    Streams the raw clicks of one URL, or of all the user's URLs, as CSV,
+    NDJSON or Parquet. Accepts start/end to limit the time range.
+    """
+
+    tags = ["Analytics"]
+    permission_classes = [IsFreeUser]
+
+    def get(self, request, export_format, url_id=None, *args, **kwargs):
+        if getattr(self, "swagger_fake_view", False):
+            return Response(data={})
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported format. Must be one of: {EXPORT_FORMATS}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        query = DateRangeFilterSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        if url_id is not None:
+            get_object_or_404(URL, uuid=url_id, owner=request.user)
+
+        clicks = clicks_for_owner(
+            request.user,
+            url_id=url_id,
+            start=query.validated_data.get("start"),
+            end=query.validated_data.get("end"),
+        )
+        filename = f"clicks-{url_id or request.user.uuid}.{export_format}"
+
+        if export_format == "parquet":
+            handle = tempfile.TemporaryFile()
+            try:
+                write_parquet(export_rows(clicks), handle)
+            except ImportError:
+                handle.close()
+                return Response(
+                    {"error": "Parquet export is not available on this server"},
+                    status=status.HTTP_501_NOT_IMPLEMENTED,
+                )
+            except Exception:
+                handle.close()
+                logger.exception(f"Failed to write Parquet export {filename}")
+                return Response(
+                    {"error": "Could not export the clicks, please try again"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                )
+            # FileResponse closes the file once it has been sent.
+            handle.seek(0)
+            return FileResponse(
+                handle,
+                as_attachment=True,
+                filename=filename,
+                content_type=CONTENT_TYPES["parquet"],
+            )
+
+        response = StreamingHttpResponse(
+            STREAMERS[export_format](export_rows(clicks)),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
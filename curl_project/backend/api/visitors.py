@@ -0,0 +1,158 @@
+"""
+Unique visitor estimates per URL.
+
+The click writer folds each batch's IP addresses into a lifetime
+VisitorSketch per URL and a DailyVisitorSketch per URL and UTC day. Lifetime
+counts read one row; counts over a range of days merge the daily sketches,
+so the cost depends on the number of days, never on the number of clicks.
+Estimates carry the error described in api/hll.py.
+"""
+
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .hll import HyperLogLog
+from .models.analytics import Click, DailyVisitorSketch, VisitorSketch
+from .retention import archive_horizon
+
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+def _visit_day(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).date()
+
+
+def _merge_sketches(model, key_fields, sketches):
+    """
+    Merges {key: HyperLogLog} into the stored rows of model, creating missing
+    rows. Existing rows are locked so concurrent writers merge serially.
+    """
+    if not sketches:
+        return
+    lookup = Q()
+    for key in sketches:
+        lookup |= Q(**dict(zip(key_fields, key)))
+
+    with transaction.atomic():
+        existing = {
+            tuple(getattr(row, field) for field in key_fields): row
+            for row in model.objects.select_for_update()
+            .filter(lookup)
+            .order_by(*key_fields)
+        }
+        for key, row in existing.items():
+            merged = HyperLogLog.from_bytes(row.sketch)
+            merged.merge(sketches[key])
+            row.sketch = merged.to_bytes()
+        model.objects.bulk_update(existing.values(), ["sketch"])
+
+        missing = {key: sketch for key, sketch in sketches.items() if key not in existing}
+        if not missing:
+            return
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    model(**dict(zip(key_fields, key)), sketch=sketch.to_bytes())
+                    for key, sketch in missing.items()
+                )
+        except IntegrityError:
+            # Another writer created some of the rows first; merge into them.
+            _merge_sketches(model, key_fields, missing)
+
+
+def record_visitors(clicks):
+    """
+    Adds the IP addresses of a batch of clicks to the visitor sketches.
+    """
+    lifetime = defaultdict(HyperLogLog)
+    daily = defaultdict(HyperLogLog)
+    for click in clicks:
+        lifetime[(click.url_id,)].add(click.ip_address)
+        daily[(click.url_id, _visit_day(click.timestamp))].add(click.ip_address)
+    _merge_sketches(VisitorSketch, ["url_id"], lifetime)
+    _merge_sketches(DailyVisitorSketch, ["url_id", "day"], daily)
+
+
+def merge_visitor_sketches(url_map):
+    """
+    Merges the sketches of each URL in {source_id: target_id} into the
+    target's, for when one URL is folded into another.
+    """
+    sources = list(url_map)
+    lifetime = defaultdict(HyperLogLog)
+    for url_id, data in VisitorSketch.objects.filter(url_id__in=sources).values_list(
+        "url_id", "sketch"
+    ):
+        lifetime[(url_map[url_id],)].merge(HyperLogLog.from_bytes(data))
+    daily = defaultdict(HyperLogLog)
+    for url_id, day, data in DailyVisitorSketch.objects.filter(
+        url_id__in=sources
+    ).values_list("url_id", "day", "sketch"):
+        daily[(url_map[url_id], day)].merge(HyperLogLog.from_bytes(data))
+    _merge_sketches(VisitorSketch, ["url_id"], lifetime)
+    _merge_sketches(DailyVisitorSketch, ["url_id", "day"], daily)
+
+
+def rebuild_visitor_sketches(url_ids):
+    """
+    Recomputes the visitor sketches of the given URLs from their clicks.
+    Daily sketches of archived months are kept and folded into the lifetime
+    sketch, since their clicks are gone.
+    """
+    url_ids = list(url_ids)
+    horizon = archive_horizon()
+    kept_days = DailyVisitorSketch.objects.none()
+    with transaction.atomic():
+        VisitorSketch.objects.filter(url_id__in=url_ids).delete()
+        stale_days = DailyVisitorSketch.objects.filter(url_id__in=url_ids)
+        if horizon is not None:
+            kept_days = stale_days.filter(day__lt=horizon.date())
+            stale_days = stale_days.filter(day__gte=horizon.date())
+        stale_days.delete()
+        # One URL at a time bounds memory to that URL's daily sketches.
+        for url_id in url_ids:
+            lifetime = HyperLogLog()
+            for data in kept_days.filter(url_id=url_id).values_list("sketch", flat=True):
+                lifetime.merge(HyperLogLog.from_bytes(data))
+            daily = defaultdict(HyperLogLog)
+            clicks = Click.objects.filter(url_id=url_id)
+            if horizon is not None:
+                clicks = clicks.filter(timestamp__gte=horizon)
+            for ip_address, timestamp in clicks.values_list(
+                "ip_address", "timestamp"
+            ).iterator(chunk_size=5000):
+                lifetime.add(ip_address)
+                daily[_visit_day(timestamp)].add(ip_address)
+            if not any(lifetime.registers):
+                continue
+            VisitorSketch.objects.create(url_id=url_id, sketch=lifetime.to_bytes())
+            DailyVisitorSketch.objects.bulk_create(
+                DailyVisitorSketch(url_id=url_id, day=day, sketch=sketch.to_bytes())
+                for day, sketch in daily.items()
+            )
+
+
+def unique_visitors(url_id, start=None, end=None):
+    """
+    Estimated number of distinct IP addresses that visited a URL, over its
+    lifetime or between the start and end days (inclusive, UTC).
+    """
+    if start is None and end is None:
+        row = VisitorSketch.objects.filter(url_id=url_id).values_list("sketch", flat=True)
+        data = row.first()
+        return HyperLogLog.from_bytes(data).count() if data else 0
+
+    days = DailyVisitorSketch.objects.filter(url_id=url_id)
+    if start is not None:
+        days = days.filter(day__gte=start)
+    if end is not None:
+        days = days.filter(day__lte=end)
+    merged = HyperLogLog()
+    for data in days.values_list("sketch", flat=True):
+        merged.merge(HyperLogLog.from_bytes(data))
+    return merged.count()
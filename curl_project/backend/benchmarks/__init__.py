@@ -0,0 +1,39 @@
+"""
+Standalone benchmarks. Run them from the backend directory, e.g.
+
+    python -m benchmarks.bench_user_agents
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "curl_project.settings")
+    os.environ.setdefault("API_SECRET_KEY", "benchmark")
+
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Creates a throwaway, fully migrated database for the duration of a
+    benchmark. SQLite databases are file backed so threads can share them.
+    """
+    from django.conf import settings
+    from django.db import connection
+
+    database = settings.DATABASES["default"]
+    with tempfile.TemporaryDirectory() as directory:
+        if database["ENGINE"].endswith("sqlite3"):
+            database.setdefault("TEST", {})["NAME"] = os.path.join(directory, "bench.sqlite3")
+            database.setdefault("OPTIONS", {})["timeout"] = 60
+        old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
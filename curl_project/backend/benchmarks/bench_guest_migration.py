@@ -0,0 +1,128 @@
+"""
+Login time for a guest with many links: the old per-URL migration loop
+against the set-based migrate_guest.
+
+    python -m benchmarks.bench_guest_migration [--urls 500] [--overlap 0.2]
+        [--clicks 5]
+
+--overlap is the share of the guest's links the user already has, which
+are merged instead of transferred; --clicks is the number of clicks on
+each guest link.
+"""
+
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks import benchmark_database, setup_django
+
+
+def loop_migration(guest, user):
+    """
+    The pre-change migration from CustomLoginView.post.
+    """
+    from api.models import URL, Click
+    from api.rollups import rebuild_rollups
+    from api.summaries import mark_owners_changed
+    from api.visitors import rebuild_visitor_sketches
+
+    migrated = merged = 0
+    for guest_url in URL.objects.filter(owner=guest):
+        existing_url = URL.objects.filter(
+            owner=user, original_url_hash=guest_url.original_url_hash
+        ).first()
+        if existing_url:
+            Click.objects.filter(url=guest_url).count()
+            Click.objects.filter(url=guest_url).update(url=existing_url)
+            rebuild_rollups([existing_url.uuid])
+            rebuild_visitor_sketches([existing_url.uuid])
+            mark_owners_changed([existing_url.owner_id])
+            guest_url.delete()
+            merged += 1
+        else:
+            guest_url.owner = user
+            guest_url.save()
+            migrated += 1
+    guest.delete()
+    return migrated, merged
+
+
+def set_based_migration(guest, user):
+    from api.guests import migrate_guest
+
+    return migrate_guest(guest, user)
+
+
+def populate(label, urls, overlap, clicks):
+    from django.utils import timezone
+    from api.clicks import ClickEvent, ingest_clicks
+    from api.models import URL, User
+    from api.utils import url_hash
+    from curl_project.constants import USER_TYPE_GUEST
+
+    user = User.objects.create_user(username=f"{label}-user", email=f"{label}@example.com")
+    guest = User.objects.create_user(username=f"{label}-guest", email="")
+    guest.user_type = USER_TYPE_GUEST
+    guest.save(update_fields=["user_type"])
+
+    guest_urls = URL.objects.bulk_create(
+        URL(
+            original_url=f"https://example.com/{label}/{i}",
+            original_url_hash=url_hash(f"https://example.com/{label}/{i}"),
+            shortened_slug=f"{label}g{i}",
+            owner=guest,
+        )
+        for i in range(urls)
+    )
+    shared = int(urls * overlap)
+    URL.objects.bulk_create(
+        URL(
+            original_url=url.original_url,
+            original_url_hash=url.original_url_hash,
+            shortened_slug=f"{label}u{i}",
+            owner=user,
+        )
+        for i, url in enumerate(guest_urls[:shared])
+    )
+
+    now = timezone.now()
+    ingest_clicks(
+        [
+            ClickEvent(url.uuid, guest.uuid, f"10.0.{i % 250}.{n}", "", True, now - timedelta(hours=n))
+            for i, url in enumerate(guest_urls)
+            for n in range(clicks)
+        ]
+    )
+    return guest, user
+
+
+def run(label, migrate, urls, overlap, clicks):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    guest, user = populate(label, urls, overlap, clicks)
+    with CaptureQueriesContext(connection) as captured:
+        start = time.perf_counter()
+        migrated, merged = migrate(guest, user)
+        elapsed = time.perf_counter() - start
+    print(
+        f"{label:<10} {migrated:5d} transferred {merged:5d} merged  "
+        f"{elapsed * 1000:9.1f} ms  {len(captured):6d} queries"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=500)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--clicks", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        run("loop", loop_migration, args.urls, args.overlap, args.clicks)
+        run("set-based", set_based_migration, args.urls, args.overlap, args.clicks)
+
+
+if __name__ == "__main__":
+    main()
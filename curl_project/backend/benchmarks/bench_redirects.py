@@ -0,0 +1,97 @@
+"""
+Redirect throughput at high concurrency: the DRF view behind the WSGI
+handler (a thread per in-flight request) against the native async view
+behind the ASGI handler (one event loop). Both run in-process through
+Django's test clients, so the numbers exclude the network and the server.
+
+    python -m benchmarks.bench_redirects [--requests 5000] [--concurrency 200] [--bare]
+
+Most of the project's middleware subclasses MiddlewareMixin, which Django
+runs through sync_to_async under ASGI, one thread hop per middleware per
+request. --bare drops the middleware stack to compare the views alone.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import benchmark_database, setup_django
+
+SLUG_COUNT = 200
+
+
+def report(label, requests, elapsed, failures):
+    print(
+        f"{label:<6} {requests:6d} requests in {elapsed:7.2f}s  "
+        f"{requests / elapsed:9,.0f} req/s  {failures} failures"
+    )
+
+
+def run_wsgi(paths, concurrency):
+    from django.test import Client
+
+    def fetch(batch):
+        client = Client(REMOTE_ADDR="203.0.113.7")
+        return sum(client.get(path).status_code != 200 for path in batch)
+
+    batches = [paths[i::concurrency] for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        failures = sum(pool.map(fetch, batches))
+    report("wsgi", len(paths), time.perf_counter() - start, failures)
+
+
+def run_asgi(paths, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient(REMOTE_ADDR="203.0.113.7")
+        limit = asyncio.Semaphore(concurrency)
+
+        async def fetch(path):
+            async with limit:
+                response = await client.get(path)
+                return response.status_code != 200
+
+        start = time.perf_counter()
+        failures = sum(await asyncio.gather(*(fetch(path) for path in paths)))
+        report("asgi", len(paths), time.perf_counter() - start, failures)
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--bare", action="store_true", help="run without middleware")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    settings.DEBUG = False
+    settings.ROOT_URLCONF = "benchmarks.redirect_urls"
+    if args.bare:
+        settings.MIDDLEWARE = []
+
+    with benchmark_database():
+        from api.clicks import get_recorder
+        from api.models import URL
+
+        URL.objects.bulk_create(
+            URL(original_url=f"https://example.com/{i}", shortened_slug=f"bench{i}")
+            for i in range(SLUG_COUNT)
+        )
+        rng = random.Random(3)
+        slugs = [f"bench{rng.randrange(SLUG_COUNT)}" for _ in range(args.requests)]
+
+        run_wsgi([f"/sync/{slug}/" for slug in slugs], args.concurrency)
+        run_asgi([f"/async/{slug}/" for slug in slugs], args.concurrency)
+        get_recorder().stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Shortening throughput with many concurrent creators: the old random slug
+plus exists() loop against the leased-block allocator.
+
+    python -m benchmarks.bench_slug_allocation [--threads 16] [--per-thread 200]
+        [--length 4] [--fill 0.5]
+
+--length and --fill shrink and pre-fill the keyspace for the random
+generator to show how its retries grow as the space fills up.
+"""
+
+import argparse
+import random
+import string
+import threading
+import time
+
+from benchmarks import benchmark_database, setup_django
+
+CHARACTERS = string.ascii_letters + string.digits
+
+
+def random_slug(length):
+    """
+    The pre-change generate_unique_slug.
+    """
+    from api.models import URL
+
+    attempts = 0
+    while True:
+        attempts += 1
+        slug = "".join(random.choice(CHARACTERS) for _ in range(length))
+        if not URL.objects.filter(shortened_slug=slug).exists():
+            return slug, attempts
+
+
+def leased_slug(length):
+    from api.slugs import allocate_slug
+
+    return allocate_slug(), 0
+
+
+def run(label, make_slug, threads, per_thread, length):
+    from django.db import IntegrityError, connection, transaction
+    from api.models import URL
+
+    stats = {"created": 0, "attempts": 0, "clashes": 0}
+    lock = threading.Lock()
+
+    def creator(index):
+        created = attempts = clashes = 0
+        for number in range(per_thread):
+            while True:
+                slug, tries = make_slug(length)
+                attempts += tries
+                try:
+                    with transaction.atomic():
+                        URL.objects.create(
+                            original_url=f"https://example.com/{label}/{index}/{number}",
+                            shortened_slug=slug,
+                        )
+                    created += 1
+                    break
+                except IntegrityError:
+                    clashes += 1
+        connection.close()
+        with lock:
+            stats["created"] += created
+            stats["attempts"] += attempts
+            stats["clashes"] += clashes
+
+    workers = [threading.Thread(target=creator, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<10} {stats['created']:6d} urls in {elapsed:7.2f}s  "
+        f"{stats['created'] / elapsed:9,.0f} urls/s  "
+        f"{stats['attempts'] / stats['created']:5.2f} slug lookups/url  "
+        f"{stats['clashes']} insert clashes"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--per-thread", type=int, default=200)
+    parser.add_argument("--length", type=int, default=6)
+    parser.add_argument("--fill", type=float, default=0.0)
+    args = parser.parse_args()
+
+    setup_django()
+    with benchmark_database():
+        from api.models import URL
+
+        if args.fill:
+            space = len(CHARACTERS) ** args.length
+            taken = random.sample(range(space), int(space * args.fill))
+            URL.objects.bulk_create(
+                (
+                    URL(
+                        original_url="https://example.com/fill",
+                        shortened_slug="".join(
+                            CHARACTERS[(value // len(CHARACTERS) ** i) % len(CHARACTERS)]
+                            for i in range(args.length)
+                        ),
+                    )
+                    for value in taken
+                ),
+                batch_size=2000,
+            )
+            print(f"pre-filled {len(taken)} of {space} {args.length}-character slugs")
+
+        run("random", random_slug, args.threads, args.per_thread, args.length)
+        run("leased", leased_slug, args.threads, args.per_thread, args.length)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compares user agent classification for one click: the old three-call path
+(get_browser, get_device and get_platform each parsing the header) against
+the single memoized classify_user_agent.
+
+    python -m benchmarks.bench_user_agents [--clicks 20000]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import setup_django
+
+# A spread of real-world agents; traffic is skewed towards the first few,
+# as it is in our click logs.
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.6367.82 Mobile Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.2478.67",
+    "Mozilla/5.0 (iPad; CPU OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.6312.118 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/124.0.6367.88 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)",
+    "Twitterbot/1.0",
+    "Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)",
+    "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) SamsungBrowser/24.0 Chrome/117.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 OPR/109.0.0.0",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:124.0) Gecko/20100101 Firefox/124.0",
+    "Mozilla/5.0 (Linux; Android 12; moto g(60)) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Mobile Safari/537.36",
+    "curl/8.4.0",
+    "python-requests/2.31.0",
+]
+
+
+def corpus(clicks, seed=7):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(USER_AGENTS))]
+    return rng.choices(USER_AGENTS, weights=weights, k=clicks)
+
+
+def three_call_path(user_agent):
+    """
+    The pre-change behaviour: one full parse per helper.
+    """
+    from user_agents import parse
+
+    browser = parse(user_agent).browser.family
+    agent = parse(user_agent)
+    if agent.is_mobile:
+        device = "Mobile"
+    elif agent.is_tablet:
+        device = "Tablet"
+    elif agent.is_pc:
+        device = "PC"
+    elif agent.is_bot:
+        device = "Bot"
+    else:
+        device = "Unknown"
+    platform = parse(user_agent).os.family
+    return browser, platform, device
+
+
+def run(label, func, agents):
+    start = time.perf_counter()
+    for agent in agents:
+        func(agent)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<28} {elapsed:8.3f}s  {len(agents) / elapsed:12,.0f} clicks/s  "
+        f"{elapsed / len(agents) * 1e6:8.1f} us/click"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clicks", type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_django()
+    from api.utils import classify_user_agent
+
+    agents = corpus(args.clicks)
+    for agent in set(agents):
+        assert three_call_path(agent) == tuple(classify_user_agent.__wrapped__(agent))
+
+    classify_user_agent.cache_clear()
+    old = run("three parses per click", three_call_path, agents)
+    cold = run("single parse, no cache", classify_user_agent.__wrapped__, agents)
+    new = run("single parse, memoized", classify_user_agent, agents)
+    print(f"cache: {classify_user_agent.cache_info()}")
+    print(f"speedup vs three parses: {old / cold:.1f}x uncached, {old / new:.1f}x memoized")
+
+
+if __name__ == "__main__":
+    main()
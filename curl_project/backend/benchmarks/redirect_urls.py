@@ -0,0 +1,12 @@
+"""
+URLconf for bench_redirects: the sync and async redirect views side by side.
+"""
+
+from django.urls import path
+
+from api.views import URLRedirectView, AsyncURLRedirectView
+
+urlpatterns = [
+    path("sync/<str:slug>/", URLRedirectView.as_view()),
+    path("async/<str:slug>/", AsyncURLRedirectView.as_view()),
+]
@@ -172,3 +172,135 @@ LOGGING = {
         "level": "DEBUG",
     },
 }
+
+# The default cache backs the shared slug cache tier, the dimension version
+# key and the dashboard summary markers, so it must be shared by every
+# worker. Without REDIS_URL it is local to each process, which is only
+# correct for a single worker.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+# Worker processes per host; gunicorn reads the same variable for --workers.
+# Startup fails if it is above 1 while the default cache is process-local.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+# Two-tier slug cache used by the redirect endpoint (see api/cache.py).
+# The shared tier is skipped when the default cache is process-local.
+SLUG_CACHE = {
+    "LOCAL_SIZE": int(os.getenv("SLUG_CACHE_LOCAL_SIZE", 2048)),
+    "LOCAL_TTL": int(os.getenv("SLUG_CACHE_LOCAL_TTL", 5)),
+    "TIMEOUT": int(os.getenv("SLUG_CACHE_TIMEOUT", 300)),
+}
+
+# Batched click recording off the redirect request path (see api/clicks.py).
+# OVERFLOW is one of "drop", "drop_oldest", "block" or "inline".
+CLICK_RECORDER = {
+    "ASYNC": os.getenv("CLICK_RECORDER_ASYNC", "true").lower() == "true",
+    "QUEUE_SIZE": int(os.getenv("CLICK_RECORDER_QUEUE_SIZE", 10000)),
+    "BATCH_SIZE": int(os.getenv("CLICK_RECORDER_BATCH_SIZE", 500)),
+    "FLUSH_INTERVAL": float(os.getenv("CLICK_RECORDER_FLUSH_INTERVAL", 1.0)),
+    "OVERFLOW": os.getenv("CLICK_RECORDER_OVERFLOW", "drop_oldest"),
+}
+
+# Local geolocation database (see api/geo.py). PATH may point at an MMDB file
+# (e.g. GeoLite2-Country.mmdb) or a CSV of "start_ip,end_ip,country" ranges.
+# The remote DB-IP API is only used when GEOIP_REMOTE_FALLBACK is enabled.
+GEOIP = {
+    "BACKEND": os.getenv("GEOIP_BACKEND", "auto"),
+    "PATH": os.getenv("GEOIP_PATH"),
+    "REMOTE_FALLBACK": os.getenv("GEOIP_REMOTE_FALLBACK", "false").lower() == "true",
+    "CACHE_SIZE": int(os.getenv("GEOIP_CACHE_SIZE", 4096)),
+}
+
+# Number of distinct user agent strings kept by classify_user_agent.
+USER_AGENT_CACHE_SIZE = int(os.getenv("USER_AGENT_CACHE_SIZE", 1024))
+
+# In-memory dimension maps used by the click writer (see api/dimensions.py).
+DIMENSIONS = {
+    "RELOAD_INTERVAL": int(os.getenv("DIMENSIONS_RELOAD_INTERVAL", 300)),
+}
+
+# Seconds between applying pending click_count deltas (see api/counters.py).
+CLICK_COUNTERS = {
+    "FLUSH_INTERVAL": int(os.getenv("CLICK_COUNTERS_FLUSH_INTERVAL", 10)),
+}
+
+# Generated slugs are leased in blocks of IDs per process (see api/slugs.py).
+SLUG_ALLOCATOR = {
+    "BLOCK_SIZE": int(os.getenv("SLUG_ALLOCATOR_BLOCK_SIZE", 1000)),
+    "MIN_LENGTH": int(os.getenv("SLUG_ALLOCATOR_MIN_LENGTH", 6)),
+}
+
+# Largest batch accepted by the bulk shorten endpoint (see api/bulk.py).
+BULK_SHORTEN = {
+    "MAX_URLS": int(os.getenv("BULK_SHORTEN_MAX_URLS", 1000)),
+}
+
+# Deactivation of expired links by `manage.py expire_urls` (see api/expiry.py).
+EXPIRY_SWEEPER = {
+    "BATCH_SIZE": int(os.getenv("EXPIRY_SWEEPER_BATCH_SIZE", 1000)),
+    "INTERVAL": int(os.getenv("EXPIRY_SWEEPER_INTERVAL", 60)),
+}
+
+# Deletion of guests idle for IDLE_DAYS by `manage.py delete_idle_guests`
+# (see api/guests.py). BATCH_SIZE bounds the rows removed per statement.
+GUEST_CLEANUP = {
+    "IDLE_DAYS": int(os.getenv("GUEST_CLEANUP_IDLE_DAYS", 30)),
+    "CHUNK_SIZE": int(os.getenv("GUEST_CLEANUP_CHUNK_SIZE", 100)),
+    "BATCH_SIZE": int(os.getenv("GUEST_CLEANUP_BATCH_SIZE", 5000)),
+}
+
+# Background purging of deleted accounts and links by `manage.py
+# purge_deletions` (see api/deletions.py). BATCH_SIZE bounds the rows
+# removed per statement; a running job whose worker has not reported
+# progress for STALE_AFTER seconds may be claimed by another worker.
+DELETION_WORKER = {
+    "BATCH_SIZE": int(os.getenv("DELETION_WORKER_BATCH_SIZE", 5000)),
+    "INTERVAL": int(os.getenv("DELETION_WORKER_INTERVAL", 10)),
+    "STALE_AFTER": int(os.getenv("DELETION_WORKER_STALE_AFTER", 600)),
+}
+
+# Serve the slug route with the native async view. Enable when running under
+# ASGI (e.g. uvicorn curl_project.asgi:application).
+ASYNC_REDIRECTS = os.getenv("ASYNC_REDIRECTS", "false").lower() == "true"
+
+# Bloom filter over all slugs, used to reject unknown slugs without a query
+# (see api/slug_filter.py). Build a snapshot with `manage.py build_slug_filter`.
+SLUG_FILTER = {
+    "ENABLED": os.getenv("SLUG_FILTER_ENABLED", "true").lower() == "true",
+    "CAPACITY": int(os.getenv("SLUG_FILTER_CAPACITY", 1_000_000)),
+    "ERROR_RATE": float(os.getenv("SLUG_FILTER_ERROR_RATE", 0.001)),
+    "REFRESH_INTERVAL": int(os.getenv("SLUG_FILTER_REFRESH_INTERVAL", 60)),
+    "MISS_REFRESH_INTERVAL": float(os.getenv("SLUG_FILTER_MISS_REFRESH_INTERVAL", 1)),
+    "LOAD_RETRY_INTERVAL": int(os.getenv("SLUG_FILTER_LOAD_RETRY_INTERVAL", 30)),
+    "SNAPSHOT_PATH": os.getenv("SLUG_FILTER_SNAPSHOT_PATH"),
+}
+
+# Cached per-user dashboard summary (see api/summaries.py). New clicks are
+# applied to it as they are written, CHUNK_SIZE owners at a time; after URL
+# changes it is still served for up to MAX_STALENESS seconds before it is
+# rebuilt.
+OWNER_SUMMARY = {
+    "MAX_STALENESS": int(os.getenv("OWNER_SUMMARY_MAX_STALENESS", 60)),
+    "TIMEOUT": int(os.getenv("OWNER_SUMMARY_TIMEOUT", 3600)),
+    "TOP_LINKS": int(os.getenv("OWNER_SUMMARY_TOP_LINKS", 10)),
+    "DAYS": int(os.getenv("OWNER_SUMMARY_DAYS", 30)),
+    "CHUNK_SIZE": int(os.getenv("OWNER_SUMMARY_CHUNK_SIZE", 500)),
+}
+
+# Clicks older than DAYS are moved to compressed monthly archive files and
+# deleted; rollups stay online (see api/retention.py).
+CLICK_RETENTION = {
+    "DAYS": int(os.getenv("CLICK_RETENTION_DAYS", 395)),
+    "ARCHIVE_DIR": os.getenv("CLICK_ARCHIVE_DIR", str(BASE_DIR / "archive")),
+    "CHUNK_SIZE": int(os.getenv("CLICK_RETENTION_CHUNK_SIZE", 5000)),
+}
@@ -7,7 +7,7 @@ import {
   TableHeader,
   TableRow,
 } from "@/components/ui/table";
-import { fetchWithAuth } from "@/lib/api";
+import { fetchAllPages, fetchWithAuth } from "@/lib/api";
 import { z } from "zod";
 import {
   Card,
@@ -52,13 +52,8 @@ export const URLTable = forwardRef<URLTableHandle, {}>((_props, ref) => {
   const fetchUrls = async () => {
     setIsLoading(true);
     try {
-      const response = await fetchWithAuth("/urls/");
-      if (response.ok) {
-        const data = await response.json();
-        setUrls(UrlsSchema.parse(data));
-      } else {
-        logger.error("Failed to fetch URLs");
-      }
+      const data = await fetchAllPages("/urls/");
+      setUrls(UrlsSchema.parse(data));
     } catch (error) {
       logger.error("An error occurred while fetching URLs", error);
     } finally {
@@ -120,6 +120,22 @@ export async function fetchWithAuth(url: string, options: RequestInit = {}) {
   return response;
 }
 
+// Follows the cursor links of a paginated list endpoint and returns every row.
+export async function fetchAllPages<T = unknown>(url: string): Promise<T[]> {
+  const results: T[] = [];
+  let next: string | null = url;
+  while (next) {
+    const response = await fetchWithAuth(next);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const page = await response.json();
+    results.push(...page.results);
+    next = page.next ? `${url.split("?")[0]}${new URL(page.next).search}` : null;
+  }
+  return results;
+}
+
 export async function login(credentials: { login: string; password: string }) {
   const response = await fetchWithAuth("/auth/login/", {
     method: "POST",
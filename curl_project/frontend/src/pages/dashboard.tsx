@@ -18,7 +18,7 @@ import {
 } from "@/components/ui/card";
 import { toast } from "sonner";
 import { Copy, ExternalLink, Trash2, BarChart2, CheckIcon } from "lucide-react";
-import { fetchWithAuth } from "@/lib/api";
+import { fetchAllPages, fetchWithAuth } from "@/lib/api";
 import { useNavigate } from "react-router-dom";
 import {
   Tooltip,
@@ -47,11 +47,7 @@ export function Dashboard() {
   const fetchUrls = async () => {
     try {
       setLoading(true);
-      const response = await fetchWithAuth("/urls/");
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      const data: ShortenedURL[] = await response.json();
+      const data = await fetchAllPages<ShortenedURL>("/urls/");
       setUrls(data);
     } catch (err) {
       logger.error("Failed to fetch URLs:", err);